@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.logging import l
+from app.settings import get_settings
+
+settings = get_settings()
+
+# Bumped when the layout of the store changes; manifests of other versions are ignored
+MANIFEST_VERSION = 1
+
+
+class ArtifactStore:
+    """
+    Keeps what each video's analysis was built from, so a re-analysis only reruns what changed.
+
+    Every video gets a directory with its artifacts and a ``manifest.json``
+    recording, per artifact, its file and the inputs it was produced from
+    (speech model, proxy options, prompt...). An artifact is only returned
+    while the caller's inputs match the recorded ones; otherwise it is stale
+    and the stage that produces it runs again, replacing it.
+
+    Artifacts are either JSON values or files. Manifest updates are atomic
+    and serialized within the process; two processes updating the same
+    video at once may drop one's entry, which only costs recomputing it.
+    """
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _directory(self, video_id: str) -> Path:
+        return self.root / video_id
+
+    def _empty_manifest(self, video_id: str) -> Dict[str, Any]:
+        return {"version": MANIFEST_VERSION, "video_id": video_id, "artifacts": {}}
+
+    def manifest(self, video_id: str) -> Dict[str, Any]:
+        try:
+            with open(self._directory(video_id) / "manifest.json", "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return self._empty_manifest(video_id)
+        if manifest.get("version") != MANIFEST_VERSION:
+            return self._empty_manifest(video_id)
+        return manifest
+
+    def _record(self, video_id: str, name: str, filename: str, inputs: Dict[str, Any]) -> None:
+        directory = self._directory(video_id)
+        with self._lock:
+            manifest = self.manifest(video_id)
+            manifest["artifacts"][name] = {
+                "file": filename,
+                "inputs": inputs,
+                "bytes": os.path.getsize(directory / filename),
+                "created_at": time.time(),
+            }
+            manifest["updated_at"] = time.time()
+            tmp_path = directory / f"manifest.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, directory / "manifest.json")
+
+    def load(self, video_id: str, inputs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Returns the artifacts named in ``inputs`` that are still fresh: JSON values as loaded, files as paths
+        """
+        directory = self._directory(video_id)
+        entries = self.manifest(video_id)["artifacts"]
+        fresh = {}
+        for name, expected in inputs.items():
+            entry = entries.get(name)
+            if entry is None or entry["inputs"] != expected:
+                continue
+            path = directory / entry["file"]
+            try:
+                if path.suffix == ".json":
+                    with open(path, "r", encoding="utf-8") as f:
+                        fresh[name] = json.load(f)
+                elif path.exists():
+                    fresh[name] = str(path)
+            except (OSError, ValueError):
+                continue
+        return fresh
+
+    def put(self, video_id: str, name: str, value: Any, inputs: Dict[str, Any]) -> None:
+        directory = self._directory(video_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        filename = f"{name}.json"
+        tmp_path = directory / f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, directory / filename)
+        self._record(video_id, name, filename, inputs)
+
+    def put_file(self, video_id: str, name: str, source: str, inputs: Dict[str, Any]) -> str:
+        """
+        Stores a copy of ``source``, hard-linked when it is on the same filesystem so nothing is copied
+        """
+        directory = self._directory(video_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        filename = f"{name}{Path(source).suffix}"
+        tmp_path = directory / f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, directory / filename)
+        self._record(video_id, name, filename, inputs)
+        return str(directory / filename)
+
+    def videos(self) -> List[str]:
+        """
+        Ids of the videos with a manifest of the current version, i.e. the catalog to re-analyze
+        """
+        if not self.root.exists():
+            return []
+        return sorted(
+            directory.name for directory in self.root.iterdir()
+            if directory.is_dir() and self.manifest(directory.name)["artifacts"]
+        )
+
+    def delete(self, video_id: str) -> None:
+        shutil.rmtree(self._directory(video_id), ignore_errors=True)
+        l.info({"event": "artifacts_deleted", "video_id": video_id})
+
+
+artifact_store: Optional[ArtifactStore] = ArtifactStore(settings.artifact_dir) if settings.artifacts_enabled else None
@@ -0,0 +1,493 @@
+import queue
+import threading
+import time
+import numpy as np
+import torch
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+
+from ai.audio import (
+    SAMPLING_RATE,
+    AudioWindow,
+    EnergyVAD,
+    decode_audio_stream,
+    is_pcm_file,
+    iter_audio_windows,
+    iter_pcm_blocks,
+    load_pcm,
+    slice_audio_windows,
+)
+from ai.executors import WorkerPool, cpu_pool
+from app.logging import l
+from app.metrics import ASR_BATCH_SIZE
+from app.settings import get_settings
+
+settings = get_settings()
+
+ModelKey = Tuple[str, str, str, str]
+
+
+def default_device() -> str:
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+def default_torch_dtype() -> torch.dtype:
+    return torch.float16 if torch.cuda.is_available() else torch.float32
+
+
+def configure_torch_threads(num_threads: Optional[int]) -> None:
+    if num_threads and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+
+class ASRBackend(ABC):
+    """
+    Builds a callable with the HF ASR pipeline interface for a given model
+    """
+    name: str
+
+    def resolve(self, device: str, torch_dtype: torch.dtype) -> Tuple[str, torch.dtype]:
+        return device, torch_dtype
+
+    @abstractmethod
+    def build(self, model_id: str, device: str, torch_dtype: torch.dtype):
+        ...
+
+
+class HFBackend(ASRBackend):
+    name = "hf"
+
+    def load_model(self, model_id: str, torch_dtype: torch.dtype):
+        return AutoModelForSpeechSeq2Seq.from_pretrained(
+            model_id,
+            torch_dtype=torch_dtype,
+            low_cpu_mem_usage=True,
+            use_safetensors=True
+        )
+
+    def build(self, model_id: str, device: str, torch_dtype: torch.dtype):
+        model = self.load_model(model_id, torch_dtype)
+        model.to(device)
+
+        processor = AutoProcessor.from_pretrained(model_id)
+
+        return pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+            torch_dtype=torch_dtype,
+            device=device,
+        )
+
+
+class QuantizedHFBackend(HFBackend):
+    """
+    HF model with its Linear layers dynamically quantized to int8; CPU only
+    """
+    name = "int8"
+
+    def resolve(self, device: str, torch_dtype: torch.dtype) -> Tuple[str, torch.dtype]:
+        return "cpu", torch.float32
+
+    def load_model(self, model_id: str, torch_dtype: torch.dtype):
+        model = super().load_model(model_id, torch_dtype)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+ASR_BACKENDS: Dict[str, ASRBackend] = {
+    backend.name: backend for backend in (HFBackend(), QuantizedHFBackend())
+}
+
+
+def get_asr_backend(name: str) -> ASRBackend:
+    try:
+        return ASR_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown speech backend: {name}. Available: {sorted(ASR_BACKENDS)}")
+
+
+def build_asr_pipeline(model_id: str, device: str, torch_dtype: torch.dtype, backend: str = "hf"):
+    configure_torch_threads(settings.asr_num_threads)
+    return get_asr_backend(backend).build(model_id, device, torch_dtype)
+
+
+class ASRModelRegistry:
+    """
+    Process-wide cache of ASR pipelines keyed by (model id, backend, device, dtype)
+    """
+    def __init__(self):
+        self._pipelines: Dict[ModelKey, Any] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[ModelKey, Dict[str, Any]] = {}
+
+    @staticmethod
+    def make_key(model_id: str, backend: str, device: str, torch_dtype: torch.dtype) -> ModelKey:
+        return (model_id, backend, device, str(torch_dtype).replace("torch.", ""))
+
+    def get(self,
+            model_id: Optional[str] = None,
+            device: Optional[str] = None,
+            torch_dtype: Optional[torch.dtype] = None,
+            backend: Optional[str] = None):
+        model_id = model_id or settings.speech_model
+        backend = backend or settings.speech_backend
+        device, torch_dtype = get_asr_backend(backend).resolve(
+            device or default_device(),
+            torch_dtype or default_torch_dtype(),
+        )
+        key = self.make_key(model_id, backend, device, torch_dtype)
+
+        start = time.perf_counter()
+        pipe = self._pipelines.get(key)
+        if pipe is not None:
+            self._record(key, "warm", time.perf_counter() - start)
+            return pipe
+
+        with self._lock:
+            pipe = self._pipelines.get(key)
+            if pipe is not None:
+                self._record(key, "warm", time.perf_counter() - start)
+                return pipe
+
+            pipe = build_asr_pipeline(model_id, device, torch_dtype, backend)
+            self._pipelines[key] = pipe
+            elapsed = self._record(key, "cold", time.perf_counter() - start)
+
+        l.info({
+            "event": "asr_model_loaded",
+            "model": key[0],
+            "backend": key[1],
+            "device": key[2],
+            "dtype": key[3],
+            "cold_load_seconds": round(elapsed, 4),
+        })
+        return pipe
+
+    def warm_up(self) -> None:
+        self.get()
+
+    def _record(self, key: ModelKey, kind: str, elapsed: float) -> float:
+        stats = self._stats.setdefault(key, {
+            "cold_loads": 0,
+            "cold_load_seconds": 0.0,
+            "warm_hits": 0,
+            "warm_lookup_seconds": 0.0,
+        })
+        if kind == "cold":
+            stats["cold_loads"] += 1
+            stats["cold_load_seconds"] = elapsed
+        else:
+            stats["warm_hits"] += 1
+            stats["warm_lookup_seconds"] = elapsed
+        return elapsed
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {"/".join(key): dict(values) for key, values in self._stats.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pipelines.clear()
+            self._stats.clear()
+
+
+asr_registry = ASRModelRegistry()
+
+
+def get_asr_pipeline(model_id: Optional[str] = None,
+                     device: Optional[str] = None,
+                     torch_dtype: Optional[torch.dtype] = None,
+                     backend: Optional[str] = None):
+    return asr_registry.get(model_id, device, torch_dtype, backend)
+
+
+def run_asr_pipeline(inputs: Any, kwargs: Dict[str, Any]) -> Any:
+    # Runs in a CPU pool worker, on that process's own warm pipeline
+    return get_asr_pipeline()(inputs, **kwargs)
+
+
+def _portable(inputs: Any) -> Any:
+    # Memory-mapped windows are sent as plain arrays; the worker cannot see the parent's mapping
+    if isinstance(inputs, list):
+        return [
+            {**item, "raw": np.asarray(item["raw"])} if isinstance(item, dict) and "raw" in item else item
+            for item in inputs
+        ]
+    return inputs
+
+
+class PooledASRPipeline:
+    """
+    Callable with the HF pipeline interface that runs inference on a ``WorkerPool``.
+
+    With a process pool every worker holds its own copy of the model, loaded
+    once when the worker starts; with an inline pool this is the local
+    pipeline. Outputs are the pipeline's plain dicts, so they cross the
+    process boundary as is.
+    """
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+
+    def __call__(self, inputs: Any, **kwargs: Any) -> Any:
+        if self.pool.processes:
+            inputs = _portable(inputs)
+        return self.pool.call(run_asr_pipeline, inputs, kwargs)
+
+
+def stitch_window_chunks(window: AudioWindow, chunks: List[Dict[str, Any]], overlap_s: float) -> List[Dict[str, Any]]:
+    """
+    Shifts a window's chunks onto the original timeline and drops the ones owned by a neighbour.
+
+    Consecutive windows share ``overlap_s`` seconds; a chunk belongs to the window
+    whose half of the overlap contains its midpoint.
+    """
+    lower = window.start + overlap_s / 2 if window.start > 0 else 0.0
+    upper = None if window.is_last else window.start + window.duration - overlap_s / 2
+
+    stitched = []
+    for chunk in chunks:
+        start, end = chunk["timestamp"]
+        start = window.start + (start or 0.0)
+        end = window.start + (end if end is not None else window.duration)
+        midpoint = (start + end) / 2
+        if midpoint < lower or (upper is not None and midpoint >= upper):
+            continue
+        stitched.append({"timestamp": (round(start, 2), round(end, 2)), "text": chunk["text"]})
+    return stitched
+
+
+def transcribe_long_form(pipe,
+                         file_path: str,
+                         chunk_length_s: float,
+                         overlap_s: float,
+                         batch_size: int,
+                         generate_kwargs: Optional[Dict[str, Any]] = None,
+                         vad: Optional[EnergyVAD] = None,
+                         on_chunks: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
+    """
+    Streams the audio through the model in batches of overlapping windows.
+
+    Returns the same shape as the HF pipeline (``text`` and ``chunks``) with
+    timestamps on the original timeline. With a ``vad``, only speech regions
+    reach the model and a ``vad`` summary of the skipped audio is included.
+    ``on_chunks`` receives each batch's final chunks as soon as it is decoded.
+    """
+    if vad is None and is_pcm_file(file_path):
+        # Windows are views of the memory-mapped file, nothing is decoded or copied up front
+        windows = slice_audio_windows(load_pcm(file_path), chunk_length_s, overlap_s)
+    else:
+        # Raw PCM from the preprocessing stage is read in place, anything else is decoded
+        blocks = iter_pcm_blocks(load_pcm(file_path)) if is_pcm_file(file_path) else decode_audio_stream(file_path)
+        if vad is not None:
+            blocks = vad.filter(blocks)
+        windows = iter_audio_windows(blocks, chunk_length_s, overlap_s)
+
+    chunks: List[Dict[str, Any]] = []
+    audio_seconds = 0.0
+    asr_seconds = 0.0
+    try:
+        while True:
+            batch = list(islice(windows, batch_size))
+            if not batch:
+                break
+            start = time.perf_counter()
+            outputs = pipe(
+                [{"raw": window.samples, "sampling_rate": SAMPLING_RATE} for window in batch],
+                batch_size=batch_size,
+                return_timestamps=True,
+                generate_kwargs=generate_kwargs or {},
+            )
+            asr_seconds += time.perf_counter() - start
+            decoded = []
+            for window, output in zip(batch, outputs):
+                decoded.extend(stitch_window_chunks(window, output["chunks"], overlap_s))
+                audio_seconds = window.start + window.duration
+            if vad is not None:
+                # Regions only grow at the end, so earlier speech already maps to its final place
+                for chunk in decoded:
+                    start, end = chunk["timestamp"]
+                    chunk["timestamp"] = (round(vad.to_original(start), 2), round(vad.to_original(end, end=True), 2))
+            chunks.extend(decoded)
+            if on_chunks is not None and decoded:
+                on_chunks(decoded)
+    finally:
+        windows.close()
+
+    result = {
+        "text": "".join(chunk["text"] for chunk in chunks),
+        "chunks": chunks,
+        "audio_seconds": audio_seconds,
+        "asr_seconds": asr_seconds,
+    }
+
+    if vad is not None:
+        # Assume skipped audio would have cost the same per second as the speech we decoded
+        seconds_per_audio_second = asr_seconds / vad.speech_seconds if vad.speech_seconds else 0.0
+        result["audio_seconds"] = vad.total_seconds
+        result["vad"] = {
+            **vad.stats(),
+            "asr_seconds": round(asr_seconds, 3),
+            "asr_seconds_saved": round(vad.skipped_seconds * seconds_per_audio_second, 3),
+        }
+
+    return result
+
+
+@dataclass
+class _InferenceRequest:
+    item: Any
+    return_timestamps: bool
+    generate_kwargs: Dict[str, Any]
+    future: Future = field(default_factory=Future)
+
+    @property
+    def group(self) -> Tuple:
+        return (self.return_timestamps, tuple(sorted(self.generate_kwargs.items())))
+
+
+class ASRBatchScheduler:
+    """
+    Collects audio windows from concurrent requests into shared forward passes.
+
+    Callers use it like the HF pipeline; each input becomes a future that is
+    resolved once the batch it landed in has run. A batch is flushed when it
+    reaches ``max_batch_size`` or ``max_wait_ms`` after its first item arrived.
+
+    Up to ``max_in_flight`` batches run at once, for pipelines backed by
+    several workers. While all of them are busy, new windows keep queueing
+    and go out together in the next batch.
+    """
+    def __init__(self, pipe_factory: Callable[[], Any], max_batch_size: int, max_wait_ms: float,
+                 max_in_flight: int = 1):
+        self.pipe_factory = pipe_factory
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_in_flight = max(1, max_in_flight)
+        self._queue: "queue.Queue[_InferenceRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._dispatcher: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._batch_sizes: Counter = Counter()
+        self._max_queue_depth = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            if self.max_in_flight > 1:
+                self._dispatcher = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="asr-batch")
+            self._thread = threading.Thread(target=self._run, name="asr-batch-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._dispatcher is not None:
+            self._dispatcher.shutdown(wait=True)
+            self._dispatcher = None
+        # Nothing will collect what is left in the queue, so fail it rather than leave its callers blocked
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            request.future.set_exception(RuntimeError("ASR scheduler stopped before running this request"))
+
+    def submit(self, item: Any, return_timestamps: bool = True,
+               generate_kwargs: Optional[Dict[str, Any]] = None) -> Future:
+        self.start()
+        request = _InferenceRequest(item, return_timestamps, generate_kwargs or {})
+        self._queue.put(request)
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return request.future
+
+    def __call__(self, inputs: List[Any], batch_size: Optional[int] = None, return_timestamps: bool = True,
+                 generate_kwargs: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        futures = [self.submit(item, return_timestamps, generate_kwargs) for item in inputs]
+        return [future.result() for future in futures]
+
+    def _collect_batch(self, first: _InferenceRequest) -> List[_InferenceRequest]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            # Wait for a free slot before collecting, so windows pile up while every batch is busy
+            if not self._slots.acquire(timeout=0.1):
+                continue
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                self._slots.release()
+                continue
+
+            groups: Dict[Tuple, List[_InferenceRequest]] = {}
+            for request in self._collect_batch(first):
+                groups.setdefault(request.group, []).append(request)
+
+            if self._dispatcher is None:
+                self._run_groups(list(groups.values()))
+            else:
+                self._dispatcher.submit(self._run_groups, list(groups.values()))
+
+    def _run_groups(self, groups: List[List[_InferenceRequest]]) -> None:
+        try:
+            for requests in groups:
+                self._run_batch(requests)
+        finally:
+            self._slots.release()
+
+    def _run_batch(self, requests: List[_InferenceRequest]) -> None:
+        self._batch_sizes[len(requests)] += 1
+        ASR_BATCH_SIZE.observe(len(requests))
+        try:
+            outputs = list(self.pipe_factory()(
+                [request.item for request in requests],
+                batch_size=len(requests),
+                return_timestamps=requests[0].return_timestamps,
+                generate_kwargs=requests[0].generate_kwargs,
+            ))
+            if len(outputs) != len(requests):
+                raise RuntimeError(f"ASR pipeline returned {len(outputs)} outputs for {len(requests)} inputs")
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        for request, output in zip(requests, outputs):
+            request.future.set_result(output)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_queue_depth,
+            "batches": sum(self._batch_sizes.values()),
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+        }
+
+
+asr_scheduler = ASRBatchScheduler(
+    lambda: PooledASRPipeline(cpu_pool),
+    max_batch_size=settings.asr_max_batch_size,
+    max_wait_ms=settings.asr_max_wait_ms,
+    max_in_flight=max(1, cpu_pool.workers),
+)
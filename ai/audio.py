@@ -0,0 +1,280 @@
+import os
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple
+import ffmpeg
+import numpy as np
+
+SAMPLING_RATE = 16000
+# Raw mono float32 at SAMPLING_RATE, as written by ai.preprocess
+PCM_SUFFIX = ".f32"
+
+
+@dataclass
+class AudioWindow:
+    start: float
+    samples: np.ndarray
+    is_last: bool = False
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / SAMPLING_RATE
+
+
+def decode_audio_stream(file_path: str,
+                        sampling_rate: int = SAMPLING_RATE,
+                        block_seconds: float = 5.0) -> Iterator[np.ndarray]:
+    """
+    Decodes any media file to mono float32 PCM, yielding fixed-size blocks as ffmpeg produces them
+    """
+    process = (
+        ffmpeg
+        .input(file_path)
+        .output("pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=sampling_rate)
+        .global_args("-nostdin", "-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    block_bytes = int(block_seconds * sampling_rate) * 4
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise Exception(f"ffmpeg failed to decode {file_path}: {stderr.decode(errors='ignore').strip()}")
+
+
+def is_pcm_file(file_path: str) -> bool:
+    return file_path.endswith(PCM_SUFFIX)
+
+
+def load_pcm(file_path: str) -> np.ndarray:
+    """
+    Maps a raw float32 PCM file into memory without reading it
+    """
+    if os.path.getsize(file_path) == 0:
+        return np.empty(0, dtype=np.float32)
+    return np.memmap(file_path, dtype=np.float32, mode="r")
+
+
+def iter_pcm_blocks(samples: np.ndarray,
+                    sampling_rate: int = SAMPLING_RATE,
+                    block_seconds: float = 5.0) -> Iterator[np.ndarray]:
+    block = int(block_seconds * sampling_rate)
+    for start in range(0, len(samples), block):
+        yield samples[start:start + block]
+
+
+def slice_audio_windows(samples: np.ndarray,
+                        chunk_length_s: float,
+                        overlap_s: float,
+                        sampling_rate: int = SAMPLING_RATE) -> Iterator[AudioWindow]:
+    """
+    Same windows as ``iter_audio_windows`` for audio that is already in memory,
+    as views into ``samples`` rather than copies
+    """
+    window = int(chunk_length_s * sampling_rate)
+    overlap = int(overlap_s * sampling_rate)
+    if not 0 <= overlap < window:
+        raise ValueError("overlap_s must be smaller than chunk_length_s")
+    step = window - overlap
+
+    offset = 0
+    while len(samples):
+        end = offset + window
+        # The tail is only worth a window if it extends past the previous window's overlap
+        is_last = end >= len(samples) or len(samples) - (offset + step) <= overlap
+        yield AudioWindow(offset / sampling_rate, samples[offset:end], is_last=is_last)
+        if is_last:
+            break
+        offset += step
+
+
+def iter_audio_windows(blocks: Iterable[np.ndarray],
+                       chunk_length_s: float,
+                       overlap_s: float,
+                       sampling_rate: int = SAMPLING_RATE) -> Iterator[AudioWindow]:
+    """
+    Re-slices a stream of PCM blocks into overlapping windows.
+
+    Only the current window plus one pending block is held in memory, so the
+    footprint does not depend on the length of the audio.
+    """
+    window = int(chunk_length_s * sampling_rate)
+    overlap = int(overlap_s * sampling_rate)
+    if not 0 <= overlap < window:
+        raise ValueError("overlap_s must be smaller than chunk_length_s")
+    step = window - overlap
+
+    buffer = np.empty(0, dtype=np.float32)
+    offset = 0
+    pending = None
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= window:
+            if pending is not None:
+                yield pending
+            pending = AudioWindow(offset / sampling_rate, buffer[:window].copy())
+            buffer = buffer[step:]
+            offset += step
+
+    # Whatever is left past the last window's overlap still needs transcribing
+    if len(buffer) > overlap or (pending is None and len(buffer)):
+        if pending is not None:
+            yield pending
+        pending = AudioWindow(offset / sampling_rate, buffer.copy())
+
+    if pending is not None:
+        pending.is_last = True
+        yield pending
+
+
+class EnergyVAD:
+    """
+    Streaming energy-based voice activity detector.
+
+    ``filter`` passes on only the frames around speech, compacted into one
+    continuous stream, and records where each kept region sits on the original
+    timeline so transcript timestamps can be mapped back with ``to_original``.
+    Quiet gaps shorter than ``max_gap_ms`` are kept to avoid cutting words.
+    """
+    def __init__(self,
+                 threshold_db: float = -40.0,
+                 frame_ms: int = 30,
+                 padding_ms: int = 300,
+                 max_gap_ms: int = 1000,
+                 sampling_rate: int = SAMPLING_RATE):
+        self.threshold_db = threshold_db
+        self.sampling_rate = sampling_rate
+        self.frame = int(sampling_rate * frame_ms / 1000)
+        self.padding_frames = max(1, padding_ms // frame_ms)
+        self.max_gap_frames = max(self.padding_frames, max_gap_ms // frame_ms)
+        # [compact start, original start, length] in samples
+        self.regions: List[List[int]] = []
+        self.total_samples = 0
+        self.kept_samples = 0
+
+    @property
+    def total_seconds(self) -> float:
+        return self.total_samples / self.sampling_rate
+
+    @property
+    def speech_seconds(self) -> float:
+        return self.kept_samples / self.sampling_rate
+
+    @property
+    def skipped_seconds(self) -> float:
+        return self.total_seconds - self.speech_seconds
+
+    def loud_frames(self, frames: np.ndarray) -> np.ndarray:
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        return 20 * np.log10(np.maximum(rms, 1e-10)) > self.threshold_db
+
+    def _keep(self, frames: List[Tuple[int, np.ndarray]], out: List[np.ndarray]) -> None:
+        for original_start, samples in frames:
+            last = self.regions[-1] if self.regions else None
+            if last is not None and last[1] + last[2] == original_start:
+                last[2] += len(samples)
+            else:
+                self.regions.append([self.kept_samples, original_start, len(samples)])
+            self.kept_samples += len(samples)
+            out.append(samples)
+
+    def filter(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        lookback: Deque[Tuple[int, np.ndarray]] = deque(maxlen=self.padding_frames)
+        gap: List[Tuple[int, np.ndarray]] = []
+        in_speech = False
+        remainder = np.empty(0, dtype=np.float32)
+
+        def frames_of(samples: np.ndarray, final: bool):
+            usable = len(samples) if final else len(samples) - len(samples) % self.frame
+            if usable == 0:
+                return [], samples
+            whole = usable - usable % self.frame
+            frames = list(samples[:whole].reshape(-1, self.frame))
+            if whole < usable:
+                frames.append(samples[whole:usable])
+            return frames, samples[usable:]
+
+        def process(samples: np.ndarray, final: bool) -> np.ndarray:
+            nonlocal in_speech, remainder
+            start = self.total_samples - len(samples)
+            frames, remainder = frames_of(samples, final)
+            if not frames:
+                return np.empty(0, dtype=np.float32)
+
+            full = [f for f in frames if len(f) == self.frame]
+            loud = list(self.loud_frames(np.stack(full))) if full else []
+            if len(full) < len(frames):
+                tail = frames[-1]
+                loud.append(bool(self.loud_frames(np.pad(tail, (0, self.frame - len(tail)))[None, :])[0]))
+
+            out: List[np.ndarray] = []
+            for index, (frame, is_loud) in enumerate(zip(frames, loud)):
+                item = (start + index * self.frame, frame)
+                if is_loud:
+                    if in_speech:
+                        self._keep(gap, out)
+                    else:
+                        self._keep(list(lookback), out)
+                        lookback.clear()
+                    gap.clear()
+                    self._keep([item], out)
+                    in_speech = True
+                elif in_speech:
+                    gap.append(item)
+                    if len(gap) > self.max_gap_frames:
+                        self._keep(gap[:self.padding_frames], out)
+                        lookback.extend(gap[self.padding_frames:])
+                        gap.clear()
+                        in_speech = False
+                else:
+                    lookback.append(item)
+
+            if final and in_speech:
+                self._keep(gap[:self.padding_frames], out)
+                gap.clear()
+
+            return np.concatenate(out) if out else np.empty(0, dtype=np.float32)
+
+        for block in blocks:
+            self.total_samples += len(block)
+            kept = process(np.concatenate([remainder, block]), final=False)
+            if len(kept):
+                yield kept
+
+        kept = process(remainder, final=True)
+        if len(kept):
+            yield kept
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """
+        Maps a time on the compacted speech stream back to the source timeline.
+
+        With ``end=True`` a time falling exactly on a region boundary maps to the
+        end of the earlier region instead of the start of the later one.
+        """
+        if not self.regions:
+            return seconds
+        sample = seconds * self.sampling_rate
+        starts = [region[0] for region in self.regions]
+        index = max(0, (bisect_left if end else bisect_right)(starts, sample) - 1)
+        compact_start, original_start, length = self.regions[index]
+        return (original_start + min(sample - compact_start, length)) / self.sampling_rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": round(self.total_seconds, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "skipped_seconds": round(self.skipped_seconds, 2),
+            "speech_regions": len(self.regions),
+        }
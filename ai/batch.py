@@ -0,0 +1,180 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from pytubefix import Playlist
+
+from app.logging import l
+from app.responses import dumps
+from ai.artifacts import artifact_store
+from ai.cache import extract_video_id
+from ai.video_extraction import analyze_youtube_video, run_youtube_analysis
+from ai.youtube import watch_url
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class BatchVideo:
+    url: str
+    video_id: Optional[str]
+
+
+def is_playlist_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.path.rstrip("/").endswith("/playlist") and "list" in parse_qs(parsed.query)
+
+
+def expand_playlist(url: str) -> List[str]:
+    """
+    Resolves a playlist URL to the URLs of its videos, fetching every page
+    """
+    video_urls = list(Playlist(url).video_urls)
+    l.info({"event": "playlist_expanded", "url": url, "videos": len(video_urls)})
+    return video_urls
+
+
+def dedupe_videos(urls: Iterable[str]) -> Tuple[List[BatchVideo], int]:
+    """
+    Keeps the first occurrence of each video id, in input order.
+
+    Watch, short and embed URLs of the same video collapse to one entry with a
+    canonical watch URL. URLs without a recognizable id are kept as given so
+    they show up as failures in the results. Returns the videos and the number
+    of duplicates dropped.
+    """
+    videos: List[BatchVideo] = []
+    seen = set()
+    duplicates = 0
+    for url in urls:
+        url = url.strip()
+        if not url:
+            continue
+        video_id = extract_video_id(url)
+        key = video_id or url
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        canonical = f"https://www.youtube.com/watch?v={video_id}" if video_id else url
+        videos.append(BatchVideo(canonical, video_id))
+    return videos, duplicates
+
+
+def resolve_batch(urls: List[str]) -> Tuple[List[BatchVideo], int]:
+    """
+    Expands playlists and deduplicates the result. Blocking, as playlists are fetched from YouTube.
+    """
+    expanded: List[str] = []
+    for url in urls:
+        expanded.extend(expand_playlist(url) if is_playlist_url(url) else [url])
+    return dedupe_videos(expanded)
+
+
+def catalog_videos() -> List[BatchVideo]:
+    """
+    Every video in the artifact store, for re-analysis
+    """
+    if artifact_store is None:
+        raise ValueError("The artifact store is disabled (ARTIFACTS_ENABLED=false)")
+    return [BatchVideo(watch_url(video_id), video_id) for video_id in artifact_store.videos()]
+
+
+async def reanalyze_video(url: str, limits: Optional[Dict[str, asyncio.Semaphore]] = None) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+    """
+    Analyzes a video again, returning the analysis and the stages that ran and were skipped
+    """
+    stages: Dict[str, List[str]] = {}
+
+    def listener(stage: str, result: Any) -> None:
+        if stage == "stages":
+            stages.update(result)
+
+    analysis = await run_youtube_analysis(url, limits, listener=listener)
+    return analysis, stages
+
+
+def create_stage_limits(download: Optional[int] = None,
+                        asr: Optional[int] = None,
+                        llm: Optional[int] = None) -> Dict[str, asyncio.Semaphore]:
+    return {
+        "download": asyncio.Semaphore(download or settings.batch_download_concurrency),
+        "asr": asyncio.Semaphore(asr or settings.batch_asr_concurrency),
+        "llm": asyncio.Semaphore(llm or settings.batch_llm_concurrency),
+    }
+
+
+async def analyze_batch(videos: List[BatchVideo],
+                        limits: Optional[Dict[str, asyncio.Semaphore]] = None,
+                        max_videos: Optional[int] = None,
+                        reanalyze: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyzes videos concurrently, yielding one result per video as each one finishes.
+
+    ``max_videos`` bounds how many videos are in flight, which also bounds the
+    temporary files on disk; ``limits`` caps downloads, ASR and LLM calls
+    across all of them. Failures are reported in the result instead of
+    stopping the batch. With ``reanalyze`` each result also lists the stages
+    that ran and those skipped thanks to cached results and stored artifacts.
+    """
+    limits = limits or create_stage_limits()
+    gate = asyncio.Semaphore(max_videos or settings.batch_max_videos)
+
+    async def run(video: BatchVideo) -> Dict[str, Any]:
+        async with gate:
+            start = time.perf_counter()
+            try:
+                if reanalyze:
+                    analysis, stages = await reanalyze_video(video.url, limits)
+                    result = {"status": "ok", "analysis": analysis, "stages": stages}
+                else:
+                    analysis = await analyze_youtube_video(video.url, limits=limits)
+                    result = {"status": "ok", "analysis": analysis}
+            except Exception as e:
+                result = {"status": "error", "error": str(e)}
+            return {
+                "type": "video",
+                "url": video.url,
+                "video_id": video.video_id,
+                **result,
+                "elapsed_seconds": round(time.perf_counter() - start, 3),
+            }
+
+    tasks = [asyncio.create_task(run(video)) for video in videos]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # A client that disconnects mid-stream should not leave videos running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def iter_batch_ndjson(videos: List[BatchVideo],
+                            duplicates: int = 0,
+                            **kwargs: Any) -> AsyncIterator[str]:
+    """
+    ``analyze_batch`` as NDJSON lines, closed by a summary line
+    """
+    start = time.perf_counter()
+    counts = {"ok": 0, "error": 0}
+    skipped: Dict[str, int] = {}
+    async for result in analyze_batch(videos, **kwargs):
+        counts[result["status"]] += 1
+        for stage in result.get("stages", {}).get("skipped", []):
+            skipped[stage] = skipped.get(stage, 0) + 1
+        yield dumps(result).decode("utf-8") + "\n"
+
+    summary = {
+        "type": "summary",
+        "videos": len(videos),
+        "duplicates": duplicates,
+        **counts,
+        **({"skipped_stages": skipped} if kwargs.get("reanalyze") else {}),
+        "elapsed_seconds": round(time.perf_counter() - start, 3),
+    }
+    l.info({"event": "batch_completed", **summary})
+    yield dumps(summary).decode("utf-8") + "\n"
@@ -0,0 +1,215 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from pytubefix import extract
+from pytubefix.exceptions import RegexMatchError
+
+from app.logging import l
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class NullCache(CacheBackend):
+    def get(self, key: str) -> Optional[Any]:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryLRUCache(CacheBackend):
+    """
+    Values are deep-copied in and out unless ``copy_values`` is off, for values treated as read-only
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float, copy_values: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._copy = copy.deepcopy if copy_values else (lambda value: value)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return self._copy(value)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, self._copy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(CacheBackend):
+    """
+    One JSON file per entry; the least recently written files are evicted past max_bytes
+    """
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            if path.stat().st_mtime + self.ttl_seconds < time.time():
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "value": value}, f)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = []
+            for path in self.directory.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+def create_cache(backend: str) -> CacheBackend:
+    if backend == "memory":
+        return MemoryLRUCache(settings.cache_max_entries, settings.cache_ttl_seconds)
+    if backend == "disk":
+        return DiskCache(settings.cache_dir, settings.cache_max_bytes, settings.cache_ttl_seconds)
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+result_cache = create_cache(settings.cache_backend)
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    try:
+        return extract.video_id(url)
+    except RegexMatchError:
+        return None
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def options_hash(options: Optional[Dict[str, Any]]) -> str:
+    return prompt_hash(json.dumps(options or {}, sort_keys=True, default=str))
+
+
+def stage_cache_keys(video_id: str,
+                     prompt: str,
+                     model: str,
+                     temperature: float,
+                     speech_model: str,
+                     transcript_options: Optional[Dict[str, Any]] = None,
+                     analysis_options: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    Cache keys per pipeline stage, each covering only the inputs that stage depends on.
+
+    ``transcript_options`` and ``analysis_options`` hold every other setting
+    that changes the stage's output (ASR backend, VAD, preprocessing...).
+    """
+    return {
+        "metadata": f"metadata:{video_id}",
+        "transcript": f"transcript:{video_id}:{speech_model}:{options_hash(transcript_options)}",
+        "multimodal_analysis": (
+            f"scenes:{video_id}:{model}:{temperature}:{prompt_hash(prompt)}:{options_hash(analysis_options)}"
+        ),
+    }
+
+
+def analysis_key(video_id: str, keys: Dict[str, str]) -> str:
+    """
+    Identifies one analysis of a video: same id, prompt, models and temperature
+    """
+    return f"{video_id}:{prompt_hash('|'.join(sorted(keys.values())))}"
+
+
+def get_cached_stages(keys: Dict[str, str], cache: Optional[CacheBackend] = None) -> Dict[str, Any]:
+    cache = cache or result_cache
+    hits = {}
+    for stage, key in keys.items():
+        value = cache.get(key)
+        if value is not None:
+            hits[stage] = value
+    if hits:
+        l.info({"event": "result_cache_hit", "stages": sorted(hits)})
+    return hits
@@ -0,0 +1,192 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.logging import l
+from app.metrics import POOL_BUSY_SECONDS, POOL_IN_FLIGHT, POOL_QUEUE_SECONDS, POOL_TASKS, POOL_WORKERS
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+def _timed(func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, float, float]:
+    # Runs in the worker; time.time() is comparable across processes, perf_counter is not
+    started = time.time()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, started, time.perf_counter() - start
+
+
+def _noop() -> None:
+    pass
+
+
+class WorkerPool(Executor):
+    """
+    Named executor with a fixed number of workers that accounts for how busy they are.
+
+    With ``processes`` the workers are separate processes started with
+    ``spawn`` and prepared by ``initializer``, so functions and arguments
+    must be picklable. With 0 workers tasks run in the submitting thread,
+    which keeps the pool usable in tests and single-process setups. The
+    underlying executor is created on first use and replaced if a worker
+    process dies.
+    """
+    def __init__(self,
+                 name: str,
+                 workers: int,
+                 processes: bool = False,
+                 initializer: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.workers = max(0, workers)
+        self.processes = processes and self.workers > 0
+        self.initializer = initializer
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        POOL_WORKERS.set(self.workers, pool=name)
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=self.initializer,
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+                self._started_at = time.monotonic()
+            return self._executor
+
+    def _reset(self, broken: Executor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        outer: Future = Future()
+        if self.workers == 0:
+            if outer.set_running_or_notify_cancel():
+                try:
+                    outer.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    outer.set_exception(e)
+            return outer
+
+        submitted = time.time()
+        self._track(1)
+        executor = self._get_executor()
+        try:
+            try:
+                inner = executor.submit(_timed, fn, args, kwargs)
+            except BrokenProcessPool:
+                l.warning(f"Worker pool {self.name} is broken, starting new workers")
+                self._reset(executor)
+                executor = self._get_executor()
+                inner = executor.submit(_timed, fn, args, kwargs)
+        except BaseException:
+            self._track(-1)
+            raise
+
+        def done(inner: Future) -> None:
+            self._track(-1)
+            if inner.cancelled():
+                outer.cancel()
+                return
+            try:
+                result, started, busy = inner.result()
+            except BaseException as e:
+                if isinstance(e, BrokenProcessPool):
+                    self._reset(executor)
+                self._record("error")
+                if not outer.cancelled():
+                    outer.set_exception(e)
+                return
+            self._record("ok", busy, max(0.0, started - submitted))
+            if not outer.cancelled():
+                outer.set_result(result)
+
+        outer.add_done_callback(lambda future: future.cancelled() and inner.cancel())
+        inner.add_done_callback(done)
+        return outer
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs ``fn`` on the pool and blocks until it returns
+        """
+        return self.submit(fn, *args, **kwargs).result()
+
+    def start(self) -> None:
+        """
+        Starts every worker and waits for their initializer, instead of on the first tasks
+        """
+        if self.workers == 0:
+            return
+        executor = self._get_executor()
+        # Workers are spawned on demand, one per task submitted while none is idle
+        for future in [executor.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+        l.info({"event": "worker_pool_started", "pool": self.name, "workers": self.workers, "processes": self.processes})
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def _track(self, delta: int) -> None:
+        with self._lock:
+            self._in_flight += delta
+            in_flight = self._in_flight
+        POOL_IN_FLIGHT.set(in_flight, pool=self.name)
+
+    def _record(self, status: str, busy: float = 0.0, queued: float = 0.0) -> None:
+        with self._lock:
+            if status == "ok":
+                self._completed += 1
+                self._busy_seconds += busy
+            else:
+                self._failed += 1
+        POOL_TASKS.inc(pool=self.name, status=status)
+        if status == "ok":
+            POOL_BUSY_SECONDS.inc(busy, pool=self.name)
+            POOL_QUEUE_SECONDS.observe(queued, pool=self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = time.monotonic() - self._started_at
+            capacity = self.workers * elapsed
+            return {
+                "workers": self.workers,
+                "processes": self.processes,
+                "running": min(self._in_flight, self.workers),
+                "queued": max(0, self._in_flight - self.workers),
+                "completed": self._completed,
+                "failed": self._failed,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "utilization": round(min(1.0, self._busy_seconds / capacity), 4) if capacity > 0 else 0.0,
+            }
+
+
+def init_cpu_worker() -> None:
+    # Imported here, in the worker, because ai.asr submits its inference to this pool
+    from ai.asr import asr_registry
+
+    asr_registry.warm_up()
+
+
+# Blocking work of the pipeline stages: downloads, uploads, ffmpeg subprocesses and waiting on other pools
+io_pool = WorkerPool("io", max(1, settings.io_workers))
+
+# CPU-bound work that would otherwise hold the GIL in the API process: ASR inference, keyframe scoring, base64
+cpu_pool = WorkerPool("cpu", settings.cpu_workers, processes=True, initializer=init_cpu_worker)
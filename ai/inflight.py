@@ -0,0 +1,180 @@
+import asyncio
+import contextlib
+import copy
+import threading
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple, Type
+from langchain_core.exceptions import ModelRateLimitError
+
+from app.logging import l
+from app.metrics import ANALYSIS_REQUESTS
+from app.settings import get_settings
+from app.state import SharedState, shared_state
+from ai.llm import CircuitOpenError, LLMDeadlineExceeded
+from ai.media import GeminiFileUploadError
+from ai.scratch import ScratchQuotaExceeded
+
+settings = get_settings()
+
+
+class InflightError(Exception):
+    """
+    Raised in a worker that waited on another worker's run of the same analysis
+    when that run failed with an error not in the deduplicator's ``errors``
+    """
+
+
+def error_name(error_type: Type[BaseException]) -> str:
+    return f"{error_type.__module__}.{error_type.__qualname__}"
+
+
+class InflightDeduplicator:
+    """
+    Runs each key at most once at a time across every worker sharing ``state``.
+
+    The first caller takes a lease on the key and runs the work, renewing the
+    lease while it is busy. Callers arriving meanwhile, in any worker, wait
+    for the lease to be released and take the outcome the owner published,
+    result or error. Results are only published while some other worker is
+    registered as waiting, so a run nobody joined writes nothing but its
+    lease. Errors of the types in ``errors`` are raised again as such in the
+    waiters, so they keep their meaning (e.g. their HTTP status); others
+    become ``InflightError``. If the owner dies its lease expires after
+    ``lease_seconds`` and one of the waiters runs the work instead.
+
+    Within a worker, concurrent callers of a key await the same task and
+    never touch the shared state. The task is shielded, so a caller going
+    away does not cancel it for the others.
+    """
+    def __init__(self,
+                 state: SharedState,
+                 lease_seconds: float,
+                 poll_seconds: float,
+                 result_ttl_seconds: float,
+                 errors: Sequence[Type[Exception]] = ()):
+        self.state = state
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.result_ttl_seconds = result_ttl_seconds
+        self.errors = {error_name(error_type): error_type for error_type in errors}
+        self._tasks: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._counts = {"run": 0, "coalesced": 0, "shared": 0}
+
+    def _count(self, result: str) -> None:
+        with self._lock:
+            self._counts[result] += 1
+        ANALYSIS_REQUESTS.inc(result=result)
+
+    async def _renew(self, lease: str, owner: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await asyncio.to_thread(self.state.acquire, lease, owner, self.lease_seconds)
+
+    async def _waited_on(self, key: str) -> bool:
+        waiting, _ = await asyncio.to_thread(self.state.incr, f"inflight-waiters:{key}", 0, self.lease_seconds)
+        return waiting > 0
+
+    async def _own(self, key: str, owner: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        lease, outcome = f"inflight:{key}", f"inflight-result:{key}"
+        renewer = asyncio.create_task(self._renew(lease, owner))
+        try:
+            result = await func()
+            # A worker joining after this check finds no outcome and runs the work itself
+            if await self._waited_on(key):
+                await asyncio.to_thread(self.state.set, outcome, {"owner": owner, "result": result}, self.result_ttl_seconds)
+            return result
+        except Exception as e:
+            published = {"owner": owner, "error": str(e), "type": error_name(type(e))}
+            await asyncio.to_thread(self.state.set, outcome, published, self.result_ttl_seconds)
+            raise
+        finally:
+            renewer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await renewer
+            await asyncio.to_thread(self.state.release, lease, owner)
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        # Tasks belong to their event loop; callers on another loop get their own
+        local = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(local)
+            leader = task is None
+            if leader:
+                task = self._tasks[local] = asyncio.create_task(self._run_shared(key, func))
+                task.add_done_callback(lambda _: self._forget(local, task))
+        if leader:
+            return await asyncio.shield(task)
+        self._count("coalesced")
+        l.info({"event": "analysis_coalesced", "key": key})
+        # Every caller gets its own copy to modify
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _forget(self, local: Tuple[asyncio.AbstractEventLoop, str], task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(local) is task:
+                del self._tasks[local]
+
+    async def _run_shared(self, key: str, func: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        lease, outcome = f"inflight:{key}", f"inflight-result:{key}"
+        owner = uuid.uuid4().hex
+        while True:
+            if await asyncio.to_thread(self.state.acquire, lease, owner, self.lease_seconds):
+                self._count("run")
+                return await self._own(key, owner, func)
+
+            holder = await asyncio.to_thread(self.state.holder, lease)
+            if holder is None:
+                continue
+            l.info({"event": "inflight_joined", "key": key})
+            await self._wait(key, lease, holder)
+
+            published = await asyncio.to_thread(self.state.get, outcome)
+            if published is None or published["owner"] != holder:
+                # The owner went away without finishing; try to take over
+                continue
+            self._count("shared")
+            if "error" in published:
+                raise self._error(published)
+            return published["result"]
+
+    async def _wait(self, key: str, lease: str, holder: str) -> None:
+        """
+        Polls until ``holder`` lets go of the lease, registered as a waiter so it publishes its result
+        """
+        loop = asyncio.get_running_loop()
+        registered_until = 0.0
+        while True:
+            if loop.time() + self.poll_seconds >= registered_until:
+                _, remaining = await asyncio.to_thread(self.state.incr, f"inflight-waiters:{key}", 1, self.lease_seconds)
+                registered_until = loop.time() + remaining
+            if await asyncio.to_thread(self.state.holder, lease) != holder:
+                return
+            await asyncio.sleep(self.poll_seconds)
+
+    def _error(self, published: Dict[str, Any]) -> Exception:
+        error_type: Optional[Type[Exception]] = self.errors.get(published.get("type", ""))
+        if error_type is None:
+            return InflightError(published["error"])
+        return error_type(published["error"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            in_flight = len(self._tasks)
+        total = sum(counts.values())
+        return {
+            **counts,
+            "in_flight": in_flight,
+            "hit_rate": round((counts["coalesced"] + counts["shared"]) / total, 4) if total else 0.0,
+        }
+
+
+inflight = InflightDeduplicator(
+    shared_state,
+    lease_seconds=settings.inflight_lease_seconds,
+    poll_seconds=settings.inflight_poll_seconds,
+    result_ttl_seconds=settings.inflight_result_ttl_seconds,
+    # Raised again as themselves in waiting workers, so the API answers them the same way
+    errors=(ScratchQuotaExceeded, CircuitOpenError, LLMDeadlineExceeded, ModelRateLimitError, GeminiFileUploadError),
+)
@@ -0,0 +1,220 @@
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+import ffmpeg
+import numpy as np
+
+from app.logging import l
+
+# Frames are scored on a coarse grayscale grid, every STRIDE-th pixel
+STRIDE = 8
+HISTOGRAM_BINS = 16
+
+
+@dataclass
+class Keyframe:
+    timestamp: float
+    score: float
+    jpeg: bytes = b""
+
+
+@dataclass
+class KeyframeOptions:
+    frames_per_minute: float = 12.0
+    max_frames: int = 64
+    sample_fps: float = 2.0
+    width: int = 512
+    height: int = 288
+    min_score: float = 0.1
+    jpeg_quality: int = 5
+
+    @classmethod
+    def from_settings(cls, settings) -> "KeyframeOptions":
+        return cls(
+            frames_per_minute=settings.keyframes_per_minute,
+            max_frames=settings.keyframes_max_frames,
+            sample_fps=settings.keyframes_sample_fps,
+            width=settings.keyframes_width,
+            height=settings.keyframes_height,
+            min_score=settings.keyframes_min_score,
+        )
+
+
+def iter_video_frames(file_path: str,
+                      fps: float,
+                      width: int,
+                      height: int,
+                      batch_size: int = 32) -> Iterator[np.ndarray]:
+    """
+    Decodes frames at ``fps``, letterboxed to ``width`` x ``height`` RGB, in batches of shape (n, height, width, 3)
+    """
+    process = (
+        ffmpeg
+        .input(file_path)
+        .video
+        .filter("fps", fps=fps)
+        .filter("scale", width, height, force_original_aspect_ratio="decrease")
+        .filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2")
+        .output("pipe:", format="rawvideo", pix_fmt="rgb24")
+        .global_args("-nostdin", "-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    frame_bytes = width * height * 3
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes * batch_size)
+            count = len(data) // frame_bytes
+            if count == 0:
+                break
+            yield np.frombuffer(data[:count * frame_bytes], dtype=np.uint8).reshape(count, height, width, 3)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise Exception(f"ffmpeg failed to decode frames of {file_path}: {stderr.decode(errors='ignore').strip()}")
+
+
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def thumbnails(frames: np.ndarray) -> np.ndarray:
+    return frames[:, ::STRIDE, ::STRIDE] @ LUMA
+
+
+def change_scores(thumbs: np.ndarray, previous: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Scores how much each frame differs from the one before it, from 0 (identical) to 1.
+
+    Averages the mean absolute pixel difference and the total variation
+    distance between luminance histograms: the first catches motion and
+    cuts between similar shots, the second is robust to camera shake.
+    The first frame of a video, with no ``previous``, scores 1.
+    """
+    count = len(thumbs)
+    before = np.concatenate([previous[None], thumbs[:-1]]) if previous is not None else thumbs[:-1]
+    after = thumbs if previous is not None else thumbs[1:]
+
+    pixel = np.abs(after - before).mean(axis=(1, 2)) / 255
+
+    bins = np.minimum((np.concatenate([before[:1], after]) * HISTOGRAM_BINS / 256).astype(np.int64), HISTOGRAM_BINS - 1)
+    offsets = (np.arange(len(bins)) * HISTOGRAM_BINS)[:, None, None]
+    histograms = np.bincount((bins + offsets).ravel(), minlength=len(bins) * HISTOGRAM_BINS)
+    histograms = histograms.reshape(len(bins), HISTOGRAM_BINS) / bins[0].size
+    histogram = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+
+    scores = 0.5 * pixel + 0.5 * histogram
+    if previous is None:
+        scores = np.concatenate([[1.0], scores])
+    return scores[:count]
+
+
+def select_keyframes(file_path: str, options: KeyframeOptions) -> Tuple[List[Tuple[Keyframe, np.ndarray]], float]:
+    """
+    Picks the frame with the largest change in each interval of ``60 / frames_per_minute`` seconds.
+
+    Intervals whose best change is below ``min_score`` are skipped unless no
+    frame was kept for a minute, so static footage costs a frame per minute
+    and busy footage up to the full budget. Past ``max_frames`` the biggest
+    changes win, always including the opening frame; the budget is enforced
+    as frames are kept, so at most ``max_frames`` frames and the current
+    interval's candidate are held in memory. Returns the kept frames, in
+    order, and the duration covered.
+    """
+    interval = 60.0 / options.frames_per_minute
+    opening: Optional[Tuple[Keyframe, np.ndarray]] = None
+    # Min-heap on (score, -timestamp): the weakest change, and the latest on ties, is dropped first
+    ranked: List[Tuple[float, float, Keyframe, np.ndarray]] = []
+    best: Optional[Tuple[Keyframe, np.ndarray]] = None
+    last: Optional[float] = None
+    bucket = 0
+    previous = None
+    index = 0
+
+    def close_bucket() -> None:
+        nonlocal opening, last
+        if best is None:
+            return
+        frame, pixels = best
+        if last is not None and frame.score < options.min_score and frame.timestamp - last < 60.0:
+            return
+        last = frame.timestamp
+        if opening is None:
+            opening = best
+            return
+        entry = (frame.score, -frame.timestamp, frame, pixels)
+        if len(ranked) < options.max_frames - 1:
+            heapq.heappush(ranked, entry)
+        elif ranked and entry[:2] > ranked[0][:2]:
+            heapq.heapreplace(ranked, entry)
+
+    for batch in iter_video_frames(file_path, options.sample_fps, options.width, options.height):
+        thumbs = thumbnails(batch)
+        scores = change_scores(thumbs, previous)
+        previous = thumbs[-1]
+        for offset, score in enumerate(scores):
+            timestamp = (index + offset) / options.sample_fps
+            frame_bucket = int(timestamp // interval)
+            if frame_bucket != bucket:
+                close_bucket()
+                best, bucket = None, frame_bucket
+            if best is None or score > best[0].score:
+                best = (Keyframe(round(timestamp, 2), float(score)), batch[offset].copy())
+        index += len(batch)
+    close_bucket()
+
+    kept = [opening] if opening is not None and options.max_frames > 0 else []
+    kept += [(frame, pixels) for _, _, frame, pixels in sorted(ranked, key=lambda entry: entry[2].timestamp)]
+    return kept, index / options.sample_fps
+
+
+def encode_jpegs(frames: List[np.ndarray], quality: int = 5) -> List[bytes]:
+    """
+    Encodes RGB frames of the same size to JPEG in a single ffmpeg call
+    """
+    if not frames:
+        return []
+    height, width = frames[0].shape[:2]
+    try:
+        out, _ = (
+            ffmpeg
+            .input("pipe:", format="rawvideo", pix_fmt="rgb24", s=f"{width}x{height}")
+            .output("pipe:", format="image2pipe", vcodec="mjpeg", **{"q:v": quality})
+            .global_args("-nostdin", "-loglevel", "error")
+            .run(input=np.stack(frames).tobytes(), capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise Exception(f"ffmpeg failed to encode keyframes: {e.stderr.decode(errors='ignore').strip()}")
+    # The start-of-image marker cannot occur inside JPEG data, so it delimits the frames
+    images = [b"\xff\xd8" + part for part in out.split(b"\xff\xd8") if part]
+    if len(images) != len(frames):
+        raise Exception(f"Expected {len(frames)} JPEG frames from ffmpeg, got {len(images)}")
+    return images
+
+
+def extract_keyframes(file_path: str, options: KeyframeOptions = KeyframeOptions()) -> Tuple[List[Keyframe], float]:
+    """
+    Returns the representative frames of a video as JPEGs, with their timestamps, and its duration
+    """
+    start = time.perf_counter()
+    selected, duration = select_keyframes(file_path, options)
+    images = encode_jpegs([frame for _, frame in selected], options.jpeg_quality)
+    keyframes = []
+    for (keyframe, _), jpeg in zip(selected, images):
+        keyframe.jpeg = jpeg
+        keyframes.append(keyframe)
+
+    l.info({
+        "event": "keyframes_extracted",
+        "file": file_path,
+        "duration_seconds": round(duration, 2),
+        "frames": len(keyframes),
+        "budget": min(options.max_frames, math.ceil(duration / 60 * options.frames_per_minute)),
+        "jpeg_bytes": sum(len(k.jpeg) for k in keyframes),
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    return keyframes, duration
@@ -0,0 +1,396 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+import httpx
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.exceptions import ModelRateLimitError
+from langchain_core.messages import HumanMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.logging import l
+from app.metrics import (
+    GEMINI_CIRCUIT_OPEN,
+    GEMINI_CONCURRENCY_LIMIT,
+    GEMINI_REQUEST_SECONDS,
+    GEMINI_RETRIES,
+    GEMINI_TOKENS,
+)
+from ai.pipeline import RateBudget
+from app.settings import get_settings
+
+settings = get_settings()
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """
+    The HTTP status behind an exception, looking through the causes the SDK wraps it in
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        for attribute in ("code", "status_code"):
+            value = getattr(error, attribute, None)
+            if isinstance(value, int):
+                return value
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def is_overloaded(error: BaseException) -> bool:
+    return isinstance(error, ModelRateLimitError) or error_status(error) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    if is_overloaded(error) or error_status(error) in RETRYABLE_STATUS:
+        return True
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError))
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Full-jitter exponential backoff: uniform in ``[0, min(cap, base * 2 ** attempt)]``
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class AdaptiveConcurrency:
+    """
+    Caps in-flight calls with a limit that adapts to how the service responds (AIMD).
+
+    Each fast success raises the limit by ``1 / limit``, so about one step per
+    round of calls; a success slower than ``target_latency`` lowers it by 10%,
+    and a rate-limit response or timeout halves it. Must be used from a single
+    event loop.
+    """
+    def __init__(self, initial: float, minimum: float, maximum: float, target_latency: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.limit = min(max(initial, minimum), maximum)
+        self.in_flight = 0
+        self._waiters: List[asyncio.Future] = []
+        GEMINI_CONCURRENCY_LIMIT.set(int(self.limit))
+
+    async def acquire(self) -> None:
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # Every waiter re-checks the limit, so waking them all is safe if some were cancelled
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _set(self, limit: float) -> None:
+        previous = int(self.limit)
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        GEMINI_CONCURRENCY_LIMIT.set(int(self.limit))
+        if int(self.limit) > previous:
+            self._wake()
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            self._set(self.limit * 0.9)
+        else:
+            self._set(self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        self._set(self.limit / 2)
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after ``threshold`` consecutive failures, for ``cooldown`` seconds.
+
+    After the cooldown a single probe call is let through: its success closes
+    the circuit again and its failure reopens it.
+    """
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Raises while the circuit is open; returns whether the call is the half-open probe
+        """
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError(
+                f"Gemini circuit is open after {self.failures} consecutive failures"
+            )
+        if state == "half_open":
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        GEMINI_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.threshold:
+            if self.opened_at is None or self._probing:
+                l.warning({"event": "gemini_circuit_opened", "failures": self.failures})
+            self.opened_at = time.monotonic()
+            self._probing = False
+            GEMINI_CIRCUIT_OPEN.set(1)
+
+
+class GeminiClient:
+    """
+    Long-lived Gemini client shared by every analysis in the process.
+
+    Calls run with ``ainvoke`` on a dedicated event loop thread, so models and
+    their HTTP connections are created once and reused, whichever thread or
+    event loop the caller is on. Each call waits for its turn in the request
+    budget and the adaptive concurrency limit, is retried with jittered
+    backoff on rate limits, server errors and timeouts until its deadline,
+    and fails fast while the circuit breaker is open.
+    """
+    def __init__(self,
+                 api_key: str,
+                 base_url: Optional[str] = None,
+                 budget: Optional[RateBudget] = None,
+                 initial_concurrency: float = 4,
+                 min_concurrency: float = 1,
+                 max_concurrency: float = 16,
+                 target_latency: float = 120.0,
+                 max_attempts: int = 5,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 30.0,
+                 attempt_timeout: float = 300.0,
+                 deadline: float = 600.0,
+                 breaker_threshold: int = 5,
+                 breaker_cooldown: float = 30.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.budget = budget or RateBudget(0)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency, target_latency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self._models: Dict[Tuple[str, float, Optional[type]], Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "GeminiClient":
+        return cls(
+            api_key=settings.google_api_key,
+            base_url=settings.gemini_base_url or None,
+            budget=RateBudget(settings.gemini_requests_per_minute),
+            initial_concurrency=settings.gemini_initial_concurrency,
+            min_concurrency=settings.gemini_min_concurrency,
+            max_concurrency=settings.gemini_max_concurrency,
+            target_latency=settings.gemini_target_latency,
+            max_attempts=settings.gemini_max_attempts,
+            backoff_base=settings.gemini_backoff_base,
+            backoff_max=settings.gemini_backoff_max,
+            attempt_timeout=settings.gemini_attempt_timeout,
+            deadline=settings.gemini_deadline,
+            breaker_threshold=settings.gemini_breaker_threshold,
+            breaker_cooldown=settings.gemini_breaker_cooldown,
+        )
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+            # Models hold connections bound to this loop
+            self._models.clear()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def model(self, model: str, temperature: float, schema: Optional[Type] = None) -> Any:
+        key = (model, temperature, schema)
+        if key not in self._models:
+            llm = ChatGoogleGenerativeAI(
+                model=model,
+                temperature=temperature,
+                max_tokens=None,
+                timeout=None,
+                # Retries are handled here, with the limiter and breaker in the loop
+                max_retries=0,
+                google_api_key=self.api_key,
+                base_url=self.base_url,
+            )
+            self._models[key] = llm.with_structured_output(schema) if schema is not None else llm
+        return self._models[key]
+
+    async def _call(self,
+                    content: Union[str, List[Any]],
+                    model: str,
+                    temperature: float,
+                    schema: Optional[Type],
+                    deadline: float) -> Any:
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline
+        runnable = self.model(model, temperature, schema)
+        self.calls += 1
+        attempt = 0
+        while True:
+            probe = self.breaker.allow()
+            settled = False
+            try:
+                await asyncio.sleep(self.budget.reserve())
+                await self.concurrency.acquire()
+                usage = UsageMetadataCallbackHandler()
+                start = loop.time()
+                try:
+                    timeout = min(self.attempt_timeout, expires - start)
+                    if timeout <= 0:
+                        raise LLMDeadlineExceeded(f"Gemini call exceeded its {deadline:.0f}s deadline")
+                    response = await asyncio.wait_for(
+                        runnable.ainvoke([HumanMessage(content=content)], config={"callbacks": [usage]}),
+                        timeout,
+                    )
+                except Exception as e:
+                    error = e
+                else:
+                    error = None
+                finally:
+                    latency = loop.time() - start
+                    self.concurrency.release()
+
+                if error is None:
+                    self.concurrency.on_success(latency)
+                    self.breaker.record_success()
+                    settled = True
+                    GEMINI_REQUEST_SECONDS.observe(latency, status="ok")
+                    for model_name, tokens in usage.usage_metadata.items():
+                        GEMINI_TOKENS.inc(tokens.get("input_tokens", 0), model=model_name, type="input")
+                        GEMINI_TOKENS.inc(tokens.get("output_tokens", 0), model=model_name, type="output")
+                        l.info({"event": "gemini_usage", "model": model_name, **tokens})
+                    return response
+
+                GEMINI_REQUEST_SECONDS.observe(latency, status="error")
+                if isinstance(error, LLMDeadlineExceeded):
+                    self.breaker.record_failure()
+                    settled = True
+                    raise error
+                if not is_retryable(error):
+                    # The service answered; it is the request that was rejected
+                    self.breaker.record_success()
+                    settled = True
+                    raise error
+
+                timed_out = isinstance(error, asyncio.TimeoutError)
+                if is_overloaded(error) or timed_out:
+                    self.concurrency.on_overload()
+                self.breaker.record_failure()
+                settled = True
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise error
+                delay = backoff_delay(attempt - 1, self.backoff_base, self.backoff_max)
+                if loop.time() + delay >= expires:
+                    raise LLMDeadlineExceeded(f"Gemini call exceeded its {deadline:.0f}s deadline") from error
+
+                reason = "rate_limited" if is_overloaded(error) else "timeout" if timed_out else "error"
+                self.retries += 1
+                GEMINI_RETRIES.inc(reason=reason)
+                l.warning({
+                    "event": "gemini_retry",
+                    "attempt": attempt,
+                    "reason": reason,
+                    "delay_seconds": round(delay, 3),
+                    "concurrency_limit": int(self.concurrency.limit),
+                    "error": str(error)[:200],
+                })
+                await asyncio.sleep(delay)
+            finally:
+                if probe and not settled:
+                    # Cancelled before an outcome: a probe left claimed would keep the circuit open for good
+                    self.breaker.record_failure()
+
+    async def ainvoke(self,
+                      content: Union[str, List[Any]],
+                      model: str,
+                      temperature: float,
+                      schema: Optional[Type] = None,
+                      deadline: Optional[float] = None) -> Any:
+        loop = self.start()
+        coroutine = self._call(content, model, temperature, schema, deadline or self.deadline)
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    def invoke(self,
+               content: Union[str, List[Any]],
+               model: str,
+               temperature: float,
+               schema: Optional[Type] = None,
+               deadline: Optional[float] = None) -> Any:
+        """
+        Blocking version of ``ainvoke`` for worker threads; never call it from the client's own loop
+        """
+        loop = self.start()
+        coroutine = self._call(content, model, temperature, schema, deadline or self.deadline)
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "circuit": self.breaker.state,
+            "calls": self.calls,
+            "retries": self.retries,
+        }
+
+
+gemini_client = GeminiClient.from_settings(settings)
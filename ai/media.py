@@ -0,0 +1,157 @@
+import base64
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+import requests
+
+from app.logging import l
+from app.settings import get_settings
+
+settings = get_settings()
+
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com"
+
+# Multiple of 3 so every chunk encodes without padding
+BASE64_READ_CHUNK = 3 * 256 * 1024
+# The resumable upload protocol requires chunks in multiples of 256 KiB
+UPLOAD_CHUNK_GRANULARITY = 256 * 1024
+
+
+def iter_base64_chunks(file_path: str, chunk_size: int = BASE64_READ_CHUNK) -> Iterator[bytes]:
+    if chunk_size % 3:
+        raise ValueError("chunk_size must be a multiple of 3")
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield base64.b64encode(chunk)
+
+
+def encode_file_base64(file_path: str, chunk_size: int = BASE64_READ_CHUNK) -> str:
+    """
+    Base64-encodes a file without ever holding its raw bytes in memory
+    """
+    encoded = bytearray()
+    for chunk in iter_base64_chunks(file_path, chunk_size):
+        encoded += chunk
+    return encoded.decode("ascii")
+
+
+class GeminiFileUploadError(Exception):
+    pass
+
+
+class GeminiFileClient:
+    """
+    Minimal client for the Gemini Files API using the resumable upload protocol.
+
+    Every request has a ``(connect, read)`` timeout, so a stalled upload or
+    status poll fails instead of holding its thread. ``requests`` sessions
+    are not thread-safe, so each thread gets its own unless one is given.
+    """
+    def __init__(self,
+                 api_key: str,
+                 base_url: str = GEMINI_API_BASE,
+                 chunk_size: int = 8 * 1024 * 1024,
+                 session: Optional[requests.Session] = None,
+                 poll_interval: float = 1.0,
+                 activation_timeout: float = 300.0,
+                 timeout: Tuple[float, float] = (10.0, 120.0)):
+        if chunk_size % UPLOAD_CHUNK_GRANULARITY:
+            raise ValueError(f"chunk_size must be a multiple of {UPLOAD_CHUNK_GRANULARITY}")
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.chunk_size = chunk_size
+        self._shared_session = session
+        self._local = threading.local()
+        self.poll_interval = poll_interval
+        self.activation_timeout = activation_timeout
+        self.timeout = timeout
+
+    @classmethod
+    def from_settings(cls, settings) -> "GeminiFileClient":
+        return cls(
+            settings.google_api_key,
+            base_url=settings.gemini_base_url or GEMINI_API_BASE,
+            timeout=(settings.gemini_files_connect_timeout, settings.gemini_files_read_timeout),
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        if self._shared_session is not None:
+            return self._shared_session
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _start_upload(self, file_path: str, mime_type: str, size: int) -> str:
+        response = self.session.post(
+            f"{self.base_url}/upload/v1beta/files",
+            params={"key": self.api_key},
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+            },
+            json={"file": {"display_name": os.path.basename(file_path)}},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        upload_url = response.headers.get("X-Goog-Upload-URL")
+        if not upload_url:
+            raise GeminiFileUploadError("Upload session was not created")
+        return upload_url
+
+    def upload(self, file_path: str, mime_type: str) -> Dict[str, Any]:
+        size = os.path.getsize(file_path)
+        upload_url = self._start_upload(file_path, mime_type, size)
+
+        offset = 0
+        response = None
+        with open(file_path, "rb") as f:
+            while offset < size or response is None:
+                chunk = f.read(self.chunk_size)
+                last = offset + len(chunk) >= size
+                response = self.session.post(
+                    upload_url,
+                    headers={
+                        "X-Goog-Upload-Command": "upload, finalize" if last else "upload",
+                        "X-Goog-Upload-Offset": str(offset),
+                    },
+                    data=chunk,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                offset += len(chunk)
+
+        file = response.json()["file"]
+        l.info({"event": "gemini_file_uploaded", "name": file["name"], "bytes": size})
+        return self.wait_until_active(file)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        response = self.session.get(f"{self.base_url}/v1beta/{name}", params={"key": self.api_key}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def wait_until_active(self, file: Dict[str, Any]) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.activation_timeout
+        while file.get("state") == "PROCESSING":
+            if time.monotonic() > deadline:
+                raise GeminiFileUploadError(f"File {file['name']} was not processed in time")
+            time.sleep(self.poll_interval)
+            file = self.get(file["name"])
+
+        if file.get("state") == "FAILED":
+            raise GeminiFileUploadError(f"File {file['name']} failed processing")
+        return file
+
+    def delete(self, name: str) -> None:
+        response = self.session.delete(f"{self.base_url}/v1beta/{name}", params={"key": self.api_key}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+gemini_files = GeminiFileClient.from_settings(settings)
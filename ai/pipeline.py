@@ -0,0 +1,140 @@
+import asyncio
+import contextlib
+import functools
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.logging import l
+
+
+def _call_with_cpu_time(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    # Only counts the worker thread; intra-op pools such as torch's are not included
+    start = time.thread_time()
+    result = func(*args)
+    return result, time.thread_time() - start
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[..., Any]
+    depends_on: Tuple[str, ...] = field(default_factory=tuple)
+    resource: Optional[str] = None
+
+
+class StageGraph:
+    """
+    Runs pipeline stages concurrently, each one as soon as its dependencies are done.
+
+    Stage functions are blocking and receive their dependencies' results as
+    positional arguments, in the order given by ``depends_on``. A dependency can
+    be another stage or one of the named inputs passed to ``run``.
+
+    ``limits`` maps a stage ``resource`` to a semaphore that caps how many
+    stages using it run at once. Sharing the same mapping between graphs
+    applies the caps across all of them. ``on_result`` is called on the event
+    loop with each stage's name and result as soon as that stage finishes.
+    """
+    def __init__(self,
+                 stages: List[Stage],
+                 executor: Optional[Executor] = None,
+                 limits: Optional[Dict[str, asyncio.Semaphore]] = None,
+                 on_result: Optional[Callable[[str, Any], None]] = None):
+        names = [stage.name for stage in stages]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Duplicate stage names: {names}")
+
+        self.stages = stages
+        self.executor = executor
+        self.limits = limits or {}
+        self.on_result = on_result
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.cpu_timings: Dict[str, float] = {}
+        self.failed: List[str] = []
+
+    def _validate(self, inputs: Dict[str, Any]) -> None:
+        known = set(inputs)
+        for stage in self.stages:
+            missing = [dep for dep in stage.depends_on if dep not in known]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown or later stages: {missing}")
+            known.add(stage.name)
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task], inputs: Dict[str, Any]) -> Any:
+        args = []
+        for dep in stage.depends_on:
+            args.append(await tasks[dep] if dep in tasks else inputs[dep])
+
+        limit = self.limits.get(stage.resource) if stage.resource else None
+        async with limit or contextlib.nullcontext():
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                result, cpu_seconds = await loop.run_in_executor(
+                    self.executor, functools.partial(_call_with_cpu_time, stage.func, *args)
+                )
+                self.cpu_timings[stage.name] = cpu_seconds
+            except Exception as e:
+                l.error(f"Stage {stage.name} failed: {str(e)}")
+                self.failed.append(stage.name)
+                raise
+            finally:
+                self.timings[stage.name] = time.perf_counter() - start
+
+        self.results[stage.name] = result
+        if self.on_result is not None:
+            self.on_result(stage.name, result)
+        return result
+
+    async def run(self, **inputs: Any) -> Dict[str, Any]:
+        self._validate(inputs)
+
+        tasks: Dict[str, asyncio.Task] = {}
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.create_task(self._run_stage(stage, tasks, inputs))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return {name: task.result() for name, task in tasks.items()}
+
+
+class RateBudget:
+    """
+    Spaces out calls so no more than ``per_minute`` start in any minute, across threads.
+
+    ``acquire`` blocks until the caller's slot comes up; a budget of 0 or
+    less does not limit anything.
+    """
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Claims the next slot and returns how long to wait for it, for callers that sleep themselves
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        return slot - now
+
+    def acquire(self) -> float:
+        """
+        Returns the seconds spent waiting
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,146 @@
+import csv
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+import ffmpeg
+
+from app.logging import l
+from ai.audio import PCM_SUFFIX, SAMPLING_RATE
+
+
+@dataclass
+class ProxyOptions:
+    height: int = 360
+    fps: float = 1.0
+    crf: int = 30
+    audio_bitrate: str = "32k"
+
+    @classmethod
+    def from_settings(cls, settings) -> "ProxyOptions":
+        return cls(
+            height=settings.proxy_height,
+            fps=settings.proxy_fps,
+            crf=settings.proxy_crf,
+            audio_bitrate=settings.proxy_audio_bitrate,
+        )
+
+
+@dataclass
+class PreprocessedMedia:
+    audio_path: Optional[str]
+    video_path: Optional[str]
+    audio_seconds: float
+
+
+def preprocess_media(file_path: str,
+                     output_dir: str,
+                     audio: bool = True,
+                     proxy: Optional[ProxyOptions] = ProxyOptions()) -> PreprocessedMedia:
+    """
+    Demuxes and decodes the source once into the inputs of both analysis branches.
+
+    ``audio`` writes 16 kHz mono float32 PCM that ASR memory-maps instead of
+    decoding the file again. ``proxy`` writes a downscaled, frame-rate-reduced
+    MP4 with a low-bitrate mono audio track, which is what gets sent to Gemini.
+    """
+    if not audio and proxy is None:
+        raise ValueError("Nothing to produce: enable audio and/or the video proxy")
+
+    source = ffmpeg.input(file_path)
+    outputs = []
+    audio_path = video_path = None
+
+    if audio:
+        audio_path = os.path.join(output_dir, f"audio{PCM_SUFFIX}")
+        outputs.append(
+            source.audio.output(audio_path, format="f32le", acodec="pcm_f32le", ac=1, ar=SAMPLING_RATE)
+        )
+    if proxy is not None:
+        video_path = os.path.join(output_dir, "proxy.mp4")
+        frames = source.video.filter("fps", fps=proxy.fps).filter("scale", -2, f"min(ih,{proxy.height})")
+        outputs.append(
+            ffmpeg.output(
+                frames, source.audio, video_path,
+                vcodec="libx264", preset="veryfast", crf=proxy.crf, pix_fmt="yuv420p",
+                # A keyframe at least every 10 s, so the proxy can be split without re-encoding
+                g=max(1, round(proxy.fps * 10)),
+                # Speech-grade audio; AAC at the source rate costs more CPU than the video encode
+                acodec="aac", audio_bitrate=proxy.audio_bitrate, ac=1, ar=SAMPLING_RATE,
+                movflags="+faststart",
+            )
+        )
+
+    start = time.perf_counter()
+    try:
+        (
+            ffmpeg.merge_outputs(*outputs)
+            .global_args("-nostdin", "-loglevel", "error")
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise Exception(f"ffmpeg failed to preprocess {file_path}: {e.stderr.decode(errors='ignore').strip()}")
+
+    audio_seconds = os.path.getsize(audio_path) / 4 / SAMPLING_RATE if audio_path else 0.0
+    l.info({
+        "event": "media_preprocessed",
+        "file": file_path,
+        "source_bytes": os.path.getsize(file_path),
+        "audio_bytes": os.path.getsize(audio_path) if audio_path else None,
+        "proxy_bytes": os.path.getsize(video_path) if video_path else None,
+        "audio_seconds": round(audio_seconds, 2),
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    return PreprocessedMedia(audio_path, video_path, audio_seconds)
+
+
+@dataclass
+class VideoSegment:
+    path: str
+    start: float
+    end: float
+
+
+def split_video(file_path: str, output_dir: str, segment_seconds: float) -> List[VideoSegment]:
+    """
+    Splits a video into pieces of about ``segment_seconds`` without re-encoding.
+
+    Streams are copied, so each cut lands on the first keyframe after the
+    requested time and pieces can run a little longer. Start and end times
+    come from the segment muxer's own list, in seconds from the start of the
+    source.
+    """
+    pattern = os.path.join(output_dir, "segment-%03d.mp4")
+    listing = os.path.join(output_dir, "segments.csv")
+    start = time.perf_counter()
+    try:
+        (
+            ffmpeg
+            .input(file_path)
+            .output(
+                pattern, c="copy", f="segment", segment_time=segment_seconds, reset_timestamps=1,
+                segment_format="mp4", segment_list=listing, segment_list_type="csv",
+            )
+            .global_args("-nostdin", "-loglevel", "error")
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise Exception(f"ffmpeg failed to split {file_path}: {e.stderr.decode(errors='ignore').strip()}")
+
+    with open(listing, newline="") as f:
+        segments = [
+            VideoSegment(os.path.join(output_dir, name), float(begin), float(end))
+            for name, begin, end in csv.reader(f)
+        ]
+    os.remove(listing)
+
+    l.info({
+        "event": "video_split",
+        "file": file_path,
+        "segments": len(segments),
+        "segment_seconds": segment_seconds,
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    return segments
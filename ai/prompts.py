@@ -18,4 +18,40 @@ Guidelines:
 - Note any significant transitions or changes
 
 Please analyze the video and provide a structured response following the VideoAnalysis model format.
-"""
\ No newline at end of file
+"""
+
+keyframes_prompt = """
+Analyze the following video and provide a detailed scene-by-scene breakdown. Instead of the video itself you are given
+its most representative frames, each preceded by its timestamp in seconds, followed by the transcript of its audio.
+The video is {duration:.1f} seconds long. For each scene:
+
+1. Identify the start and end times in seconds, using the frame timestamps as scene boundaries
+2. Provide a detailed description of what's happening
+3. List key visual elements (people, objects, settings, etc.)
+4. List key audio elements (speech and any sounds the transcript suggests)
+5. Describe the mood/atmosphere
+6. List main actions or events
+
+Guidelines:
+- A scene runs from the frame where it starts until the next scene starts, or the end of the video
+- Consecutive frames showing the same shot belong to the same scene
+- Use the transcript to understand what is said and happening between frames
+- Be specific and detailed in descriptions
+- Maintain chronological order and do not leave gaps between scenes
+
+Please analyze the video and provide a structured response following the VideoAnalysis model format.
+"""
+
+
+segment_prompt = video_extraction_prompt + """
+This video is part {index} of {count} of a longer video. Give all times in seconds from the start of this part, and
+summarize only this part.
+"""
+
+
+segments_summary_prompt = """
+The following are summaries of consecutive parts of one video, in order. Write a brief summary of the entire video
+content as a single paragraph, without referring to the parts.
+
+{summaries}
+"""
@@ -0,0 +1,76 @@
+from typing import Any, Dict, List
+
+
+def normalize_scenes(scenes: List[Dict[str, Any]], duration: float) -> List[Dict[str, Any]]:
+    """
+    Clamps scene times to ``[0, duration]``, swaps inverted bounds and sorts scenes by start time
+    """
+    normalized = []
+    for scene in scenes:
+        start = min(max(float(scene["start_time"]), 0.0), duration)
+        end = min(max(float(scene["end_time"]), 0.0), duration)
+        if end < start:
+            start, end = end, start
+        normalized.append({**scene, "start_time": start, "end_time": end})
+    return sorted(normalized, key=lambda scene: (scene["start_time"], scene["end_time"]))
+
+
+def offset_scenes(scenes: List[Dict[str, Any]], offset: float) -> List[Dict[str, Any]]:
+    return [
+        {**scene, "start_time": scene["start_time"] + offset, "end_time": scene["end_time"] + offset}
+        for scene in scenes
+    ]
+
+
+def element_similarity(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """
+    Jaccard similarity of the visual elements of two scenes, ignoring case
+    """
+    first = {element.strip().lower() for element in a.get("visual_elements", [])}
+    second = {element.strip().lower() for element in b.get("visual_elements", [])}
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _union(first: List[str], second: List[str]) -> List[str]:
+    seen = {item.strip().lower() for item in first}
+    return first + [item for item in second if item.strip().lower() not in seen]
+
+
+def join_scenes(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **a,
+        "end_time": max(a["end_time"], b["end_time"]),
+        "description": f"{a['description']} {b['description']}".strip(),
+        "visual_elements": _union(a.get("visual_elements", []), b.get("visual_elements", [])),
+        "audio_elements": _union(a.get("audio_elements", []), b.get("audio_elements", [])),
+        "mood": a.get("mood") or b.get("mood", ""),
+        "key_actions": _union(a.get("key_actions", []), b.get("key_actions", [])),
+    }
+
+
+def merge_segment_scenes(segments: List[List[Dict[str, Any]]],
+                         boundaries: List[float],
+                         tolerance: float = 2.0,
+                         min_similarity: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Concatenates the scenes of consecutive segments, already on the full video's timeline.
+
+    ``boundaries[i]`` is where segment ``i + 1`` starts. A scene cut in two
+    by a boundary shows up as one scene ending at it and another starting at
+    it with mostly the same visual elements; those are joined back into one.
+    """
+    merged: List[Dict[str, Any]] = []
+    for index, scenes in enumerate(segments):
+        scenes = sorted(scenes, key=lambda scene: scene["start_time"])
+        if merged and scenes and index > 0:
+            boundary = boundaries[index - 1]
+            last, first = merged[-1], scenes[0]
+            if (abs(last["end_time"] - boundary) <= tolerance
+                    and abs(first["start_time"] - boundary) <= tolerance
+                    and element_similarity(last, first) >= min_similarity):
+                merged[-1] = join_scenes(last, first)
+                scenes = scenes[1:]
+        merged.extend(scenes)
+    return merged
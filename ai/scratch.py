@@ -0,0 +1,248 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.logging import l
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+class ScratchQuotaExceeded(Exception):
+    pass
+
+
+@dataclass
+class ScratchFile:
+    path: str
+    reserved: int
+    refs: int = 1
+    ready: threading.Event = field(default_factory=threading.Event)
+    error: Optional[BaseException] = None
+
+
+class ScratchSpace:
+    """
+    Disk budget shared by every job in the process.
+
+    Jobs reserve the expected size of a file before writing it and block until
+    enough of the budget is free; a reservation that can never fit, or does not
+    fit before ``admission_timeout``, raises ``ScratchQuotaExceeded``.
+    """
+    def __init__(self, root: str, max_bytes: int, admission_timeout: float = 60.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.admission_timeout = admission_timeout
+        self.used_bytes = 0
+        self.jobs = 0
+        self._condition = threading.Condition()
+
+    def job(self) -> "ScratchJob":
+        return ScratchJob(self, self.root / f"{os.getpid()}-{uuid.uuid4().hex}")
+
+    def reserve(self, nbytes: int, timeout: Optional[float] = None) -> None:
+        if nbytes > self.max_bytes:
+            raise ScratchQuotaExceeded(f"{nbytes} bytes exceed the scratch quota of {self.max_bytes} bytes")
+        timeout = self.admission_timeout if timeout is None else timeout
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.used_bytes + nbytes <= self.max_bytes, timeout):
+                raise ScratchQuotaExceeded(
+                    f"Timed out waiting for {nbytes} bytes of scratch space "
+                    f"({self.used_bytes}/{self.max_bytes} bytes in use)"
+                )
+            self.used_bytes += nbytes
+
+    def adjust(self, old: int, new: int) -> None:
+        """
+        Replaces a reservation with the actual file size, which may exceed the budget briefly
+        """
+        with self._condition:
+            self.used_bytes += new - old
+            self._condition.notify_all()
+
+    def free(self, nbytes: int) -> None:
+        self.adjust(nbytes, 0)
+
+    def purge_stale(self) -> int:
+        """
+        Removes job directories left behind by processes that are no longer running
+        """
+        if not self.root.exists():
+            return 0
+        removed = 0
+        for directory in self.root.iterdir():
+            pid = directory.name.split("-", 1)[0]
+            if not directory.is_dir() or not pid.isdigit() or _pid_alive(int(pid)):
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            removed += 1
+        if removed:
+            l.info({"event": "scratch_purged", "root": str(self.root), "directories": removed})
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "root": str(self.root),
+            "used_bytes": self.used_bytes,
+            "max_bytes": self.max_bytes,
+            "jobs": self.jobs,
+        }
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScratchJob:
+    """
+    A private directory for one analysis, removed with everything in it on ``close``.
+
+    Files are created once per key with ``fetch`` and shared by reference: each
+    ``fetch`` of a key takes a reference, each ``release`` of its path drops
+    one, and the file is deleted, freeing its quota, when none are left.
+    """
+    def __init__(self, space: ScratchSpace, directory: Path):
+        self.space = space
+        self.directory = directory
+        self.files: Dict[str, ScratchFile] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        with space._condition:
+            space.jobs += 1
+
+    def fetch(self, key: str, expected_bytes: int, write: Callable[[str, str], str]) -> str:
+        """
+        Returns the path of ``key``, calling ``write(directory, filename)`` to create it on first use.
+
+        ``write`` returns the path it wrote to. Concurrent callers for the same
+        key wait for the first one instead of writing the file again.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Scratch job is closed")
+            entry = self.files.get(key)
+            owner = entry is None
+            if owner:
+                entry = self.files[key] = ScratchFile(path="", reserved=0)
+            else:
+                entry.refs += 1
+        if not owner:
+            entry.ready.wait()
+            if entry.error is not None:
+                self.release_key(key)
+                raise entry.error
+            return entry.path
+
+        try:
+            self.space.reserve(expected_bytes)
+            entry.reserved = expected_bytes
+            self.directory.mkdir(parents=True, exist_ok=True)
+            entry.path = write(str(self.directory), key)
+            size = os.path.getsize(entry.path)
+            self.space.adjust(entry.reserved, size)
+            entry.reserved = size
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Scratch job was closed while writing")
+                entry.ready.set()
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                orphaned = self._closed
+                entry.ready.set()
+            if orphaned:
+                # close() leaves files still being written to their writer
+                self._delete(entry)
+                shutil.rmtree(self.directory, ignore_errors=True)
+            else:
+                self.release_key(key)
+            raise
+        return entry.path
+
+    def workspace(self) -> str:
+        """
+        The job directory, for tools that write their own files there; register them with ``adopt``
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return str(self.directory)
+
+    def adopt(self, path: str) -> str:
+        """
+        Takes ownership of a file already written into the job directory, with one reference.
+
+        Its size is charged to the quota after the fact, so it can briefly
+        overshoot the budget instead of waiting for it.
+        """
+        entry = ScratchFile(path=path, reserved=os.path.getsize(path))
+        entry.ready.set()
+        with self._lock:
+            if not self._closed:
+                self.files[os.path.basename(path)] = entry
+                self.space.adjust(0, entry.reserved)
+                return path
+        os.remove(path)
+        raise RuntimeError("Scratch job is closed")
+
+    def release_key(self, key: str) -> None:
+        with self._lock:
+            entry = self.files.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            del self.files[key]
+        self._delete(entry)
+
+    def release(self, path: str) -> None:
+        """
+        Drops a reference by path; paths this job did not create are ignored
+        """
+        with self._lock:
+            key = next((key for key, entry in self.files.items() if entry.path == path), None)
+        if key is not None:
+            self.release_key(key)
+
+    def _delete(self, entry: ScratchFile) -> None:
+        if entry.path and os.path.exists(entry.path):
+            l.info(f"Cleaning up temporary video file: {entry.path}")
+            os.remove(entry.path)
+        self.space.free(entry.reserved)
+        entry.reserved = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            entries = [entry for entry in self.files.values() if entry.ready.is_set()]
+            self.files.clear()
+        for entry in entries:
+            self._delete(entry)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        with self.space._condition:
+            self.space.jobs -= 1
+
+    def __enter__(self) -> "ScratchJob":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+scratch_space = ScratchSpace(
+    root=settings.scratch_dir or os.path.join(tempfile.gettempdir(), "multimodal-extract"),
+    max_bytes=settings.scratch_max_bytes,
+    admission_timeout=settings.scratch_admission_timeout,
+)
@@ -0,0 +1,97 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+from app.settings import Settings
+
+
+@dataclass
+class StreamPolicy:
+    """
+    Caps applied when choosing which YouTube streams to download.
+
+    The video used for the multimodal call keeps its audio track (progressive
+    streams), since the prompt asks for audio elements. Transcription only needs
+    an audio-only stream.
+    """
+    target_resolution: int = 360
+    max_video_bitrate: Optional[int] = None
+    max_video_bytes: Optional[int] = None
+    max_audio_bitrate: Optional[int] = 128_000
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "StreamPolicy":
+        return cls(
+            target_resolution=settings.stream_target_resolution,
+            max_video_bitrate=settings.stream_max_video_bitrate,
+            max_video_bytes=settings.stream_max_video_bytes,
+            max_audio_bitrate=settings.stream_max_audio_bitrate,
+        )
+
+
+def _parse_number(value: Optional[str], suffix: str) -> Optional[int]:
+    if not value:
+        return None
+    match = re.match(rf"(\d+){suffix}", value)
+    return int(match.group(1)) if match else None
+
+
+def stream_height(stream: Any) -> int:
+    return _parse_number(getattr(stream, "resolution", None), "p") or 0
+
+
+def stream_audio_bitrate(stream: Any) -> int:
+    kbps = _parse_number(getattr(stream, "abr", None), "kbps")
+    return kbps * 1000 if kbps else (getattr(stream, "bitrate", None) or 0)
+
+
+def _within(value: Optional[int], cap: Optional[int]) -> bool:
+    return cap is None or value is None or value <= cap
+
+
+def highest_resolution(streams: Iterable[Any]) -> Optional[Any]:
+    """
+    Highest resolution progressive stream, like pytubefix's ``StreamQuery.get_highest_resolution``
+    """
+    candidates = [s for s in streams if s.is_progressive and s.resolution]
+    return max(candidates, key=stream_height, default=None)
+
+
+def select_video_stream(streams: Iterable[Any], policy: StreamPolicy) -> Optional[Any]:
+    """
+    Highest resolution progressive MP4 within the caps, or the smallest one if none fits
+    """
+    candidates: List[Any] = [
+        s for s in streams
+        if s.is_progressive and s.subtype == "mp4" and s.includes_video_track
+    ]
+    if not candidates:
+        return None
+
+    fitting = [
+        s for s in candidates
+        if stream_height(s) <= policy.target_resolution
+        and _within(s.bitrate, policy.max_video_bitrate)
+        and _within(s.filesize, policy.max_video_bytes)
+    ]
+    if fitting:
+        return max(fitting, key=lambda s: (stream_height(s), s.bitrate or 0))
+    return min(candidates, key=lambda s: (stream_height(s), s.bitrate or 0))
+
+
+def select_audio_stream(streams: Iterable[Any], policy: StreamPolicy) -> Optional[Any]:
+    """
+    Highest bitrate audio-only stream within the cap, or the lowest one if none fits
+    """
+    candidates: List[Any] = [
+        s for s in streams
+        if s.includes_audio_track and not s.includes_video_track
+    ]
+    if not candidates:
+        return None
+
+    # Prefer MP4 audio, which every ffmpeg build can demux
+    fitting = [s for s in candidates if _within(stream_audio_bitrate(s), policy.max_audio_bitrate)]
+    if fitting:
+        return max(fitting, key=lambda s: (s.subtype == "mp4", stream_audio_bitrate(s)))
+    return min(candidates, key=lambda s: (s.subtype != "mp4", stream_audio_bitrate(s)))
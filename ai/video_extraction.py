@@ -1,38 +1,70 @@
-import logging
-import os
+import asyncio
 import base64
-import torch
-from typing import Dict, Any, Optional, List
+import dataclasses
+import functools
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime
-from pytubefix import YouTube
 import pytubefix as pytube
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-from langchain_core.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 from app.logging import l
+from app.metrics import (
+    ANALYSIS_SECONDS,
+    ASR_AUDIO_SECONDS,
+    ASR_SKIPPED_SECONDS,
+    DOWNLOAD_BYTES,
+    GEMINI_PAYLOAD_BYTES,
+    STAGE_CPU_SECONDS,
+    STAGE_FAILURES,
+    STAGE_SECONDS,
+)
+from ai.audio import SAMPLING_RATE, EnergyVAD, is_pcm_file, load_pcm
+from ai.asr import PooledASRPipeline, asr_scheduler, transcribe_long_form
+from ai.executors import cpu_pool, io_pool
+from ai.pipeline import Stage, StageGraph
+from ai.llm import gemini_client
+from ai.streams import StreamPolicy, highest_resolution, select_audio_stream, select_video_stream
+from ai.youtube import youtube_resolver
+from ai.media import encode_file_base64, gemini_files
+from ai.scratch import ScratchJob, scratch_space
+from ai.preprocess import PreprocessedMedia, ProxyOptions, VideoSegment, preprocess_media, split_video
+from ai.keyframes import Keyframe, KeyframeOptions, extract_keyframes
+from ai.scenes import merge_segment_scenes, normalize_scenes, offset_scenes
+from ai.cache import result_cache, analysis_key, extract_video_id, prompt_hash, stage_cache_keys, get_cached_stages
+from ai.artifacts import artifact_store
+from ai.inflight import inflight
 from ai.video_extraction_model import VideoAnalysis
-from ai.prompts import video_extraction_prompt
+from ai.prompts import keyframes_prompt, segment_prompt, segments_summary_prompt, video_extraction_prompt
 from app.settings import get_settings
 
 settings = get_settings()
 
 logger = logging.getLogger(__name__)
 
+def format_publish_date(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    return str(value)
+
+
 def collect_metadata(url: str) -> Dict[str, Any]:
     try:
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        yt = YouTube(url)
-        video_stream = yt.streams.get_highest_resolution()
+        # The resolver builds the watch URL from the id, with or without a scheme
+        yt = youtube_resolver.resolve(url)
+        # Picked from the cached manifest, no extra request
+        video_stream = highest_resolution(yt.streams)
         
         metadata = {
             "metadados": {
                 "titulo": yt.title,
                 "descricao": yt.description,
                 "duracao_segundos": yt.length,
-                "data_upload": yt.publish_date.strftime("%Y-%m-%dT%H:%M:%S"),
+                "data_upload": format_publish_date(yt.publish_date),
                 "autor": yt.author,
                 "visualizacoes": yt.views,
                 "id_video": yt.video_id,
@@ -44,64 +76,70 @@ def collect_metadata(url: str) -> Dict[str, Any]:
         
         return metadata
         
+    except ValueError:
+        raise
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
         raise Exception(f"Video processing error: {str(e)}")
     
 
-def generate_transcript(video_path: str) -> Dict[str, Any]:
+def format_segments(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "inicio": chunk["timestamp"][0],
+            "fim": chunk["timestamp"][1],
+            "texto": chunk["text"]
+        }
+        for chunk in chunks
+    ]
+
+
+def generate_transcript(video_path: str,
+                        on_segments: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
     try:
+        # Inference runs on the CPU pool's warm model, in a worker process when it has any
+        pipe = PooledASRPipeline(cpu_pool)
+        generate_kwargs = {
+            "task": "transcribe",
+            "language": "english"
+        }
         
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        
-        model_id = settings.speech_model
-        
-        model = AutoModelForSpeechSeq2Seq.from_pretrained(
-            model_id, 
-            torch_dtype=torch_dtype,
-            low_cpu_mem_usage=True,
-            use_safetensors=True
-        )
-        model.to(device)
-        
-        processor = AutoProcessor.from_pretrained(model_id)
-        
-        pipe = pipeline(
-            "automatic-speech-recognition",
-            model=model,
-            tokenizer=processor.tokenizer,
-            feature_extractor=processor.feature_extractor,
-            torch_dtype=torch_dtype,
-            device=device,
-        )
-        
-        result = pipe(
-            video_path,
-            return_timestamps=True,
-            generate_kwargs={
-                "task": "transcribe",
-                "language": "english"
-            }
-        )
-        
-        os.remove(video_path)
+        if settings.asr_long_form:
+            vad = EnergyVAD(
+                threshold_db=settings.vad_threshold_db,
+                padding_ms=settings.vad_padding_ms,
+                max_gap_ms=settings.vad_max_gap_ms,
+            ) if settings.asr_vad_enabled else None
+            result = transcribe_long_form(
+                asr_scheduler if settings.asr_scheduler_enabled else pipe,
+                video_path,
+                chunk_length_s=settings.asr_chunk_length_s,
+                overlap_s=settings.asr_chunk_overlap_s,
+                batch_size=settings.asr_batch_size,
+                generate_kwargs=generate_kwargs,
+                vad=vad,
+                on_chunks=(lambda chunks: on_segments(format_segments(chunks))) if on_segments else None,
+            )
+            if "vad" in result:
+                ASR_SKIPPED_SECONDS.inc(result["vad"]["skipped_seconds"])
+                l.info({"event": "vad_completed", "file": video_path, **result["vad"]})
+            ASR_AUDIO_SECONDS.inc(result["audio_seconds"])
+        else:
+            # The pipeline would hand a path to ffmpeg, which cannot tell raw float32 samples apart from a container
+            inputs = {"raw": load_pcm(video_path), "sampling_rate": SAMPLING_RATE} if is_pcm_file(video_path) else video_path
+            result = pipe(
+                inputs,
+                return_timestamps=True,
+                generate_kwargs=generate_kwargs
+            )
         
         formatted_transcript = {
             "transcricao": {
                 "texto_completo": result["text"],
-                "segmentos": []
+                "segmentos": format_segments(result["chunks"])
             }
         }
         
-        for chunk in result["chunks"]:
-            segment = {
-                "inicio": chunk["timestamp"][0],
-                "fim": chunk["timestamp"][1],
-                "texto": chunk["text"]
-            }
-            formatted_transcript["transcricao"]["segmentos"].append(segment)
-        
         return formatted_transcript
         
     except Exception as e:
@@ -109,79 +147,556 @@ def generate_transcript(video_path: str) -> Dict[str, Any]:
         raise Exception(f"Transcript generation error: {str(e)}")
     
 
-def analyze_video_with_structured_output(video_base64: str, 
+def invoke_structured_llm(content: List[Any], model: str, temperature: float) -> Dict[str, Any]:
+    return gemini_client.invoke(content, model, temperature, schema=VideoAnalysis).model_dump()
+
+
+def analyze_video_with_structured_output(video: Union[str, Dict[str, Any]], 
                                          prompt: str = video_extraction_prompt, 
                                          model: str = settings.model, 
                                          temperature: float = settings.temperature,
                                          ) -> Dict[str, Any]:
 
-    llm = ChatGoogleGenerativeAI(
-        model=model,
-        temperature=temperature,
-        max_tokens=None,
-        timeout=None,
-        max_retries=2,
-        google_api_key=settings.google_api_key
-    )
+    if isinstance(video, str):
+        video = {
+            "type": "media",
+            "mime_type": "video/mp4",
+            "data": video
+        }
 
-    structured_llm = llm.with_structured_output(VideoAnalysis)
-    message = HumanMessage(
-        content=[
-            {"type": "text", "text": prompt},
-            {
-                "type": "media",
-                "mime_type": "video/mp4",
-                "data": video_base64
-            }
-        ]
+    return invoke_structured_llm([{"type": "text", "text": prompt}, video], model, temperature)
+
+
+def extract_video_keyframes(file_path: str) -> Tuple[List[Keyframe], float]:
+    return cpu_pool.call(extract_keyframes, file_path, KeyframeOptions.from_settings(settings))
+
+
+def analyze_keyframes_with_structured_output(keyframes: Tuple[List[Keyframe], float],
+                                             transcript: Dict[str, Any],
+                                             prompt: str = keyframes_prompt,
+                                             model: str = settings.model,
+                                             temperature: float = settings.temperature,
+                                             ) -> Dict[str, Any]:
+    """
+    Analyzes a video from its keyframes and transcript, without sending the video itself
+    """
+    frames, duration = keyframes
+    content: List[Any] = [{"type": "text", "text": prompt.format(duration=duration)}]
+    payload_bytes = 0
+    for frame in frames:
+        image = base64.b64encode(frame.jpeg).decode("ascii")
+        payload_bytes += len(image)
+        content.append({"type": "text", "text": f"Frame at {frame.timestamp:.1f}s:"})
+        content.append({"type": "image_url", "image_url": f"data:image/jpeg;base64,{image}"})
+    GEMINI_PAYLOAD_BYTES.inc(payload_bytes, transport="keyframes")
+
+    segments = "\n".join(
+        f"[{segment['inicio']}-{segment['fim']}] {segment['texto']}"
+        for segment in transcript["transcricao"]["segmentos"]
     )
-    
-    response = structured_llm.invoke([message])
-    return response.model_dump()
+    content.append({"type": "text", "text": f"Transcript:\n{segments or transcript['transcricao']['texto_completo']}"})
+
+    analysis = invoke_structured_llm(content, model, temperature)
+    analysis["scenes"] = normalize_scenes(analysis["scenes"], duration)
+    return analysis
+
+def download_stream(stream, kind: str, job: Optional[ScratchJob] = None) -> str:
+    """
+    Downloads a stream into the job's scratch directory, shared with any other
+    stage of the job that asks for the same file. Without a job the file gets a
+    unique name in the scratch root and the caller owns it.
+    """
+    filename = f"{kind}.{stream.subtype or 'mp4'}"
 
-def download_youtube_video(url: str) -> str:
-    yt = YouTube(url)
-    video = yt.streams.get_highest_resolution()
-    return video.download()
+    def write(directory: str, name: str) -> str:
+        path = stream.download(output_path=directory, filename=name)
+        DOWNLOAD_BYTES.inc(stream.filesize or 0, kind=kind)
+        return path
+
+    if job is None:
+        scratch_space.root.mkdir(parents=True, exist_ok=True)
+        return write(str(scratch_space.root), f"{uuid.uuid4().hex}-{filename}")
+    return job.fetch(filename, stream.filesize or 0, write)
+
+def download_youtube_video(url: str, job: Optional[ScratchJob] = None) -> str:
+    yt = youtube_resolver.resolve(url)
+    video = select_video_stream(yt.streams, StreamPolicy.from_settings(settings))
+    if video is None:
+        raise Exception(f"No downloadable video stream for {url}")
+    l.info({"event": "video_stream_selected", "resolution": video.resolution, "bytes": video.filesize})
+    return download_stream(video, "video", job)
+
+def download_youtube_audio(url: str, job: Optional[ScratchJob] = None) -> str:
+    yt = youtube_resolver.resolve(url)
+    audio = select_audio_stream(yt.streams, StreamPolicy.from_settings(settings))
+    if audio is None:
+        l.warning(f"No audio-only stream for {url}, transcribing the video stream")
+        return download_youtube_video(url, job=job)
+    l.info({"event": "audio_stream_selected", "abr": audio.abr, "bytes": audio.filesize})
+    return download_stream(audio, "audio", job)
 
 def load_video(file_path: str) -> str:
-    with open(file_path, "rb") as f:
-        video_bytes = f.read()
-    video_base64 = base64.b64encode(video_bytes).decode("utf-8")
-    return video_base64
+    # Stays in this process: from a worker process the whole base64 string would come back pickled
+    return encode_file_base64(file_path)
+
+def upload_video(file_path: str) -> Dict[str, Any]:
+    file = gemini_files.upload(file_path, mime_type="video/mp4")
+    GEMINI_PAYLOAD_BYTES.inc(int(file.get("sizeBytes", 0)), transport="upload")
+    return {
+        "type": "media",
+        "mime_type": file.get("mimeType", "video/mp4"),
+        "file_uri": file["uri"]
+    }
 
+def prepare_video_part(file_path: str) -> Dict[str, Any]:
+    if settings.video_transport == "upload":
+        return upload_video(file_path)
+    video_base64 = load_video(file_path)
+    GEMINI_PAYLOAD_BYTES.inc(len(video_base64), transport="inline")
+    return {
+        "type": "media",
+        "mime_type": "video/mp4",
+        "data": video_base64
+    }
+
+def delete_uploaded_video(video_part: Dict[str, Any]) -> None:
+    if "file_uri" not in video_part:
+        return
+    name = "files/" + video_part["file_uri"].rsplit("/files/", 1)[-1]
+    try:
+        gemini_files.delete(name)
+    except Exception as e:
+        l.warning(f"Could not delete uploaded video {name}: {str(e)}")
 
 
-async def analyze_youtube_video(url: str) -> Dict[str, Any]:
+def split_video_segments(file_path: str, job: ScratchJob) -> List[VideoSegment]:
+    segments = split_video(file_path, job.workspace(), settings.segment_minutes * 60)
+    for segment in segments:
+        job.adopt(segment.path)
+    return segments
 
+
+def analyze_video_segment(segment: VideoSegment, index: int, count: int, job: ScratchJob) -> Dict[str, Any]:
+    """
+    Analyzes one piece of a video and moves its scenes onto the full video's timeline
+    """
+    try:
+        video_part = prepare_video_part(segment.path)
+    finally:
+        job.release(segment.path)
     try:
+        analysis = analyze_video_with_structured_output(
+            video_part, prompt=segment_prompt.format(index=index + 1, count=count)
+        )
+    finally:
+        delete_uploaded_video(video_part)
+    scenes = normalize_scenes(analysis["scenes"], segment.end - segment.start)
+    return {"scenes": offset_scenes(scenes, segment.start), "summary": analysis["summary"]}
 
-        video_path = download_youtube_video(url)
-        l.info(f"Video {url[:10]} downloaded to: {video_path}")
 
-        video_base64 = load_video(video_path)
-        
-        multimodal_analysis = analyze_video_with_structured_output(video_base64)
-        l.info("Multimodal analysis completed")
+def summarize_segments(summaries: List[str],
+                       model: str = settings.model,
+                       temperature: float = settings.temperature) -> str:
+    if len(summaries) == 1:
+        return summaries[0]
+    parts = "\n\n".join(f"Part {index}: {summary}" for index, summary in enumerate(summaries, 1))
+    response = gemini_client.invoke(segments_summary_prompt.format(summaries=parts), model, temperature)
+    return str(response.content).strip()
 
-        metadata = collect_metadata(url)
-        l.info("Metadata collection completed")
 
-        transcript = generate_transcript(video_path)
-        l.info("Transcript generation completed")
+def analyze_segmented_video(segments: List[VideoSegment], job: ScratchJob) -> Dict[str, Any]:
+    """
+    Analyzes the pieces of a video concurrently and merges them into one analysis.
 
-        l.info("Analysis completed successfully")
-        return {
-            **metadata,
-            **transcript,
-            **multimodal_analysis,
+    Up to ``segment_concurrency`` pieces are in flight at once, and every
+    call goes through the shared Gemini client and its limits.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.segment_concurrency, len(segments))),
+                            thread_name_prefix="segment") as pool:
+        futures = [
+            pool.submit(analyze_video_segment, segment, index, len(segments), job)
+            for index, segment in enumerate(segments)
+        ]
+        try:
+            analyses = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    scenes = merge_segment_scenes(
+        [analysis["scenes"] for analysis in analyses],
+        [segment.start for segment in segments[1:]],
+        tolerance=settings.segment_stitch_tolerance,
+        min_similarity=settings.segment_stitch_similarity,
+    )
+    summary = summarize_segments([analysis["summary"] for analysis in analyses])
+    l.info({
+        "event": "segments_analyzed",
+        "segments": len(segments),
+        "scenes": sum(len(analysis["scenes"]) for analysis in analyses),
+        "merged_scenes": len(scenes),
+        "seconds": round(time.perf_counter() - start, 3),
+    })
+    return {"scenes": scenes, "summary": summary}
+
+
+
+def record_stage_metrics(graph: StageGraph, url: str, status: str, elapsed: float) -> None:
+    for stage, seconds in graph.timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        STAGE_CPU_SECONDS.inc(graph.cpu_timings.get(stage, 0.0), stage=stage)
+    for stage in graph.failed:
+        STAGE_FAILURES.inc(stage=stage)
+    ANALYSIS_SECONDS.observe(elapsed, status=status)
+    l.info({
+        "event": "analysis_timings",
+        "url": url,
+        "status": status,
+        "wall_seconds": round(elapsed, 4),
+        "stages": {
+            stage: {
+                "wall_seconds": round(seconds, 4),
+                "cpu_seconds": round(graph.cpu_timings.get(stage, 0.0), 4),
+            }
+            for stage, seconds in graph.timings.items()
+        },
+    })
+
+
+def preprocess_video(file_path: str,
+                     job: ScratchJob,
+                     audio: bool = True,
+                     video_id: Optional[str] = None) -> PreprocessedMedia:
+    """
+    With ``video_id`` the proxy is also kept in the artifact store, for re-analyses
+    """
+    media = preprocess_media(
+        file_path,
+        job.workspace(),
+        audio=audio,
+        proxy=ProxyOptions.from_settings(settings),
+    )
+    for path in (media.audio_path, media.video_path):
+        if path:
+            job.adopt(path)
+    if video_id and media.video_path and artifact_store is not None:
+        try:
+            artifact_store.put_file(video_id, "proxy", media.video_path, artifact_inputs()["proxy"])
+        except OSError as e:
+            l.warning(f"Could not store the proxy of {video_id}: {str(e)}")
+    return media
+
+
+def releasing(func: Callable[..., Any],
+              job: ScratchJob,
+              select: Optional[Callable[[Any], str]] = None) -> Callable[..., Any]:
+    """
+    Wraps a stage that consumes a scratch file so it drops its reference when done.
+
+    ``select`` picks the path out of the upstream result when it is not the path itself.
+    """
+    def run(source: Any, *args: Any) -> Any:
+        path = select(source) if select else source
+        try:
+            return func(path, *args)
+        finally:
+            job.release(path)
+    return run
+
+
+PARTIAL_STAGES = ("metadata", "transcript", "multimodal_analysis")
+
+
+def analysis_prompt(mode: str) -> str:
+    if mode == "keyframes":
+        return keyframes_prompt
+    if mode == "segmented":
+        return segment_prompt
+    return video_extraction_prompt
+
+
+def transcript_options() -> Dict[str, Any]:
+    """
+    Settings besides the speech model that change the transcript
+    """
+    return {
+        "speech_backend": settings.speech_backend,
+        "vad": settings.asr_vad_enabled and {
+            "threshold_db": settings.vad_threshold_db,
+            "padding_ms": settings.vad_padding_ms,
+            "max_gap_ms": settings.vad_max_gap_ms,
+        },
+        "long_form": settings.asr_long_form and {
+            "chunk_length_s": settings.asr_chunk_length_s,
+            "chunk_overlap_s": settings.asr_chunk_overlap_s,
+        },
+    }
+
+
+def analysis_options(mode: str) -> Dict[str, Any]:
+    """
+    Settings besides the model, temperature and prompt that change the scenes
+    """
+    options: Dict[str, Any] = {"mode": mode, "media_preprocess": settings.media_preprocess}
+    if mode == "segmented":
+        options["segments"] = {
+            "summary_prompt": prompt_hash(segments_summary_prompt),
+            "minutes": settings.segment_minutes,
+            "stitch_tolerance": settings.segment_stitch_tolerance,
+            "stitch_similarity": settings.segment_stitch_similarity,
         }
+    elif mode == "keyframes":
+        options["keyframes"] = dataclasses.asdict(KeyframeOptions.from_settings(settings))
+    return options
+
+
+def analysis_cache_keys(video_id: str) -> Dict[str, str]:
+    mode = settings.analysis_mode
+    return stage_cache_keys(
+        video_id,
+        prompt=analysis_prompt(mode),
+        model=settings.model,
+        temperature=settings.temperature,
+        speech_model=settings.speech_model,
+        transcript_options=transcript_options(),
+        analysis_options=analysis_options(mode),
+    )
+
+
+def artifact_inputs() -> Dict[str, Dict[str, Any]]:
+    """
+    What each stored artifact was produced from; a change in any of it makes the artifact stale
+    """
+    mode = settings.analysis_mode
+    return {
+        "metadata": {},
+        "transcript": {"speech_model": settings.speech_model, **transcript_options()},
+        "proxy": dataclasses.asdict(ProxyOptions.from_settings(settings)),
+        "multimodal_analysis": {
+            "mode": mode,
+            "model": settings.model,
+            "temperature": settings.temperature,
+            "prompt": prompt_hash(analysis_prompt(mode)),
+            **analysis_options(mode),
+        },
+    }
+
+
+def cache_results(keys: Dict[str, str], results: Dict[str, Any]) -> None:
+    for stage, key in keys.items():
+        if stage in results:
+            result_cache.set(key, results[stage])
+
+
+def store_artifacts(video_id: str, results: Dict[str, Any], stored: Dict[str, Any]) -> None:
+    inputs = artifact_inputs()
+    try:
+        for stage in PARTIAL_STAGES:
+            if stage not in stored:
+                artifact_store.put(video_id, stage, results[stage], inputs[stage])
+    except OSError as e:
+        l.warning(f"Could not store the artifacts of {video_id}: {str(e)}")
+
+
+def build_stages(cached: Dict[str, Any],
+                 job: ScratchJob,
+                 transcribe: Callable[..., Dict[str, Any]],
+                 proxy: Optional[str] = None,
+                 video_id: Optional[str] = None) -> List[Stage]:
+    """
+    The stages still needed to complete an analysis, given the ``cached`` stage results.
+
+    A stored ``proxy`` replaces the download and preprocessing of the video
+    when the analysis needs it. ``video_id`` keeps the proxy the media stage
+    makes in the artifact store.
+    """
+    keyframes = settings.analysis_mode == "keyframes"
+    segmented = settings.analysis_mode == "segmented"
+    stages = []
+    if "metadata" not in cached:
+        stages.append(Stage("metadata", collect_metadata, ("url",)))
+    need_vision = "multimodal_analysis" not in cached
+    need_transcript = "transcript" not in cached
+    if not (need_vision and settings.media_preprocess and not keyframes):
+        proxy = None
+    if need_vision and proxy is None:
+        stages.append(Stage("download", functools.partial(download_youtube_video, job=job), ("url",), resource="download"))
+    if need_vision and keyframes:
+        # Only a few frames and the transcript text are sent instead of the video
+        stages.append(Stage("keyframes", releasing(extract_video_keyframes, job), ("download",)))
+    elif need_vision:
+        source, select = "download", None
+        if proxy is not None:
+            # Paths outside the job are left alone by ``releasing``
+            source = "proxy"
+        elif settings.media_preprocess:
+            # One decode feeds both branches: PCM for ASR and a small proxy for Gemini
+            preprocess = functools.partial(preprocess_video, job=job, audio=need_transcript, video_id=video_id)
+            stages.append(Stage("media", releasing(preprocess, job), ("download",)))
+            source, select = "media", lambda media: media.video_path
+        if segmented:
+            stages.append(Stage("video_segments", releasing(functools.partial(split_video_segments, job=job), job, select=select), (source,)))
+            stages.append(Stage("multimodal_analysis", functools.partial(analyze_segmented_video, job=job), ("video_segments",), resource="llm"))
+        else:
+            stages.append(Stage("video_part", releasing(prepare_video_part, job, select=select), (source,)))
+            stages.append(Stage("multimodal_analysis", analyze_video_with_structured_output, ("video_part",), resource="llm"))
+
+    if need_transcript and need_vision and settings.media_preprocess and not keyframes and proxy is None:
+        stages.append(Stage("transcript", releasing(transcribe, job, select=lambda media: media.audio_path), ("media",), resource="asr"))
+    elif need_transcript:
+        # Without the video an audio-only stream is the cheapest input
+        stages.append(Stage("download_audio", functools.partial(download_youtube_audio, job=job), ("url",), resource="download"))
+        stages.append(Stage("transcript", releasing(transcribe, job), ("download_audio",), resource="asr"))
+    if need_vision and keyframes:
+        stages.append(Stage("multimodal_analysis", analyze_keyframes_with_structured_output, ("keyframes", "transcript"), resource="llm"))
+    return stages
+
+
+async def analyze_youtube_video(url: str,
+                                limits: Optional[Dict[str, asyncio.Semaphore]] = None,
+                                listener: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Runs the full analysis of one video.
+
+    ``listener`` is called with ``(stage, result)`` as each of ``PARTIAL_STAGES``
+    becomes available, cached ones first, and with ``("segments", [...])`` as
+    transcript segments are decoded. Segment calls come from a worker thread.
+    Before any stage runs it also gets ``("stages", {"run": [...], "skipped": [...]})``,
+    the stages planned and those made unnecessary by cached results and stored artifacts.
+
+    Without a listener, concurrent calls for the same video and analysis
+    settings share one run, in this worker or any other using the same
+    shared state backend.
+    """
+    video_id = extract_video_id(url)
+    if listener is None and video_id:
+        key = analysis_key(video_id, analysis_cache_keys(video_id))
+        return await inflight.run(key, lambda: run_youtube_analysis(url, limits))
+    return await run_youtube_analysis(url, limits, listener)
+
+
+async def run_youtube_analysis(url: str,
+                               limits: Optional[Dict[str, asyncio.Semaphore]] = None,
+                               listener: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    video_id = extract_video_id(url)
+    cache_keys = analysis_cache_keys(video_id) if video_id else {}
+    # Off the event loop: the disk cache reads files and the memory cache deep-copies multi-MB transcripts
+    cached = await asyncio.to_thread(get_cached_stages, cache_keys)
+    stored: Dict[str, Any] = {}
+    if artifact_store is not None and video_id:
+        stored = await asyncio.to_thread(artifact_store.load, video_id, artifact_inputs())
+        if stored:
+            l.info({"event": "artifacts_loaded", "video_id": video_id, "artifacts": sorted(stored)})
+        cached = {**{stage: stored[stage] for stage in PARTIAL_STAGES if stage in stored}, **cached}
+    if listener is not None:
+        for stage in PARTIAL_STAGES:
+            if stage in cached:
+                listener(stage, cached[stage])
+
+    transcribe = generate_transcript
+    if listener is not None:
+        transcribe = functools.partial(generate_transcript, on_segments=lambda segments: listener("segments", segments))
+
+    # Closed however the setup below fails, so the job directory and its quota are always released
+    with scratch_space.job() as job:
+        stages = build_stages(
+            cached,
+            job,
+            transcribe,
+            proxy=stored.get("proxy"),
+            video_id=video_id if artifact_store is not None else None,
+        )
+        planned = [stage.name for stage in stages]
+        skipped = [stage.name for stage in build_stages({}, job, transcribe) if stage.name not in planned]
+        if skipped:
+            l.info({"event": "stages_skipped", "url": url, "stages": skipped})
+        if listener is not None:
+            listener("stages", {"run": planned, "skipped": skipped})
+
+        def on_result(stage: str, result: Any) -> None:
+            if listener is not None and stage in PARTIAL_STAGES:
+                listener(stage, result)
+
+        graph = StageGraph(stages, executor=io_pool, limits=limits, on_result=on_result)
+        inputs = {"url": url}
+        if "proxy" in stored:
+            inputs["proxy"] = stored["proxy"]
+        if "transcript" in cached:
+            # The keyframes analysis still reads a cached transcript
+            inputs["transcript"] = cached["transcript"]
+        start = time.perf_counter()
+        status = "error"
+
+        try:
+
+            results = {**cached, **await graph.run(**inputs)}
+            for stage in ("download", "download_audio"):
+                if stage in results:
+                    l.info(f"Video {url[:10]} downloaded to: {results[stage]}")
+
+            await asyncio.to_thread(cache_results, cache_keys, graph.results)
+            if artifact_store is not None and video_id:
+                await asyncio.to_thread(store_artifacts, video_id, results, stored)
+
+            l.info("Analysis completed successfully")
+            status = "ok"
+            return {
+                **results["metadata"],
+                **results["transcript"],
+                **results["multimodal_analysis"],
+            }
     
-    except Exception as e:
-        l.error(f"Error during video analysis: {str(e)}")
-        raise
+        except Exception as e:
+            l.error(f"Error during video analysis: {str(e)}")
+            raise
     
+        finally:
+            record_stage_metrics(graph, url, status, time.perf_counter() - start)
+            if "video_part" in graph.results:
+                delete_uploaded_video(graph.results["video_part"])
+
+
+async def stream_youtube_analysis(url: str) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Runs ``run_youtube_analysis`` and yields ``(event, data)`` pairs as results become available.
+
+    Events are ``metadados``, ``segmentos`` (possibly several times, in order),
+    ``transcricao`` with the full text, ``scenes`` with the Gemini analysis and
+    finally ``done``. Segments are sent in one go when the transcript was not
+    produced progressively, e.g. when it came from the cache.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def listener(stage: str, result: Any) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, (stage, result))
+
+    start = time.perf_counter()
+    task = asyncio.create_task(run_youtube_analysis(url, listener=listener))
+    # Scheduled after every listener call made while the task ran, so it always arrives last
+    task.add_done_callback(lambda _: loop.call_soon_threadsafe(queue.put_nowait, None))
+
+    streamed_segments = False
+    try:
+        while (item := await queue.get()) is not None:
+            stage, result = item
+            if stage == "metadata":
+                yield "metadados", result["metadados"]
+            elif stage == "segments":
+                streamed_segments = True
+                yield "segmentos", result
+            elif stage == "transcript":
+                if not streamed_segments:
+                    yield "segmentos", result["transcricao"]["segmentos"]
+                yield "transcricao", {"texto_completo": result["transcricao"]["texto_completo"]}
+            elif stage == "multimodal_analysis":
+                yield "scenes", result
+
+        task.result()
+        yield "done", {"elapsed_seconds": round(time.perf_counter() - start, 3)}
     finally:
-        if os.path.exists(video_path):
-            l.info(f"Cleaning up temporary video file: {video_path}")
-            os.remove(video_path)
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
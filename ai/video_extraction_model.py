@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from datetime import datetime
 
 class Scene(BaseModel):
@@ -25,4 +25,21 @@ class Scene(BaseModel):
 
 class VideoAnalysis(BaseModel):
     scenes: List[Scene] = Field(description="List of analyzed scenes")
-    summary: str = Field(description="Brief summary of the entire video content")
\ No newline at end of file
+    summary: str = Field(description="Brief summary of the entire video content")
+
+class TranscriptSegment(BaseModel):
+    inicio: Optional[float] = None
+    fim: Optional[float] = None
+    texto: str
+
+class Transcript(BaseModel):
+    texto_completo: str
+    segmentos: List[TranscriptSegment] = Field(default_factory=list)
+
+class AnalysisResult(VideoAnalysis):
+    """
+    Shape of a full analysis as returned by the API. Built from stages whose
+    outputs are already validated, so responses are serialized without it.
+    """
+    metadados: Dict[str, Any]
+    transcricao: Transcript
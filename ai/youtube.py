@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+from pytubefix import YouTube, request
+
+from app.logging import l
+from app.metrics import YOUTUBE_LOOKUPS
+from ai.cache import MemoryLRUCache, extract_video_id
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+def watch_url(video_id: str) -> str:
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+@dataclass(frozen=True)
+class StreamDescriptor:
+    """
+    What the pipeline needs of a pytubefix ``Stream``.
+
+    A ``Stream`` keeps its ``YouTube`` alive, watch page and player response
+    included, so the resolver caches these instead and downloads by URL.
+    """
+    video_id: str
+    itag: int
+    url: str
+    mime_type: str
+    subtype: str
+    resolution: Optional[str]
+    abr: Optional[str]
+    bitrate: Optional[int]
+    filesize: int
+    is_progressive: bool
+    includes_video_track: bool
+    includes_audio_track: bool
+    is_sabr: bool
+    expires_at: Optional[float]
+
+    @classmethod
+    def from_stream(cls, video_id: str, stream: Any) -> "StreamDescriptor":
+        expire = parse_qs(urlparse(stream.url).query).get("expire")
+        return cls(
+            video_id=video_id,
+            itag=stream.itag,
+            url=stream.url,
+            mime_type=stream.mime_type,
+            subtype=stream.subtype,
+            resolution=stream.resolution,
+            abr=stream.abr,
+            bitrate=stream.bitrate,
+            filesize=stream.filesize,
+            is_progressive=stream.is_progressive,
+            includes_video_track=stream.includes_video_track,
+            includes_audio_track=stream.includes_audio_track,
+            is_sabr=stream.is_sabr,
+            expires_at=float(expire[0]) if expire else None,
+        )
+
+    def download(self, output_path: str, filename: str) -> str:
+        if self.is_sabr:
+            # SABR streams are served through the player session, which only a fresh page fetch provides
+            stream = YouTube(watch_url(self.video_id)).streams.get_by_itag(self.itag)
+            if stream is None:
+                raise Exception(f"Stream {self.itag} of {self.video_id} is no longer offered")
+            return stream.download(output_path=output_path, filename=filename)
+
+        path = os.path.join(output_path, filename)
+        with open(path, "wb") as f:
+            for chunk in request.stream(self.url):
+                f.write(chunk)
+        return path
+
+
+def usable_stream(stream: Any) -> bool:
+    """
+    Progressive and audio-only streams, the only ones the pipeline downloads
+    """
+    return stream.is_progressive or (stream.includes_audio_track and not stream.includes_video_track)
+
+
+@dataclass(frozen=True)
+class ResolvedVideo:
+    """
+    What one fetch of a watch page tells us about a video. Treated as read-only once cached.
+    """
+    video_id: str
+    title: str
+    description: str
+    length: int
+    publish_date: Any
+    author: str
+    views: int
+    thumbnail_url: str
+    streams: Tuple[StreamDescriptor, ...]
+    fetched_at: float
+
+
+class YouTubeResolver:
+    """
+    Fetches each video's watch page and stream manifest once and shares the result.
+
+    Videos are keyed by id, so every URL form of the same video hits the same
+    entry. Entries live for ``ttl_seconds``, which should stay below the
+    lifetime of YouTube's signed stream URLs (about six hours). Concurrent
+    lookups of a video that is not cached wait for a single fetch.
+    """
+    def __init__(self,
+                 ttl_seconds: float,
+                 max_entries: int,
+                 factory: Optional[Callable[[str], Any]] = None):
+        self.cache = MemoryLRUCache(max_entries, ttl_seconds, copy_values=False)
+        self.factory = factory
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, url: str) -> ResolvedVideo:
+        video_id = extract_video_id(url)
+        if video_id is None:
+            raise ValueError(f"Not a YouTube video URL: {url}")
+
+        with self._lock:
+            video = self.cache.get(video_id)
+            if video is not None:
+                YOUTUBE_LOOKUPS.inc(result="hit")
+                return video
+            future = self._inflight.get(video_id)
+            owner = future is None
+            if owner:
+                future = self._inflight[video_id] = Future()
+        if not owner:
+            YOUTUBE_LOOKUPS.inc(result="shared")
+            return future.result()
+
+        YOUTUBE_LOOKUPS.inc(result="miss")
+        try:
+            video = self._fetch(video_id)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.cache.set(video_id, video)
+            future.set_result(video)
+            return video
+        finally:
+            with self._lock:
+                del self._inflight[video_id]
+
+    def _fetch(self, video_id: str) -> ResolvedVideo:
+        start = time.perf_counter()
+        yt = (self.factory or YouTube)(watch_url(video_id))
+        video = ResolvedVideo(
+            video_id=yt.video_id,
+            title=yt.title,
+            description=yt.description,
+            length=yt.length,
+            publish_date=yt.publish_date,
+            author=yt.author,
+            views=yt.views,
+            thumbnail_url=yt.thumbnail_url,
+            # Descriptors only, so the cache does not hold on to ``yt``
+            streams=tuple(StreamDescriptor.from_stream(yt.video_id, s) for s in yt.streams if usable_stream(s)),
+            fetched_at=time.time(),
+        )
+        l.info({"event": "youtube_resolved", "video_id": video_id, "seconds": round(time.perf_counter() - start, 3)})
+        return video
+
+    def invalidate(self, url: str) -> None:
+        video_id = extract_video_id(url)
+        if video_id is not None:
+            self.cache.delete(video_id)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+youtube_resolver = YouTubeResolver(
+    ttl_seconds=settings.youtube_cache_ttl_seconds,
+    max_entries=settings.youtube_cache_max_entries,
+)
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from enum import Enum
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pydantic import BaseModel
+
+from app.logging import l
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+FINISHED = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+class Job(BaseModel):
+    id: str
+    url: str
+    status: JobStatus = JobStatus.QUEUED
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobStore(ABC):
+    """
+    Jobs by id. Finished jobs, results included, are kept for
+    ``retention_seconds`` after they finish and at most ``max_finished`` at
+    a time, oldest first out; queued and running jobs are never dropped.
+    """
+    @abstractmethod
+    def create(self, job: Job) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> Optional[Job]:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self, retention_seconds: float = 3600.0, max_finished: int = 1000):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+        # Finished job ids in the order they finished, so eviction pops from the front
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and finished_at > now - self.retention_seconds:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+
+    def create(self, job: Job) -> None:
+        with self._lock:
+            self._evict(time.time())
+            self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._evict(time.time())
+            return self._jobs.get(job_id)
+
+    def update(self, job_id: str, **fields: Any) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = job.model_copy(update={**fields, "updated_at": time.time()})
+            self._jobs[job_id] = job
+            if job.status in FINISHED:
+                self._finished.pop(job_id, None)
+                self._finished[job_id] = job.updated_at
+                self._evict(job.updated_at)
+            return job
+
+
+class SQLiteJobStore(JobStore):
+    def __init__(self, path: str, retention_seconds: float = 3600.0, max_finished: int = 1000):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        # Several API workers may share the file; wait for their writes instead of failing
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, url TEXT NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at)")
+
+    def _evict(self, now: float) -> None:
+        finished = tuple(status.value for status in FINISHED)
+        self._conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at <= ?",
+            finished + (now - self.retention_seconds,),
+        )
+        self._conn.execute(
+            "DELETE FROM jobs WHERE id IN ("
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            finished + (self.max_finished,),
+        )
+
+    @staticmethod
+    def _to_row(job: Job) -> tuple:
+        result = json.dumps(job.result) if job.result is not None else None
+        return (job.id, job.url, job.status.value, result, job.error, job.created_at, job.updated_at)
+
+    @staticmethod
+    def _from_row(row: tuple) -> Job:
+        job_id, url, status, result, error, created_at, updated_at = row
+        return Job(
+            id=job_id,
+            url=url,
+            status=status,
+            result=json.loads(result) if result is not None else None,
+            error=error,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+
+    def create(self, job: Job) -> None:
+        with self._lock, self._conn:
+            self._evict(time.time())
+            self._conn.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)", self._to_row(job))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = self._from_row(row)
+        # Expired jobs still in the file until the next write are not served
+        if job.status in FINISHED and job.updated_at <= time.time() - self.retention_seconds:
+            return None
+        return job
+
+    def update(self, job_id: str, **fields: Any) -> Optional[Job]:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._from_row(row).model_copy(update={**fields, "updated_at": time.time()})
+            self._conn.execute(
+                "UPDATE jobs SET url = ?, status = ?, result = ?, error = ?, created_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                self._to_row(job)[1:] + (job.id,),
+            )
+            if job.status in FINISHED:
+                self._evict(job.updated_at)
+            return job
+
+
+def create_job_store(backend: str,
+                     path: str,
+                     retention_seconds: float = 3600.0,
+                     max_finished: int = 1000) -> JobStore:
+    if backend == "memory":
+        return InMemoryJobStore(retention_seconds, max_finished)
+    if backend == "sqlite":
+        return SQLiteJobStore(path, retention_seconds, max_finished)
+    raise ValueError(f"Unknown job store backend: {backend}")
+
+
+class JobManager:
+    """
+    Bounded queue of analysis jobs processed by a fixed pool of asyncio workers.
+
+    Store calls run in a worker thread, as the SQLite store blocks on disk
+    and on other processes' locks.
+    """
+    def __init__(self,
+                 store: JobStore,
+                 runner: Callable[[str], Awaitable[Dict[str, Any]]],
+                 workers: int,
+                 max_queue: int):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        l.info(f"Started {self.workers} job workers (queue size {self.max_queue})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, url: str) -> Job:
+        await self.start()
+        if self._queue.full():
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} pending jobs)")
+
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, url=url, created_at=now, updated_at=now)
+        await asyncio.to_thread(self.store.create, job)
+        try:
+            self._queue.put_nowait(job.id)
+        except asyncio.QueueFull:
+            # Another submission took the last slot while this one was being stored
+            error = f"Job queue is full ({self.max_queue} pending jobs)"
+            await asyncio.to_thread(self.store.update, job.id, status=JobStatus.FAILED, error=error)
+            raise JobQueueFull(error)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+        }
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await asyncio.to_thread(self.store.update, job_id, status=JobStatus.RUNNING)
+                if job is None:
+                    continue
+                l.info(f"Worker {index} running job {job_id}")
+                result = await self.runner(job.url)
+                await asyncio.to_thread(self.store.update, job_id, status=JobStatus.COMPLETED, result=result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                l.error(f"Job {job_id} failed: {str(e)}")
+                await asyncio.to_thread(self.store.update, job_id, status=JobStatus.FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,210 @@
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        ...
+
+    def render(self) -> str:
+        header = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(header + self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: per-bucket counts (not cumulative), sum and count
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process registry rendered in the Prometheus text exposition format
+    """
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "pipeline_stage_seconds", "Wall time of each analysis pipeline stage", ["stage"])
+STAGE_CPU_SECONDS = metrics.counter(
+    "pipeline_stage_cpu_seconds_total", "CPU time of the thread running each pipeline stage", ["stage"])
+STAGE_FAILURES = metrics.counter(
+    "pipeline_stage_failures_total", "Pipeline stages that raised", ["stage"])
+ANALYSIS_SECONDS = metrics.histogram(
+    "analysis_seconds", "End-to-end wall time of analyze_youtube_video", ["status"])
+ANALYSIS_REQUESTS = metrics.counter(
+    "analysis_requests_total",
+    "Analysis requests by how they were served: run (ran the pipeline), coalesced (joined a run in this worker) "
+    "or shared (took another worker's result)", ["result"])
+DOWNLOAD_BYTES = metrics.counter(
+    "download_bytes_total", "Bytes downloaded from YouTube", ["kind"])
+YOUTUBE_LOOKUPS = metrics.counter(
+    "youtube_lookups_total", "Video page lookups by cache result: hit, shared (joined a fetch) or miss", ["result"])
+GEMINI_PAYLOAD_BYTES = metrics.counter(
+    "gemini_payload_bytes_total", "Video bytes sent to Gemini, base64 size for inline payloads", ["transport"])
+GEMINI_TOKENS = metrics.counter(
+    "gemini_tokens_total", "Gemini token usage", ["model", "type"])
+GEMINI_REQUEST_SECONDS = metrics.histogram(
+    "gemini_request_seconds", "Latency of each Gemini request attempt", ["status"])
+GEMINI_RETRIES = metrics.counter(
+    "gemini_retries_total", "Gemini requests retried after a failure", ["reason"])
+GEMINI_CONCURRENCY_LIMIT = metrics.gauge(
+    "gemini_concurrency_limit", "Current adaptive limit on concurrent Gemini requests")
+GEMINI_CIRCUIT_OPEN = metrics.gauge(
+    "gemini_circuit_open", "1 while the Gemini circuit breaker rejects calls")
+ASR_AUDIO_SECONDS = metrics.counter(
+    "asr_audio_seconds_total", "Seconds of source audio transcribed")
+ASR_SKIPPED_SECONDS = metrics.counter(
+    "asr_vad_skipped_seconds_total", "Seconds of audio skipped by voice activity detection")
+ASR_BATCH_SIZE = metrics.histogram(
+    "asr_batch_size", "Audio windows per ASR forward pass", buckets=(1, 2, 4, 8, 16, 32, 64))
+ASR_QUEUE_DEPTH = metrics.gauge(
+    "asr_scheduler_queue_depth", "Audio windows waiting for the ASR scheduler")
+POOL_WORKERS = metrics.gauge(
+    "worker_pool_workers", "Workers of each executor pool, 0 when tasks run in the caller", ["pool"])
+POOL_IN_FLIGHT = metrics.gauge(
+    "worker_pool_tasks_in_flight", "Tasks submitted to each pool that have not finished, running or queued", ["pool"])
+POOL_BUSY_SECONDS = metrics.counter(
+    "worker_pool_busy_seconds_total", "Time workers of each pool spent running tasks; divide its rate by the workers for utilization", ["pool"])
+POOL_QUEUE_SECONDS = metrics.histogram(
+    "worker_pool_queue_seconds", "Time tasks waited for a free worker", ["pool"])
+POOL_TASKS = metrics.counter(
+    "worker_pool_tasks_total", "Tasks finished by each pool", ["pool", "status"])
+JOB_QUEUE_DEPTH = metrics.gauge(
+    "job_queue_depth", "Analysis jobs waiting for a worker")
+RESPONSE_BYTES = metrics.counter(
+    "http_response_bytes_total", "Bytes of analysis responses as sent, after compression", ["format", "encoding"])
+RESPONSE_UNCOMPRESSED_BYTES = metrics.counter(
+    "http_response_uncompressed_bytes_total", "Bytes of analysis responses before compression", ["format", "encoding"])
+SCRATCH_USED_BYTES = metrics.gauge(
+    "scratch_used_bytes", "Scratch disk space reserved or used by downloads")
@@ -0,0 +1,128 @@
+import asyncio
+import gzip
+from typing import Any, Dict, Optional, Tuple
+import orjson
+import zstandard
+from fastapi import Request, Response
+
+from app.metrics import RESPONSE_BYTES, RESPONSE_UNCOMPRESSED_BYTES
+from app.settings import get_settings
+
+try:
+    import ormsgpack
+except ImportError:
+    # MessagePack is only offered when ormsgpack is installed; clients asking for it get JSON
+    ormsgpack = None
+
+settings = get_settings()
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+
+# Server preference when the client accepts several encodings with the same weight
+ENCODINGS = ("zstd", "gzip")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    JSON as UTF-8 bytes; values JSON has no type for are written as strings, like ``json.dumps(default=str)``
+    """
+    return orjson.dumps(content, default=str)
+
+
+def _weights(header: str) -> Dict[str, float]:
+    weights = {}
+    for part in header.split(","):
+        token, *params = [item.strip() for item in part.split(";")]
+        if not token:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[token.lower()] = weight
+    return weights
+
+
+def negotiate(accept: str = "", accept_encoding: str = "") -> Tuple[str, Optional[str]]:
+    """
+    Picks the response media type from ``Accept`` and the compression from ``Accept-Encoding``.
+
+    MessagePack is chosen only when asked for at least as strongly as JSON;
+    anything else gets JSON. Returns ``(media_type, encoding)``, with no
+    encoding when the client accepts neither zstd nor gzip.
+    """
+    media_type = JSON
+    types = _weights(accept)
+    msgpack_weight = max((types.get(name, 0.0) for name in MSGPACK_TYPES), default=0.0)
+    if ormsgpack is not None and msgpack_weight > 0 and msgpack_weight >= types.get(JSON, 0.0):
+        media_type = MSGPACK
+
+    encodings = _weights(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    best, encoding = 0.0, None
+    for name in ENCODINGS:
+        weight = encodings.get(name, wildcard)
+        if weight > best:
+            best, encoding = weight, name
+    return media_type, encoding
+
+
+def render(content: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK:
+        return ormsgpack.packb(content, default=str)
+    return dumps(content)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.response_zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=settings.response_gzip_level, mtime=0)
+
+
+async def encoded_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """
+    Serializes ``content`` in the format and compression the client asked for.
+
+    Meant for content built from already validated models, so it goes
+    straight to bytes without FastAPI's ``jsonable_encoder`` pass and
+    response model validation. Bodies under ``response_compress_min_bytes``
+    are sent uncompressed; larger ones are compressed in a worker thread,
+    as that takes long enough on multi-megabyte analyses to stall the event loop.
+    """
+    media_type, encoding = negotiate(request.headers.get("accept", ""), request.headers.get("accept-encoding", ""))
+    body = render(content, media_type)
+    uncompressed = len(body)
+    if encoding is not None and uncompressed >= settings.response_compress_min_bytes:
+        body = await asyncio.to_thread(compress, body, encoding)
+    else:
+        encoding = None
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    labels = {"format": "msgpack" if media_type == MSGPACK else "json", "encoding": encoding or "identity"}
+    RESPONSE_UNCOMPRESSED_BYTES.inc(uncompressed, **labels)
+    RESPONSE_BYTES.inc(len(body), **labels)
+    return Response(body, status_code=status_code, headers=headers, media_type=media_type)
+
+
+def summarize_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What is worth logging about an analysis: its size and counts, not its text
+    """
+    metadata = analysis.get("metadados") or {}
+    transcript = analysis.get("transcricao") or {}
+    return {
+        "video_id": metadata.get("id_video"),
+        "duration_seconds": metadata.get("duracao_segundos"),
+        "transcript_chars": len(transcript.get("texto_completo") or ""),
+        "segments": len(transcript.get("segmentos") or []),
+        "scenes": len(analysis.get("scenes") or []),
+        "summary_chars": len(analysis.get("summary") or ""),
+    }
@@ -1,40 +1,157 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl
+import asyncio
 import time
 from app.settings import get_settings
 from app.logging import l
+from app.responses import dumps, encoded_response, summarize_analysis
 from typing import List, Dict, Optional
 from datetime import datetime
 
-from ai.video_extraction import analyze_youtube_video
+from ai.video_extraction import analyze_youtube_video, stream_youtube_analysis
+from ai.video_extraction_model import AnalysisResult
+from ai.batch import iter_batch_ndjson, resolve_batch
+from ai.asr import asr_registry, asr_scheduler
+from ai.llm import gemini_client
+from ai.executors import cpu_pool, io_pool
+from ai.inflight import inflight
+from app.jobs import JobManager, JobQueueFull, create_job_store
+from ai.scratch import ScratchQuotaExceeded, scratch_space
+from app.metrics import ASR_QUEUE_DEPTH, JOB_QUEUE_DEPTH, SCRATCH_USED_BYTES, metrics
 
 router = APIRouter()
 
+
+async def run_analysis_job(url: str) -> Dict:
+    return await analyze_youtube_video(url)
+
+
+def create_job_manager() -> JobManager:
+    settings = get_settings()
+    return JobManager(
+        store=create_job_store(
+            settings.job_store,
+            settings.job_store_path,
+            settings.job_retention_seconds,
+            settings.job_max_finished,
+        ),
+        runner=run_analysis_job,
+        workers=settings.job_workers,
+        max_queue=settings.job_queue_size,
+    )
+
+
+job_manager = create_job_manager()
+
 class YouTubeURL(BaseModel):
     url: HttpUrl
 
+class BatchRequest(BaseModel):
+    urls: List[str]
+
 class VideoAnalysis(BaseModel):
     metadados: Dict
     transcricao: Dict
     elementos_visuais: List[Dict]
 
-@router.post("/api/youtube/analyze/")
+# Documented only: the route sends pre-serialized bytes, which FastAPI does not validate
+@router.post("/api/youtube/analyze/", responses={200: {"model": AnalysisResult}})
 async def analyze_youtube_video_endpoint(
+    request: Request,
     youtube_url: str,
+    background: bool = False,
 ):
 
+    if background:
+        try:
+            job = await job_manager.submit(youtube_url)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        l.info(f"Queued job {job.id} for YouTube URL: {youtube_url}")
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job.id, "status": job.status.value}
+        )
+
     try:
         l.info(f"Received YouTube URL: {youtube_url}")
         analysis = await analyze_youtube_video(youtube_url)
-        l.info(f"Analysis: {analysis}")
-        return analysis
+        response = await encoded_response(request, analysis)
+        l.info({
+            "event": "analysis_response",
+            "url": youtube_url,
+            **summarize_analysis(analysis),
+            "media_type": response.media_type,
+            "encoding": response.headers.get("content-encoding", "identity"),
+            "bytes": len(response.body),
+        })
+        return response
+    except ScratchQuotaExceeded as e:
+        raise HTTPException(status_code=503, detail=f"Server busy: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error analyzing video: {str(e)}"
         )
 
+def format_stream_event(event: str, data: Dict, stream_format: str) -> str:
+    payload = dumps(data).decode("utf-8")
+    if stream_format == "ndjson":
+        return f'{{"event": "{event}", "data": {payload}}}\n'
+    return f"event: {event}\ndata: {payload}\n\n"
+
+@router.api_route("/api/youtube/analyze/stream", methods=["GET", "POST"])
+async def analyze_youtube_video_stream(
+    youtube_url: str,
+    stream_format: str = Query("sse", alias="format"),
+):
+    if stream_format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be sse or ndjson")
+
+    l.info(f"Received YouTube URL for streaming: {youtube_url}")
+
+    async def events():
+        try:
+            async for event, data in stream_youtube_analysis(youtube_url):
+                yield format_stream_event(event, data, stream_format)
+        except Exception as e:
+            yield format_stream_event("error", {"detail": f"Error analyzing video: {str(e)}"}, stream_format)
+
+    media_type = "application/x-ndjson" if stream_format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/api/youtube/analyze/batch")
+async def analyze_batch_endpoint(request: BatchRequest):
+    settings = get_settings()
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="No URLs given")
+
+    try:
+        videos, duplicates = await asyncio.to_thread(resolve_batch, request.urls)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error resolving URLs: {str(e)}")
+
+    if len(videos) > settings.batch_max_urls:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch has {len(videos)} videos, the limit is {settings.batch_max_urls}"
+        )
+
+    l.info(f"Received batch of {len(videos)} videos ({duplicates} duplicates dropped)")
+    return StreamingResponse(iter_batch_ndjson(videos, duplicates), media_type="application/x-ndjson")
+
+@router.get("/api/youtube/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return await encoded_response(request, job.model_dump(mode="json"))
+
 @router.get("/info")
 async def info():
     settings = get_settings()
@@ -42,5 +159,19 @@ async def info():
     return {
         "app_name": settings.app_name,
         "model": settings.model,
-        "temperature": settings.temperature
+        "temperature": settings.temperature,
+        "speech_model": settings.speech_model,
+        "asr_models": asr_registry.stats(),
+        "asr_scheduler": asr_scheduler.stats(),
+        "scratch": scratch_space.stats(),
+        "gemini": gemini_client.stats(),
+        "pools": {"io": io_pool.stats(), "cpu": cpu_pool.stats()},
+        "inflight": inflight.stats()
     }
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    ASR_QUEUE_DEPTH.set(asr_scheduler.stats()["queue_depth"])
+    JOB_QUEUE_DEPTH.set(job_manager.stats()["queued"])
+    SCRATCH_USED_BYTES.set(scratch_space.stats()["used_bytes"])
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,7 @@
 import os
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     app_name: str = "Youtube Video Analysis"
@@ -8,6 +9,88 @@ class Settings(BaseSettings):
     model: str
     temperature: float
     speech_model: str
+    speech_backend: str = "hf"
+    asr_num_threads: Optional[int] = None
+    asr_long_form: bool = True
+    asr_chunk_length_s: float = 30.0
+    asr_chunk_overlap_s: float = 4.0
+    asr_batch_size: int = 8
+    asr_scheduler_enabled: bool = True
+    asr_vad_enabled: bool = True
+    vad_threshold_db: float = -40.0
+    vad_padding_ms: int = 300
+    vad_max_gap_ms: int = 1000
+    asr_max_batch_size: int = 16
+    asr_max_wait_ms: float = 20.0
+    io_workers: int = 32
+    cpu_workers: int = 0
+    video_transport: str = "upload"
+    analysis_mode: str = "video"
+    keyframes_per_minute: float = 12.0
+    keyframes_max_frames: int = 64
+    keyframes_sample_fps: float = 2.0
+    keyframes_width: int = 512
+    keyframes_height: int = 288
+    keyframes_min_score: float = 0.1
+    segment_minutes: float = 5.0
+    segment_concurrency: int = 4
+    segment_stitch_tolerance: float = 2.0
+    segment_stitch_similarity: float = 0.5
+    gemini_requests_per_minute: float = 60.0
+    gemini_base_url: str = ""
+    gemini_initial_concurrency: int = 4
+    gemini_min_concurrency: int = 1
+    gemini_max_concurrency: int = 16
+    gemini_target_latency: float = 120.0
+    gemini_max_attempts: int = 5
+    gemini_backoff_base: float = 1.0
+    gemini_backoff_max: float = 30.0
+    gemini_attempt_timeout: float = 300.0
+    gemini_deadline: float = 600.0
+    gemini_breaker_threshold: int = 5
+    gemini_files_connect_timeout: float = 10.0
+    gemini_files_read_timeout: float = 120.0
+    gemini_breaker_cooldown: float = 30.0
+    media_preprocess: bool = True
+    proxy_height: int = 360
+    proxy_fps: float = 1.0
+    proxy_crf: int = 30
+    proxy_audio_bitrate: str = "32k"
+    youtube_cache_ttl_seconds: float = 1800.0
+    youtube_cache_max_entries: int = 1024
+    stream_target_resolution: int = 360
+    stream_max_video_bitrate: Optional[int] = None
+    stream_max_video_bytes: Optional[int] = 200 * 1024 * 1024
+    stream_max_audio_bitrate: Optional[int] = 128_000
+    state_backend: str = "memory"
+    state_path: str = "state.db"
+    inflight_lease_seconds: float = 30.0
+    inflight_poll_seconds: float = 0.5
+    inflight_result_ttl_seconds: float = 60.0
+    job_workers: int = 2
+    job_queue_size: int = 16
+    job_store: str = "memory"
+    job_store_path: str = "jobs.db"
+    job_retention_seconds: float = 3600.0
+    job_max_finished: int = 1000
+    cache_backend: str = "memory"
+    cache_dir: str = ".cache/results"
+    cache_ttl_seconds: int = 7 * 24 * 3600
+    cache_max_entries: int = 512
+    cache_max_bytes: int = 512 * 1024 * 1024
+    artifacts_enabled: bool = False
+    artifact_dir: str = ".cache/artifacts"
+    scratch_dir: str = ""
+    scratch_max_bytes: int = 2 * 1024 * 1024 * 1024
+    scratch_admission_timeout: float = 300.0
+    batch_max_urls: int = 200
+    response_compress_min_bytes: int = 1024
+    response_gzip_level: int = 6
+    response_zstd_level: int = 3
+    batch_max_videos: int = 4
+    batch_download_concurrency: int = 4
+    batch_asr_concurrency: int = 1
+    batch_llm_concurrency: int = 4
 
     class Config:
         env_file = ".env"
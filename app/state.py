@@ -0,0 +1,278 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+from starlette.middleware.base import RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.responses import Response
+from throttled.fastapi import MiddlewareLimiter
+from throttled.fastapi.base import HTTPLimitExceeded, default_response_factory
+from throttled.models import Hit, Rate
+from throttled.storage import BaseStorage
+# throttled has no public base for windows; its own Redis storage builds on these.
+# The dependency is pinned to the 0.2 series in pyproject.toml for that reason.
+from throttled.storage._abstract import _HitsWindow, _WindowManager
+from throttled.storage._duration import DUR_REGISTRY, DurationCalcType
+from throttled.strategies import Strategies
+
+from app.settings import get_settings
+
+settings = get_settings()
+
+
+class SharedState(ABC):
+    """
+    State that every API worker sharing the backend sees: expiring counters,
+    expiring JSON values and leases with a single owner at a time
+    """
+    @abstractmethod
+    def incr(self, key: str, amount: int, ttl: float) -> Tuple[int, float]:
+        """
+        Adds ``amount`` to a counter that starts at 0 and resets ``ttl`` seconds after its first increment.
+        Returns the new value and the seconds left before the reset.
+        """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Takes the lease if it is free, expired or already ``owner``'s, extending it by ``ttl`` seconds
+        """
+
+    @abstractmethod
+    def release(self, key: str, owner: str) -> None:
+        ...
+
+    @abstractmethod
+    def holder(self, key: str) -> Optional[str]:
+        ...
+
+
+class MemorySharedState(SharedState):
+    """
+    Shared by the threads and tasks of one process only
+    """
+    def __init__(self):
+        self._counters: Dict[str, Tuple[int, float]] = {}
+        self._values: Dict[str, Tuple[Any, float]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, amount: int, ttl: float) -> Tuple[int, float]:
+        now = time.time()
+        with self._lock:
+            value, expires_at = self._counters.get(key, (0, 0.0))
+            if expires_at <= now:
+                value, expires_at = 0, now + ttl
+            value += amount
+            self._counters[key] = (value, expires_at)
+            # Drop other expired counters now and then so per-client keys do not pile up
+            if len(self._counters) % 1024 == 0:
+                self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+        return value, expires_at - now
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._values[key]
+                return None
+            return json.loads(entry[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        # Stored as JSON so readers get their own copy, as from the SQLite backend
+        payload = json.dumps(value)
+        with self._lock:
+            self._values[key] = (payload, now + ttl)
+            # Values not read again are dropped now and then, as counters are
+            if len(self._values) % 1024 == 0:
+                self._values = {k: v for k, v in self._values.items() if v[1] > now}
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            current = self._leases.get(key)
+            if current is not None and current[1] > now and current[0] != owner:
+                return False
+            self._leases[key] = (owner, now + ttl)
+            return True
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(key, ("", 0.0))[0] == owner:
+                del self._leases[key]
+
+    def holder(self, key: str) -> Optional[str]:
+        with self._lock:
+            current = self._leases.get(key)
+            return current[0] if current is not None and current[1] > time.time() else None
+
+
+class SQLiteSharedState(SharedState):
+    """
+    State in a SQLite file, shared by every process on the host that opens it.
+
+    Each operation is a single statement, so it is atomic across processes
+    without holding a lock between calls. WAL mode lets readers proceed
+    while another process writes, and with it ``synchronous=NORMAL`` only
+    syncs at checkpoints instead of on every commit: a power loss may drop
+    the last few counter hits or leases, which all expire anyway. Calls
+    block, so async code runs them in a worker thread.
+    """
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _execute(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _maybe_purge(self, now: float) -> None:
+        if now - self._purged_at < self.PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        with self._lock:
+            for table in ("counters", "entries", "leases"):
+                self._conn.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (now,))
+
+    def incr(self, key: str, amount: int, ttl: float) -> Tuple[int, float]:
+        now = time.time()
+        self._maybe_purge(now)
+        value, expires_at = self._execute(
+            "INSERT INTO counters VALUES (?1, ?2, ?3) ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN expires_at <= ?4 THEN ?2 ELSE value + ?2 END, "
+            "expires_at = CASE WHEN expires_at <= ?4 THEN ?3 ELSE expires_at END "
+            "RETURNING value, expires_at",
+            (key, amount, now + ttl, now),
+        )
+        return value, expires_at - now
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._execute("SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time()))
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        self._maybe_purge(now)
+        self._execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, json.dumps(value), now + ttl))
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        row = self._execute(
+            "INSERT INTO leases VALUES (?1, ?2, ?3) ON CONFLICT(key) DO UPDATE SET "
+            "owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at <= ?4 OR leases.owner = excluded.owner "
+            "RETURNING owner",
+            (key, owner, now + ttl, now),
+        )
+        return row is not None
+
+    def release(self, key: str, owner: str) -> None:
+        self._execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def holder(self, key: str) -> Optional[str]:
+        row = self._execute("SELECT owner FROM leases WHERE key = ? AND expires_at > ?", (key, time.time()))
+        return row[0] if row else None
+
+
+def create_shared_state(backend: str, path: str) -> SharedState:
+    if backend == "memory":
+        return MemorySharedState()
+    if backend == "sqlite":
+        return SQLiteSharedState(path)
+    raise ValueError(f"Unknown shared state backend: {backend}")
+
+
+class _SharedWindow(_HitsWindow):
+    def __init__(self, state: SharedState, key: str, duration: float):
+        self.state = state
+        self.key = key
+        self.duration = duration
+        self.remaining = duration
+
+    def incr(self, hits: int = 1) -> int:
+        value, self.remaining = self.state.incr(self.key, hits, self.duration)
+        return value
+
+    def get_remaining_seconds(self) -> float:
+        return self.remaining
+
+
+class _SharedWindowManager(_WindowManager):
+    def __init__(self, state: SharedState, prefix: str, interval: float, duration_func: DurationCalcType):
+        self.state = state
+        self.prefix = prefix
+        self.interval = interval
+        self.duration_func = duration_func
+
+    def get_current_window(self, hit: Hit) -> _SharedWindow:
+        return _SharedWindow(self.state, f"{self.prefix}:{hit.key}", self.duration_func(hit.time, self.interval))
+
+
+class SharedLimiterStorage(BaseStorage):
+    """
+    ``throttled`` storage on a ``SharedState``, so every worker counts against the same limits
+    """
+    def __init__(self, state: SharedState):
+        self.state = state
+
+    def get_window_manager(self, strategy: Strategies, limit: Rate) -> _SharedWindowManager:
+        return _SharedWindowManager(
+            self.state,
+            prefix=f"limit:{strategy.name.lower()}:{limit.hits}/{limit.interval}",
+            interval=limit.interval,
+            duration_func=DUR_REGISTRY[strategy],
+        )
+
+
+# Paths throttled's own middleware leaves out of the limits
+UNLIMITED_PATHS = ("docs", "redoc", "favicon.ico", "openapi.json")
+
+
+def threaded_dispatch(limiter: MiddlewareLimiter):
+    """
+    Middleware dispatch for a throttled limiter that counts the hit in a worker thread.
+
+    throttled's own ``dispatch`` calls the storage on the event loop, which
+    with the SQLite backend is a write that may wait on other workers' locks.
+    """
+    async def dispatch(request: Request, call_next: RequestResponseEndpoint) -> Response:
+        path = str(request.url).replace(str(request.base_url), "")
+        if path not in UNLIMITED_PATHS:
+            try:
+                await asyncio.to_thread(limiter, request)
+            except HTTPLimitExceeded as exc:
+                return default_response_factory(exc)
+        return await call_next(request)
+    return dispatch
+
+
+shared_state = create_shared_state(settings.state_backend, settings.state_path)
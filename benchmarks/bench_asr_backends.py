@@ -0,0 +1,106 @@
+"""
+Real-time factor and word agreement of the ASR backends on the bundled sample clip.
+
+    uv run python benchmarks/bench_asr_backends.py --backends hf int8 --threads 4
+
+RTF is transcription wall time divided by audio duration (lower is faster).
+Agreement is 1 - word error rate, against the reference text and against the
+first backend listed.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import torch
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.asr import ASR_BACKENDS, build_asr_pipeline, configure_torch_threads
+from ai.audio import SAMPLING_RATE, decode_audio_stream
+from app.settings import get_settings
+
+FIXTURES = Path(__file__).parent / "fixtures"
+SAMPLE_CLIP = FIXTURES / "sample_speech.ogg"
+SAMPLE_REFERENCE = FIXTURES / "sample_speech.txt"
+
+
+def words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_agreement(reference: str, hypothesis: str) -> float:
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return 1.0 if not hyp else 0.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return max(0.0, 1 - previous[-1] / len(ref))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(ASR_BACKENDS), choices=list(ASR_BACKENDS))
+    parser.add_argument("--model", default=None, help="Defaults to SPEECH_MODEL")
+    parser.add_argument("--clip", default=str(SAMPLE_CLIP))
+    parser.add_argument("--reference", default=str(SAMPLE_REFERENCE))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    model_id = args.model or get_settings().speech_model
+    configure_torch_threads(args.threads)
+    audio = np.concatenate(list(decode_audio_stream(args.clip)))
+    duration = len(audio) / SAMPLING_RATE
+    reference = Path(args.reference).read_text() if Path(args.reference).exists() else None
+    generate_kwargs = {"task": "transcribe", "language": "english"}
+
+    results = []
+    for backend in args.backends:
+        device, torch_dtype = ASR_BACKENDS[backend].resolve("cpu", torch.float32)
+        start = time.perf_counter()
+        pipe = build_asr_pipeline(model_id, device, torch_dtype, backend)
+        load_seconds = time.perf_counter() - start
+
+        # The first call pays for lazy initialisation, keep it out of the timings
+        pipe({"raw": audio, "sampling_rate": SAMPLING_RATE}, generate_kwargs=generate_kwargs)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            text = pipe({"raw": audio, "sampling_rate": SAMPLING_RATE}, generate_kwargs=generate_kwargs)["text"]
+            timings.append(time.perf_counter() - start)
+
+        results.append({
+            "backend": backend,
+            "model": model_id,
+            "threads": torch.get_num_threads(),
+            "load_seconds": round(load_seconds, 3),
+            "rtf": round(float(np.median(timings)) / duration, 4),
+            "agreement_with_reference": round(word_agreement(reference, text), 4) if reference else None,
+            "text": text.strip(),
+        })
+
+    baseline = results[0]
+    for row in results:
+        row["agreement_with_" + baseline["backend"]] = round(word_agreement(baseline["text"], row["text"]), 4)
+        print(f"{row['backend']:>6}  RTF {row['rtf']:<8} load {row['load_seconds']}s  "
+              f"reference agreement {row['agreement_with_reference']}  "
+              f"{baseline['backend']} agreement {row['agreement_with_' + baseline['backend']]}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"clip": args.clip, "duration_seconds": round(duration, 2), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
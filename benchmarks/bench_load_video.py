@@ -0,0 +1,104 @@
+"""
+Peak RSS of base64-encoding a video for the inline Gemini payload.
+
+Each measurement runs in a fresh interpreter so ru_maxrss only reflects that encoder:
+
+    uv run python benchmarks/bench_load_video.py --size-mb 64 128
+"""
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+
+def legacy_encode(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        video_bytes = f.read()
+    return base64.b64encode(video_bytes).decode("utf-8")
+
+
+def streaming_encode(file_path: str) -> str:
+    from ai.media import encode_file_base64
+    return encode_file_base64(file_path)
+
+
+ENCODERS = {
+    "legacy": legacy_encode,
+    "streaming": streaming_encode,
+}
+
+
+def max_rss_bytes() -> int:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def run_worker(encoder: str, file_path: str) -> None:
+    if encoder == "streaming":
+        import ai.media  # noqa: F401  keep import cost out of the measurement
+    before = max_rss_bytes()
+    encoded = ENCODERS[encoder](file_path)
+    peak = max_rss_bytes()
+    print(json.dumps({"encoded_bytes": len(encoded), "baseline_rss": before, "peak_rss": peak}))
+
+
+def measure(encoder: str, file_path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, "--worker", encoder, file_path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--worker", nargs=2, metavar=("ENCODER", "FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker)
+        return
+
+    results = []
+    for size_mb in args.size_mb:
+        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+            file_path = f.name
+        try:
+            for encoder in ENCODERS:
+                sample = measure(encoder, file_path)
+                growth = sample["peak_rss"] - sample["baseline_rss"]
+                results.append({
+                    "encoder": encoder,
+                    "file_mb": size_mb,
+                    "peak_rss_growth_mb": round(growth / 1024 / 1024, 1),
+                    "growth_vs_file_size": round(growth / (size_mb * 1024 * 1024), 2),
+                })
+        finally:
+            os.remove(file_path)
+
+    for row in results:
+        print(f"{row['encoder']:>10} {row['file_mb']:>5} MB  peak +{row['peak_rss_growth_mb']} MB "
+              f"({row['growth_vs_file_size']}x file size)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Offline latency and memory benchmark of the analysis pipeline.
+
+Synthetic videos are generated with ffmpeg. YouTube, Gemini and the Whisper
+model are replaced by local stand-ins, so the numbers reflect our own
+download handling, encoding, audio decoding, windowing and orchestration
+rather than network or model time.
+
+    uv run python benchmarks/bench_pipeline.py                      # compare with baseline
+    uv run python benchmarks/bench_pipeline.py --update-baseline    # record a new baseline
+
+Exits with status 1 when any measurement regresses past the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List
+from urllib.parse import urlparse
+from unittest.mock import patch
+
+import numpy as np
+from loguru import logger
+
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai import video_extraction
+from ai.asr import asr_scheduler
+from ai.audio import SAMPLING_RATE
+from ai.cache import NullCache
+from ai.llm import GeminiClient
+from ai.video_extraction_model import Scene, VideoAnalysis
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+DEFAULT_LENGTHS = [10, 60, 300]
+TEST_VIDEO_URL = "https://www.youtube.com/watch?v=JzLtDZL7Nak"
+
+
+def make_fixture(directory: Path, seconds: int) -> Dict[str, Path]:
+    """
+    A 360p test pattern with a tone that is silent for 3 s out of every 10 s,
+    plus the matching audio-only track
+    """
+    video = directory / f"video_{seconds}s.mp4"
+    audio = directory / f"audio_{seconds}s.mp4"
+    if not video.exists():
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate=25:duration={seconds}",
+            "-f", "lavfi", "-i", f"aevalsrc=0.3*sin(2*PI*220*t)*gt(mod(t\\,10)\\,3):s=44100:d={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "96k", "-shortest", str(video),
+        ], check=True)
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error", "-i", str(video), "-vn", "-c:a", "copy", str(audio),
+        ], check=True)
+    return {"video": video, "audio": audio}
+
+
+class FakeStream:
+    def __init__(self, source: Path, resolution: str = None, abr: str = None, progressive: bool = False):
+        self.source = source
+        self.itag = 18 if resolution else 140
+        # Fetched through fake_stream_url, which reads the fixture back from the path
+        self.url = source.as_uri()
+        self.mime_type = f"{'video' if resolution else 'audio'}/mp4"
+        self.is_sabr = False
+        self.resolution = resolution
+        self.abr = abr
+        self.is_progressive = progressive
+        self.includes_video_track = resolution is not None
+        self.includes_audio_track = True
+        self.subtype = "mp4"
+        self.bitrate = None
+        self.filesize = source.stat().st_size
+
+
+def fake_stream_url(url: str, *args: Any, **kwargs: Any) -> Iterator[bytes]:
+    with open(urlparse(url).path, "rb") as f:
+        while chunk := f.read(64 * 1024):
+            yield chunk
+
+
+class FakeYouTube:
+    fixture: Dict[str, Path] = {}
+    length = 0
+
+    def __init__(self, url: str, *args: Any, **kwargs: Any):
+        self.title = "Benchmark video"
+        self.description = "Synthetic benchmark fixture"
+        self.publish_date = datetime(2024, 1, 1)
+        self.author = "bench"
+        self.views = 0
+        self.video_id = "JzLtDZL7Nak"
+        self.thumbnail_url = "https://i.ytimg.com/vi/JzLtDZL7Nak/sddefault.jpg"
+        self.streams = [
+            FakeStream(self.fixture["video"], resolution="360p", progressive=True),
+            FakeStream(self.fixture["audio"], abr="96kbps"),
+        ]
+
+
+class FakeStructuredLLM:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def ainvoke(self, messages: List[Any], config: Dict[str, Any] = None) -> VideoAnalysis:
+        await asyncio.sleep(self.latency)
+        return VideoAnalysis(
+            scenes=[Scene(start_time=0, end_time=FakeYouTube.length, description="Test pattern")],
+            summary="Synthetic test pattern",
+        )
+
+
+class FakeChatGoogleGenerativeAI:
+    latency = 0.0
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        pass
+
+    def with_structured_output(self, schema: Any) -> FakeStructuredLLM:
+        return FakeStructuredLLM(self.latency)
+
+
+class FakeGeminiFiles:
+    """Reads the file in upload-sized chunks like the real resumable upload"""
+    last_upload_bytes = 0
+
+    def upload(self, file_path: str, mime_type: str) -> Dict[str, Any]:
+        FakeGeminiFiles.last_upload_bytes = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            while f.read(8 * 1024 * 1024):
+                pass
+        return {
+            "name": "files/bench",
+            "uri": "https://generativelanguage.googleapis.com/v1beta/files/bench",
+            "mimeType": mime_type,
+            "sizeBytes": str(os.path.getsize(file_path)),
+        }
+
+    def delete(self, name: str) -> None:
+        pass
+
+
+def fake_asr_pipeline(inputs: Any, batch_size: int = None, return_timestamps: bool = True,
+                      generate_kwargs: Dict[str, Any] = None) -> Any:
+    """Touches every sample once and returns one segment per window"""
+    single = not isinstance(inputs, list)
+    outputs = []
+    for item in ([inputs] if single else inputs):
+        samples = item["raw"] if isinstance(item, dict) else np.zeros(SAMPLING_RATE, dtype=np.float32)
+        duration = len(samples) / SAMPLING_RATE
+        level = float(np.abs(samples).mean())
+        outputs.append({"text": f" level {level:.3f}", "chunks": [{"timestamp": (0.0, duration), "text": " words"}]})
+    return outputs[0] if single else outputs
+
+
+def measure(func: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": round(float(np.median(timings)), 4),
+        "peak_python_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def run_benchmarks(lengths: List[int], repeats: int, workdir: Path) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    original_factory = asr_scheduler.pipe_factory
+    asr_scheduler.pipe_factory = lambda: fake_asr_pipeline
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("ai.youtube.YouTube", FakeYouTube))
+        stack.enter_context(patch("ai.youtube.request.stream", fake_stream_url))
+        # Every run should pay for its own page fetch, as a cold request would
+        stack.enter_context(patch("ai.youtube.youtube_resolver.cache", NullCache()))
+        stack.enter_context(patch("ai.llm.ChatGoogleGenerativeAI", FakeChatGoogleGenerativeAI))
+        stack.enter_context(patch("ai.video_extraction.gemini_files", FakeGeminiFiles()))
+        # The stand-in model has no request quota to respect
+        client = GeminiClient(api_key="bench")
+        stack.enter_context(patch("ai.video_extraction.gemini_client", client))
+        stack.callback(client.stop)
+        stack.enter_context(patch("ai.asr.get_asr_pipeline", lambda: fake_asr_pipeline))
+        stack.enter_context(patch("ai.video_extraction.result_cache", NullCache()))
+        stack.enter_context(patch("ai.cache.result_cache", NullCache()))
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for seconds in lengths:
+                fixture = make_fixture(workdir, seconds)
+                FakeYouTube.fixture = fixture
+                FakeYouTube.length = seconds
+                video_path, audio_path = str(fixture["video"]), str(fixture["audio"])
+
+                def download():
+                    os.remove(video_extraction.download_youtube_video(TEST_VIDEO_URL))
+
+                cases = {
+                    "download_youtube_video": download,
+                    "load_video": lambda: video_extraction.load_video(video_path),
+                    "generate_transcript": lambda: video_extraction.generate_transcript(audio_path),
+                    "analyze_video_with_structured_output": lambda: video_extraction.analyze_video_with_structured_output(
+                        video_extraction.prepare_video_part(video_path)
+                    ),
+                    "analyze_youtube_video": lambda: asyncio.run(video_extraction.analyze_youtube_video(TEST_VIDEO_URL)),
+                }
+                for name, func in cases.items():
+                    key = f"{name}[{seconds}s]"
+                    results[key] = measure(func, repeats)
+                    if name == "analyze_youtube_video":
+                        results[key]["upload_mb"] = round(FakeGeminiFiles.last_upload_bytes / 1024 / 1024, 2)
+                    print(f"{name:>38} {seconds:>4}s  {results[key]}")
+        finally:
+            os.chdir(cwd)
+            asr_scheduler.pipe_factory = original_factory
+            asr_scheduler.stop()
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, min_seconds: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, value in current.items():
+            before = previous.get(metric)
+            if before is None:
+                continue
+            # Tiny values are dominated by noise, only flag them past an absolute floor (seconds or MB)
+            floor = min_seconds if metric == "seconds" else 1.0
+            if value > before * (1 + tolerance) and value - before > floor:
+                regressions.append(f"{name} {metric}: {before} -> {value}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lengths", type=int, nargs="+", default=DEFAULT_LENGTHS, help="Video lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="Simulated Gemini call latency")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore latency changes below this")
+    parser.add_argument("--workdir", default=None, help="Where fixtures are generated and kept")
+    parser.add_argument("--verbose", action="store_true", help="Keep the application logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Log formatting and the file sink would otherwise dominate the shorter cases
+        logger.remove()
+
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is required to generate the benchmark fixtures")
+
+    FakeChatGoogleGenerativeAI.latency = args.gemini_latency
+    workdir = Path(args.workdir or Path(tempfile.gettempdir()) / "multimodal-bench")
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    results = run_benchmarks(args.lengths, args.repeats, workdir)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    if regressions:
+        print("Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Analyzes a list of YouTube videos or playlists, writing one JSON line per video as each finishes.
+
+    uv run python cli.py https://www.youtube.com/watch?v=JzLtDZL7Nak https://www.youtube.com/playlist?list=...
+    uv run python cli.py --file urls.txt --output results.ndjson
+    uv run python cli.py --reanalyze --max-videos 8
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import List
+
+from ai.asr import asr_scheduler
+from ai.executors import cpu_pool, io_pool
+from ai.llm import gemini_client
+from ai.batch import catalog_videos, create_stage_limits, iter_batch_ndjson, resolve_batch
+from app.logging import l
+
+
+def read_urls(args: argparse.Namespace) -> List[str]:
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file) as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    return urls
+
+
+async def run(args: argparse.Namespace) -> int:
+    urls = read_urls(args)
+    if args.reanalyze and not urls:
+        try:
+            videos, duplicates = catalog_videos(), 0
+        except ValueError as e:
+            l.error(str(e))
+            return 2
+        l.info(f"Re-analyzing {len(videos)} videos from the artifact store")
+    elif not urls:
+        l.error("No URLs given")
+        return 2
+    else:
+        videos, duplicates = await asyncio.to_thread(resolve_batch, urls)
+        l.info(f"Analyzing {len(videos)} videos ({duplicates} duplicates dropped)")
+
+    limits = create_stage_limits(args.download_concurrency, args.asr_concurrency, args.llm_concurrency)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        async for line in iter_batch_ndjson(videos, duplicates, limits=limits,
+                                           max_videos=args.max_videos, reanalyze=args.reanalyze):
+            output.write(line)
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        asr_scheduler.stop()
+        gemini_client.stop()
+        cpu_pool.shutdown()
+        io_pool.shutdown()
+
+    # The last line is the summary
+    return 1 if json.loads(line)["error"] else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("urls", nargs="*", help="Video or playlist URLs")
+    parser.add_argument("--file", help="Text file with one URL per line")
+    parser.add_argument("--output", help="Write NDJSON here instead of stdout")
+    parser.add_argument("--reanalyze", action="store_true",
+                        help="Analyze the given videos, or every video in the artifact store, again, "
+                             "reporting the stages skipped thanks to stored artifacts")
+    parser.add_argument("--max-videos", type=int, default=None, help="Videos analyzed at the same time")
+    parser.add_argument("--download-concurrency", type=int, default=None)
+    parser.add_argument("--asr-concurrency", type=int, default=None)
+    parser.add_argument("--llm-concurrency", type=int, default=None)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from throttled.fastapi import IPLimiter, TotalLimiter
 from throttled.models import Rate
-from throttled.storage.memory import MemoryStorage
-from app.routes import router
+from app.routes import router, job_manager
+from app.logging import l
+from app.state import SharedLimiterStorage, shared_state, threaded_dispatch
+from ai.asr import asr_registry, asr_scheduler
+from ai.executors import cpu_pool, io_pool
+from ai.llm import gemini_client
+from ai.scratch import scratch_space
 
 def get_app(test_mode: bool = False) -> FastAPI:
-    app = FastAPI()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        scratch_space.purge_stale()
+        if not test_mode:
+            l.info("Warming up ASR model")
+            if cpu_pool.processes:
+                # Each worker process loads its own copy of the model
+                await asyncio.to_thread(cpu_pool.start)
+            else:
+                await asyncio.to_thread(asr_registry.warm_up)
+        await job_manager.start()
+        yield
+        await job_manager.stop()
+        asr_scheduler.stop()
+        gemini_client.stop()
+        cpu_pool.shutdown()
+        io_pool.shutdown()
+
+    app = FastAPI(lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -18,12 +44,13 @@ def get_app(test_mode: bool = False) -> FastAPI:
     )
 
     if not test_mode:
-        memory = MemoryStorage(cache={})
-        total_limiter = TotalLimiter(limit=Rate(1, 1), storage=memory)
-        ip_limiter = IPLimiter(limit=Rate(5, 1), storage=memory)
+        # Counted in the shared state backend so the limits hold across workers
+        storage = SharedLimiterStorage(shared_state)
+        total_limiter = TotalLimiter(limit=Rate(1, 1), storage=storage)
+        ip_limiter = IPLimiter(limit=Rate(5, 1), storage=storage)
 
-        app.add_middleware(BaseHTTPMiddleware, dispatch=total_limiter.dispatch)
-        app.add_middleware(BaseHTTPMiddleware, dispatch=ip_limiter.dispatch)
+        app.add_middleware(BaseHTTPMiddleware, dispatch=threaded_dispatch(total_limiter))
+        app.add_middleware(BaseHTTPMiddleware, dispatch=threaded_dispatch(ip_limiter))
 
     app.include_router(router)
     
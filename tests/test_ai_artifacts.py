@@ -0,0 +1,69 @@
+import sys
+import json
+import os
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.artifacts import MANIFEST_VERSION, ArtifactStore
+
+INPUTS = {"speech_model": "openai/whisper-tiny"}
+
+
+def test_artifacts_are_returned_while_their_inputs_match(tmp_path):
+    """Test an artifact is fresh for the inputs it was made from and stale for any other"""
+    store = ArtifactStore(str(tmp_path))
+    store.put("abc", "transcript", {"transcricao": {"texto_completo": "olá"}}, INPUTS)
+
+    assert store.load("abc", {"transcript": INPUTS}) == {"transcript": {"transcricao": {"texto_completo": "olá"}}}
+    assert store.load("abc", {"transcript": {"speech_model": "openai/whisper-large-v3"}}) == {}
+    assert store.load("abc", {"metadata": {}}) == {}
+    assert store.load("other", {"transcript": INPUTS}) == {}
+
+
+def test_file_artifacts_survive_the_source(tmp_path):
+    """Test a stored file outlives the scratch file it came from and is returned by path"""
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    source = tmp_path / "proxy.mp4"
+    source.write_bytes(b"0" * 100)
+
+    path = store.put_file("abc", "proxy", str(source), {"height": 360})
+    source.unlink()
+
+    assert store.load("abc", {"proxy": {"height": 360}}) == {"proxy": path}
+    assert Path(path).read_bytes() == b"0" * 100
+    entry = store.manifest("abc")["artifacts"]["proxy"]
+    assert entry["file"] == "proxy.mp4"
+    assert entry["bytes"] == 100
+
+
+def test_replacing_an_artifact_keeps_the_others(tmp_path):
+    """Test storing one artifact again updates its entry without touching the rest of the manifest"""
+    store = ArtifactStore(str(tmp_path))
+    store.put("abc", "metadata", {"metadados": {}}, {})
+    store.put("abc", "transcript", {"v": 1}, INPUTS)
+    store.put("abc", "transcript", {"v": 2}, {"speech_model": "other"})
+
+    assert store.load("abc", {"metadata": {}, "transcript": {"speech_model": "other"}}) == {
+        "metadata": {"metadados": {}},
+        "transcript": {"v": 2},
+    }
+    assert not [name for name in os.listdir(tmp_path / "abc") if name.endswith(".tmp")]
+
+
+def test_manifests_of_another_version_are_ignored(tmp_path):
+    """Test a manifest written by another layout version is treated as empty, and left out of the catalog"""
+    store = ArtifactStore(str(tmp_path))
+    store.put("abc", "metadata", {"metadados": {}}, {})
+    store.put("def", "metadata", {"metadados": {}}, {})
+    manifest_path = tmp_path / "def" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest_path.write_text(json.dumps({**manifest, "version": MANIFEST_VERSION + 1}))
+
+    assert store.load("def", {"metadata": {}}) == {}
+    assert store.videos() == ["abc"]
+
+    store.delete("abc")
+    assert store.videos() == []
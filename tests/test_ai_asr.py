@@ -0,0 +1,342 @@
+import sys
+import time
+import threading
+from pathlib import Path
+import pytest
+import torch
+from unittest.mock import patch, MagicMock
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+import numpy as np
+
+from ai.asr import (
+    ASRBatchScheduler,
+    ASRModelRegistry,
+    PooledASRPipeline,
+    run_asr_pipeline,
+    stitch_window_chunks,
+    transcribe_long_form,
+)
+from ai.audio import SAMPLING_RATE, AudioWindow, EnergyVAD
+
+
+@pytest.fixture
+def mock_loaders():
+    with patch('ai.asr.AutoModelForSpeechSeq2Seq.from_pretrained') as mock_model, \
+         patch('ai.asr.AutoProcessor.from_pretrained') as mock_processor, \
+         patch('ai.asr.pipeline') as mock_pipeline:
+        mock_model.return_value = MagicMock()
+        mock_processor.return_value = MagicMock()
+        mock_pipeline.side_effect = lambda *args, **kwargs: MagicMock()
+        yield mock_model, mock_processor, mock_pipeline
+
+
+def test_registry_loads_model_once(mock_loaders):
+    """Test the pipeline is built on the first lookup and reused afterwards"""
+    mock_model, mock_processor, mock_pipeline = mock_loaders
+    registry = ASRModelRegistry()
+
+    first = registry.get("openai/whisper-tiny", "cpu", torch.float32)
+    second = registry.get("openai/whisper-tiny", "cpu", torch.float32)
+
+    assert first is second
+    mock_model.assert_called_once()
+    mock_processor.assert_called_once()
+    mock_pipeline.assert_called_once()
+
+    stats = registry.stats()["openai/whisper-tiny/hf/cpu/float32"]
+    assert stats["cold_loads"] == 1
+    assert stats["warm_hits"] == 1
+    assert stats["cold_load_seconds"] >= 0
+
+
+def test_registry_keys_by_model_device_and_dtype(mock_loaders):
+    """Test different model ids or dtypes get separate pipelines"""
+    registry = ASRModelRegistry()
+
+    tiny = registry.get("openai/whisper-tiny", "cpu", torch.float32)
+    base = registry.get("openai/whisper-base", "cpu", torch.float32)
+    half = registry.get("openai/whisper-tiny", "cpu", torch.float16)
+
+    assert tiny is not base
+    assert tiny is not half
+    assert len(registry.stats()) == 3
+
+
+def test_registry_int8_backend_quantizes_on_cpu(mock_loaders):
+    """Test the int8 backend is keyed separately and quantizes the loaded model"""
+    mock_model, _, mock_pipeline = mock_loaders
+    registry = ASRModelRegistry()
+
+    with patch('ai.asr.torch.ao.quantization.quantize_dynamic') as mock_quantize:
+        mock_quantize.side_effect = lambda model, *args, **kwargs: model
+        registry.get("openai/whisper-tiny", "cuda:0", torch.float16, backend="int8")
+        registry.get("openai/whisper-tiny", "cpu", torch.float32, backend="hf")
+
+    mock_quantize.assert_called_once()
+    assert mock_model.call_args_list[0].kwargs["torch_dtype"] == torch.float32
+    assert mock_pipeline.call_args_list[0].kwargs["device"] == "cpu"
+    assert set(registry.stats()) == {
+        "openai/whisper-tiny/int8/cpu/float32",
+        "openai/whisper-tiny/hf/cpu/float32",
+    }
+
+
+def test_registry_rejects_unknown_backend(mock_loaders):
+    """Test an unknown backend name fails with a clear error"""
+    with pytest.raises(ValueError, match="Unknown speech backend"):
+        ASRModelRegistry().get("openai/whisper-tiny", "cpu", torch.float32, backend="tensorrt")
+
+
+def test_registry_clear(mock_loaders):
+    """Test clearing the registry forces a cold load"""
+    _, _, mock_pipeline = mock_loaders
+    registry = ASRModelRegistry()
+
+    registry.get("openai/whisper-tiny", "cpu", torch.float32)
+    registry.clear()
+    registry.get("openai/whisper-tiny", "cpu", torch.float32)
+
+    assert mock_pipeline.call_count == 2
+
+
+def test_stitch_window_chunks_offsets_and_dedups():
+    """Test chunks are shifted to the original timeline and overlap duplicates dropped"""
+    window = AudioWindow(start=25.0, samples=np.zeros(30 * SAMPLING_RATE, dtype=np.float32))
+    chunks = [
+        {"timestamp": (0.0, 2.0), "text": " owned by previous window"},
+        {"timestamp": (3.0, 10.0), "text": " kept"},
+        {"timestamp": (27.0, 30.0), "text": " owned by next window"},
+    ]
+
+    stitched = stitch_window_chunks(window, chunks, overlap_s=5.0)
+
+    assert stitched == [{"timestamp": (28.0, 35.0), "text": " kept"}]
+
+
+def test_stitch_window_chunks_last_window_keeps_open_end():
+    """Test the last window keeps its trailing chunk and fills a missing end time"""
+    window = AudioWindow(start=25.0, samples=np.zeros(10 * SAMPLING_RATE, dtype=np.float32), is_last=True)
+
+    stitched = stitch_window_chunks(window, [{"timestamp": (6.0, None), "text": " end"}], overlap_s=5.0)
+
+    assert stitched == [{"timestamp": (31.0, 35.0), "text": " end"}]
+
+
+@patch('ai.asr.decode_audio_stream')
+def test_transcribe_long_form_batches_windows(mock_decode):
+    """Test windows are sent in batches and stitched into one transcript"""
+    mock_decode.return_value = iter([np.zeros(70 * SAMPLING_RATE, dtype=np.float32)])
+    batches = []
+
+    def fake_pipe(inputs, **kwargs):
+        batches.append(len(inputs))
+        return [{"text": "", "chunks": [{"timestamp": (10.0, 12.0), "text": " hi"}]} for _ in inputs]
+
+    partial = []
+    result = transcribe_long_form(fake_pipe, "video.mp4", chunk_length_s=30, overlap_s=5, batch_size=2,
+                                  on_chunks=partial.append)
+
+    assert batches == [2, 1]
+    assert [len(chunks) for chunks in partial] == [2, 1]
+    assert [c["timestamp"] for c in result["chunks"]] == [(10.0, 12.0), (35.0, 37.0), (60.0, 62.0)]
+    assert result["text"] == " hi hi hi"
+    assert result["audio_seconds"] == 70.0
+
+
+@patch('ai.asr.decode_audio_stream')
+def test_transcribe_long_form_with_vad_maps_timestamps_back(mock_decode):
+    """Test silence never reaches the model and timestamps land on the original timeline"""
+    t = np.arange(3 * SAMPLING_RATE) / SAMPLING_RATE
+    tone = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    silence = np.zeros(20 * SAMPLING_RATE, dtype=np.float32)
+    mock_decode.return_value = iter([silence, tone, silence])
+    seen = []
+
+    def fake_pipe(inputs, **kwargs):
+        seen.extend(len(item["raw"]) / SAMPLING_RATE for item in inputs)
+        return [{"text": " speech", "chunks": [{"timestamp": (0.3, 3.3), "text": " speech"}]} for _ in inputs]
+
+    vad = EnergyVAD(padding_ms=300, max_gap_ms=1000)
+    partial = []
+    result = transcribe_long_form(fake_pipe, "video.mp4", chunk_length_s=30, overlap_s=5, batch_size=4, vad=vad,
+                                  on_chunks=partial.extend)
+
+    assert sum(seen) < 4
+    assert result["chunks"][0]["timestamp"] == pytest.approx((20.0, 23.0), abs=0.05)
+    assert partial == result["chunks"]
+    assert result["audio_seconds"] == pytest.approx(43.0)
+    assert result["vad"]["skipped_seconds"] > 39
+    assert result["vad"]["asr_seconds_saved"] >= 0
+
+
+@patch('ai.asr.decode_audio_stream')
+def test_transcribe_long_form_reads_pcm_in_place(mock_decode, tmp_path):
+    """Test preprocessed PCM is memory-mapped instead of decoded again"""
+    path = tmp_path / "audio.f32"
+    np.zeros(40 * SAMPLING_RATE, dtype=np.float32).tofile(path)
+    durations = []
+
+    def fake_pipe(inputs, **kwargs):
+        durations.extend(len(item["raw"]) / SAMPLING_RATE for item in inputs)
+        return [{"text": " hi", "chunks": [{"timestamp": (1.0, 2.0), "text": " hi"}]} for _ in inputs]
+
+    result = transcribe_long_form(fake_pipe, str(path), chunk_length_s=30, overlap_s=5, batch_size=4)
+
+    mock_decode.assert_not_called()
+    assert durations == [30.0, 15.0]
+    assert result["audio_seconds"] == 40.0
+
+
+class RecordingPipe:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, inputs, batch_size=None, return_timestamps=True, generate_kwargs=None):
+        self.batches.append(list(inputs))
+        return [{"text": str(item), "chunks": []} for item in inputs]
+
+
+def test_scheduler_batches_concurrent_requests():
+    """Test inputs from concurrent callers share forward passes and get their own results"""
+    pipe = RecordingPipe()
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=8, max_wait_ms=200)
+    results = {}
+    barrier = threading.Barrier(4)
+
+    def request(index):
+        barrier.wait()
+        results[index] = scheduler([f"{index}-a", f"{index}-b"], return_timestamps=True)
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.stop()
+
+    assert {i: [r["text"] for r in results[i]] for i in results} == {
+        i: [f"{i}-a", f"{i}-b"] for i in range(4)
+    }
+    assert len(pipe.batches) < 4
+    stats = scheduler.stats()
+    assert sum(size * count for size, count in stats["batch_size_histogram"].items()) == 8
+    assert stats["queue_depth"] == 0
+
+
+def test_scheduler_respects_max_batch_size():
+    """Test no batch exceeds the configured maximum"""
+    pipe = RecordingPipe()
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=3, max_wait_ms=50)
+
+    scheduler(list(range(7)))
+    scheduler.stop()
+
+    assert max(len(batch) for batch in pipe.batches) <= 3
+    assert sorted(item for batch in pipe.batches for item in batch) == list(range(7))
+
+
+def test_scheduler_separates_generate_kwargs():
+    """Test inputs with different generation settings are never mixed in one batch"""
+    calls = []
+
+    def pipe(inputs, batch_size=None, return_timestamps=True, generate_kwargs=None):
+        calls.append((tuple(inputs), generate_kwargs["language"]))
+        return [{"text": "", "chunks": []} for _ in inputs]
+
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=8, max_wait_ms=100)
+    english = scheduler.submit("en", generate_kwargs={"language": "english"})
+    portuguese = scheduler.submit("pt", generate_kwargs={"language": "portuguese"})
+    english.result()
+    portuguese.result()
+    scheduler.stop()
+
+    assert sorted(calls) == [(("en",), "english"), (("pt",), "portuguese")]
+
+
+def test_scheduler_propagates_errors():
+    """Test a failing batch raises in every caller that had inputs in it"""
+    def pipe(inputs, **kwargs):
+        raise RuntimeError("CUDA out of memory")
+
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=4, max_wait_ms=10)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        scheduler(["a", "b"])
+    scheduler.stop()
+
+
+
+def test_scheduler_fails_batches_with_missing_outputs():
+    """Test every caller of a batch fails when the pipeline returns fewer outputs than inputs"""
+    def pipe(inputs, **kwargs):
+        return [{"text": "only one", "chunks": []}]
+
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=4, max_wait_ms=100)
+    futures = [scheduler.submit(item) for item in ("a", "b")]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 outputs for 2 inputs"):
+            future.result(timeout=5)
+    scheduler.stop()
+
+
+def test_scheduler_stop_fails_queued_requests():
+    """Test requests still queued when the scheduler stops fail instead of blocking their callers"""
+    entered, release = threading.Event(), threading.Event()
+
+    def pipe(inputs, **kwargs):
+        entered.set()
+        release.wait(5)
+        return [{"text": str(item), "chunks": []} for item in inputs]
+
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=1, max_wait_ms=1)
+    running = scheduler.submit("a")
+    entered.wait(5)
+    queued = [scheduler.submit(item) for item in ("b", "c")]
+    threading.Timer(0.2, release.set).start()
+    scheduler.stop()
+
+    assert running.result(timeout=5)["text"] == "a"
+    for future in queued:
+        with pytest.raises(RuntimeError, match="stopped"):
+            future.result(timeout=5)
+
+def test_scheduler_runs_batches_concurrently():
+    """Test a scheduler backed by several workers keeps that many batches in flight"""
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def pipe(inputs, **kwargs):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.pop()
+        return [{"text": str(item), "chunks": []} for item in inputs]
+
+    scheduler = ASRBatchScheduler(lambda: pipe, max_batch_size=1, max_wait_ms=1, max_in_flight=2)
+    futures = [scheduler.submit(index) for index in range(4)]
+    results = [future.result()["text"] for future in futures]
+    scheduler.stop()
+
+    assert results == ["0", "1", "2", "3"]
+    assert max(peak) == 2
+
+
+def test_pooled_pipeline_sends_plain_arrays(tmp_path):
+    """Test memory-mapped windows are copied into plain arrays before going to a worker process"""
+    pool = MagicMock(processes=True)
+    samples = np.memmap(tmp_path / "audio.f32", dtype=np.float32, mode="w+", shape=(16,))
+
+    PooledASRPipeline(pool)([{"raw": samples[:8], "sampling_rate": SAMPLING_RATE}], batch_size=1)
+
+    fn, inputs, kwargs = pool.call.call_args.args
+    assert fn is run_asr_pipeline
+    assert type(inputs[0]["raw"]) is np.ndarray
+    assert kwargs == {"batch_size": 1}
@@ -0,0 +1,128 @@
+import sys
+import shutil
+import subprocess
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.audio import SAMPLING_RATE, EnergyVAD, decode_audio_stream, iter_audio_windows, load_pcm, slice_audio_windows
+
+
+def blocks_of(total_seconds, block_seconds=1.0):
+    samples = np.arange(int(total_seconds * SAMPLING_RATE), dtype=np.float32)
+    size = int(block_seconds * SAMPLING_RATE)
+    return [samples[i:i + size] for i in range(0, len(samples), size)]
+
+
+def test_iter_audio_windows_overlap_and_tail():
+    """Test windows advance by chunk minus overlap and the tail is kept"""
+    windows = list(iter_audio_windows(blocks_of(70), chunk_length_s=30, overlap_s=5))
+
+    assert [w.start for w in windows] == [0.0, 25.0, 50.0]
+    assert [round(w.duration, 2) for w in windows] == [30.0, 30.0, 20.0]
+    assert [w.is_last for w in windows] == [False, False, True]
+    # Overlapping regions contain the same samples
+    assert np.array_equal(windows[0].samples[-5 * SAMPLING_RATE:], windows[1].samples[:5 * SAMPLING_RATE])
+
+
+def test_iter_audio_windows_skips_tail_covered_by_overlap():
+    """Test no extra window is emitted when the tail is already covered"""
+    windows = list(iter_audio_windows(blocks_of(55), chunk_length_s=30, overlap_s=5))
+
+    assert [w.start for w in windows] == [0.0, 25.0]
+    assert windows[-1].is_last
+
+
+def test_iter_audio_windows_short_audio():
+    """Test audio shorter than one window yields a single window"""
+    windows = list(iter_audio_windows(blocks_of(3), chunk_length_s=30, overlap_s=5))
+
+    assert len(windows) == 1
+    assert windows[0].is_last
+    assert round(windows[0].duration, 2) == 3.0
+
+
+def test_slice_audio_windows_matches_streaming_windows(tmp_path):
+    """Test in-memory windows match the streamed ones and are views of the mapped file"""
+    path = tmp_path / "audio.f32"
+    np.arange(70 * SAMPLING_RATE, dtype=np.float32).tofile(path)
+    samples = load_pcm(str(path))
+
+    windows = list(slice_audio_windows(samples, chunk_length_s=30, overlap_s=5))
+    streamed = list(iter_audio_windows(blocks_of(70), chunk_length_s=30, overlap_s=5))
+
+    assert [(w.start, len(w.samples), w.is_last) for w in windows] == \
+        [(w.start, len(w.samples), w.is_last) for w in streamed]
+    assert all(np.shares_memory(w.samples, samples) for w in windows)
+    assert np.array_equal(windows[1].samples, streamed[1].samples)
+
+
+def test_iter_audio_windows_rejects_bad_overlap():
+    """Test an overlap as long as the window is rejected"""
+    with pytest.raises(ValueError):
+        list(iter_audio_windows(blocks_of(3), chunk_length_s=5, overlap_s=5))
+
+
+def speech_like(layout, block_seconds=0.7):
+    """Builds audio from (seconds, is_loud) pairs and splits it into uneven blocks"""
+    parts = []
+    for seconds, loud in layout:
+        t = np.arange(int(seconds * SAMPLING_RATE)) / SAMPLING_RATE
+        parts.append((0.3 * np.sin(2 * np.pi * 220 * t) if loud else 0.0001 * np.sin(t)).astype(np.float32))
+    samples = np.concatenate(parts)
+    size = int(block_seconds * SAMPLING_RATE)
+    return [samples[i:i + size] for i in range(0, len(samples), size)]
+
+
+def test_energy_vad_keeps_only_speech_regions():
+    """Test silence is dropped, padding is kept and regions map back to the source"""
+    vad = EnergyVAD(padding_ms=300, max_gap_ms=1000)
+    kept = np.concatenate(list(vad.filter(speech_like([(5, False), (3, True), (10, False), (2, True), (5, False)]))))
+
+    assert vad.total_seconds == pytest.approx(25.0)
+    # Two speech regions plus up to 300 ms of padding on each side
+    assert 5.0 <= vad.speech_seconds <= 6.3
+    assert len(kept) == vad.kept_samples
+    assert vad.skipped_seconds == pytest.approx(vad.total_seconds - vad.speech_seconds)
+    assert len(vad.regions) == 2
+    assert vad.to_original(0.3) == pytest.approx(5.0, abs=0.05)
+    second_start = vad.regions[1][0] / SAMPLING_RATE
+    assert vad.to_original(second_start + 0.3) == pytest.approx(18.0, abs=0.05)
+
+
+def test_energy_vad_bridges_short_gaps():
+    """Test pauses shorter than max_gap_ms stay inside one region"""
+    vad = EnergyVAD(padding_ms=300, max_gap_ms=1000)
+    list(vad.filter(speech_like([(2, True), (0.5, False), (2, True)])))
+
+    assert len(vad.regions) == 1
+    assert vad.skipped_seconds == pytest.approx(0.0)
+
+
+def test_energy_vad_all_silence():
+    """Test a silent file produces no audio for the model"""
+    vad = EnergyVAD()
+
+    assert list(vad.filter(speech_like([(10, False)]))) == []
+    assert vad.speech_seconds == 0
+    assert vad.skipped_seconds == pytest.approx(10.0)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_decode_audio_stream(tmp_path):
+    """Test ffmpeg output is streamed as 16 kHz mono float32 blocks"""
+    path = tmp_path / "tone.wav"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=3",
+         "-ar", "44100", str(path)],
+        check=True,
+    )
+
+    blocks = list(decode_audio_stream(str(path), block_seconds=1.0))
+
+    assert all(block.dtype == np.float32 for block in blocks)
+    assert abs(sum(len(block) for block in blocks) - 3 * SAMPLING_RATE) < SAMPLING_RATE / 10
@@ -0,0 +1,144 @@
+import sys
+import json
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.batch import (
+    BatchVideo,
+    analyze_batch,
+    catalog_videos,
+    dedupe_videos,
+    is_playlist_url,
+    iter_batch_ndjson,
+    resolve_batch,
+)
+
+
+def test_dedupe_videos_collapses_urls_of_the_same_video():
+    """Test watch, short and embed URLs of one video are analyzed once"""
+    videos, duplicates = dedupe_videos([
+        "https://www.youtube.com/watch?v=JzLtDZL7Nak",
+        "https://youtu.be/JzLtDZL7Nak",
+        "https://www.youtube.com/embed/JzLtDZL7Nak",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "",
+        "not-a-url",
+        "not-a-url",
+    ])
+
+    assert [video.video_id for video in videos] == ["JzLtDZL7Nak", "dQw4w9WgXcQ", None]
+    assert videos[0].url == "https://www.youtube.com/watch?v=JzLtDZL7Nak"
+    assert videos[2].url == "not-a-url"
+    assert duplicates == 3
+
+
+def test_is_playlist_url():
+    """Test only playlist pages are expanded, not watch URLs inside a playlist"""
+    assert is_playlist_url("https://www.youtube.com/playlist?list=PL123")
+    assert not is_playlist_url("https://www.youtube.com/watch?v=JzLtDZL7Nak&list=PL123")
+    assert not is_playlist_url("https://www.youtube.com/playlist")
+
+
+@patch('ai.batch.Playlist')
+def test_resolve_batch_expands_playlists(mock_playlist):
+    """Test playlist videos are merged with the other URLs and deduplicated"""
+    mock_playlist.return_value.video_urls = [
+        "https://www.youtube.com/watch?v=JzLtDZL7Nak",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    ]
+
+    videos, duplicates = resolve_batch([
+        "https://youtu.be/JzLtDZL7Nak",
+        "https://www.youtube.com/playlist?list=PL123",
+    ])
+
+    mock_playlist.assert_called_once_with("https://www.youtube.com/playlist?list=PL123")
+    assert [video.video_id for video in videos] == ["JzLtDZL7Nak", "dQw4w9WgXcQ"]
+    assert duplicates == 1
+
+
+@pytest.mark.asyncio
+@patch('ai.batch.analyze_youtube_video')
+async def test_analyze_batch_yields_results_as_they_finish(mock_analyze):
+    """Test faster videos are reported first and failures do not stop the batch"""
+    delays = {"slow": 0.05, "fast": 0.0}
+    running = [0]
+    peak = [0]
+
+    async def analyze(url, limits=None):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(delays.get(url, 0.01))
+        running[0] -= 1
+        if url == "broken":
+            raise ValueError("no such video")
+        return {"metadados": {"url": url}}
+
+    mock_analyze.side_effect = analyze
+    videos = [BatchVideo("slow", "a"), BatchVideo("fast", "b"), BatchVideo("broken", None)]
+
+    results = [result async for result in analyze_batch(videos, max_videos=2)]
+
+    assert [result["url"] for result in results] == ["fast", "broken", "slow"]
+    assert results[1]["status"] == "error"
+    assert results[1]["error"] == "no such video"
+    assert results[2]["analysis"] == {"metadados": {"url": "slow"}}
+    assert peak[0] == 2
+    assert set(mock_analyze.call_args.kwargs["limits"]) == {"download", "asr", "llm"}
+
+
+@pytest.mark.asyncio
+@patch('ai.batch.analyze_youtube_video')
+async def test_iter_batch_ndjson_ends_with_summary(mock_analyze):
+    """Test each NDJSON line parses and the last one summarizes the batch"""
+    mock_analyze.return_value = {"metadados": {}}
+
+    lines = [line async for line in iter_batch_ndjson([BatchVideo("a", "a"), BatchVideo("b", "b")], duplicates=1)]
+
+    assert all(line.endswith("\n") for line in lines)
+    summary = json.loads(lines[-1])
+    assert summary["type"] == "summary"
+    assert summary["videos"] == 2
+    assert summary["ok"] == 2
+    assert summary["error"] == 0
+    assert summary["duplicates"] == 1
+
+
+@pytest.mark.asyncio
+@patch('ai.batch.run_youtube_analysis')
+async def test_reanalysis_reports_skipped_stages(mock_run):
+    """Test re-analyzed videos list the stages that ran and the summary counts the skipped ones"""
+    async def run(url, limits=None, listener=None):
+        skipped = ["metadata", "download", "media", "transcript"] if url == "a" else ["metadata"]
+        listener("stages", {"run": ["video_part", "multimodal_analysis"], "skipped": skipped})
+        return {"metadados": {}}
+
+    mock_run.side_effect = run
+
+    lines = [line async for line in iter_batch_ndjson([BatchVideo("a", "a"), BatchVideo("b", "b")], reanalyze=True)]
+
+    results = {result["url"]: result for result in map(json.loads, lines[:-1])}
+    assert results["a"]["stages"]["run"] == ["video_part", "multimodal_analysis"]
+    summary = json.loads(lines[-1])
+    assert summary["skipped_stages"] == {"metadata": 2, "download": 1, "media": 1, "transcript": 1}
+
+
+def test_catalog_videos_lists_the_artifact_store(tmp_path):
+    """Test the catalog is every video with stored artifacts, as watch URLs"""
+    from ai.artifacts import ArtifactStore
+
+    store = ArtifactStore(str(tmp_path))
+    store.put("JzLtDZL7Nak", "metadata", {"metadados": {}}, {})
+
+    with patch('ai.batch.artifact_store', store):
+        videos = catalog_videos()
+    with patch('ai.batch.artifact_store', None), pytest.raises(ValueError):
+        catalog_videos()
+
+    assert videos == [BatchVideo("https://www.youtube.com/watch?v=JzLtDZL7Nak", "JzLtDZL7Nak")]
@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.cache import (
+    MemoryLRUCache,
+    DiskCache,
+    extract_video_id,
+    stage_cache_keys,
+)
+
+
+def test_memory_cache_lru_eviction():
+    """Test the least recently used entry is evicted first"""
+    cache = MemoryLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"value": 1})
+    cache.set("b", {"value": 2})
+    cache.get("a")
+    cache.set("c", {"value": 3})
+
+    assert cache.get("a") == {"value": 1}
+    assert cache.get("b") is None
+    assert cache.get("c") == {"value": 3}
+
+
+def test_memory_cache_ttl():
+    """Test expired entries are not returned"""
+    cache = MemoryLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"value": 1})
+
+    with patch('ai.cache.time.time', return_value=time.time() + 120):
+        assert cache.get("a") is None
+
+
+def test_memory_cache_returns_copies():
+    """Test callers cannot mutate cached values in place"""
+    cache = MemoryLRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"items": [1]})
+    cache.get("a")["items"].append(2)
+
+    assert cache.get("a") == {"items": [1]}
+
+
+def test_disk_cache_roundtrip_and_ttl(tmp_path):
+    """Test disk entries persist across instances and expire"""
+    DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl_seconds=60).set("a", {"value": 1})
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl_seconds=60)
+
+    assert cache.get("a") == {"value": 1}
+
+    with patch('ai.cache.time.time', return_value=time.time() + 120):
+        assert cache.get("a") is None
+
+
+def test_disk_cache_size_eviction(tmp_path):
+    """Test the oldest entries are evicted once the size limit is exceeded"""
+    cache = DiskCache(str(tmp_path), max_bytes=150, ttl_seconds=60)
+    cache.set("old", {"value": "x" * 50})
+    os.utime(cache._path("old"), (time.time() - 10, time.time() - 10))
+    cache.set("new", {"value": "y" * 50})
+
+    assert cache.get("old") is None
+    assert cache.get("new") == {"value": "y" * 50}
+
+
+def test_stage_cache_keys_isolate_stage_inputs():
+    """Test changing the prompt only changes the scenes key"""
+    base = stage_cache_keys("abc", "prompt", "gemini", 0.0, "whisper")
+    changed = stage_cache_keys("abc", "other prompt", "gemini", 0.0, "whisper")
+
+    assert base["metadata"] == changed["metadata"]
+    assert base["transcript"] == changed["transcript"]
+    assert base["multimodal_analysis"] != changed["multimodal_analysis"]
+
+
+def test_stage_cache_keys_cover_stage_options():
+    """Test the transcript and scenes keys change with the settings each stage depends on"""
+    base = stage_cache_keys("abc", "prompt", "gemini", 0.0, "whisper",
+                            transcript_options={"speech_backend": "hf"}, analysis_options={"media_preprocess": True})
+    backend = stage_cache_keys("abc", "prompt", "gemini", 0.0, "whisper",
+                               transcript_options={"speech_backend": "ct2"}, analysis_options={"media_preprocess": True})
+    preprocess = stage_cache_keys("abc", "prompt", "gemini", 0.0, "whisper",
+                                  transcript_options={"speech_backend": "hf"}, analysis_options={"media_preprocess": False})
+
+    assert base["transcript"] != backend["transcript"]
+    assert base["multimodal_analysis"] == backend["multimodal_analysis"]
+    assert base["transcript"] == preprocess["transcript"]
+    assert base["multimodal_analysis"] != preprocess["multimodal_analysis"]
+
+
+def test_extract_video_id():
+    """Test video ids are parsed from URLs without network access"""
+    assert extract_video_id("https://www.youtube.com/watch?v=JzLtDZL7Nak") == "JzLtDZL7Nak"
+    assert extract_video_id("invalid-url") is None
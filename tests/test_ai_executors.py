@@ -0,0 +1,92 @@
+import sys
+import os
+import time
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.executors import WorkerPool
+
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(*args, **kwargs):
+        pool = WorkerPool(*args, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_inline_pool_runs_in_caller(make_pool):
+    """Test a pool without workers runs tasks in the submitting thread"""
+    pool = make_pool("test-inline", 0, processes=True)
+
+    assert not pool.processes
+    assert pool.call(threading.get_ident) == threading.get_ident()
+    with pytest.raises(ZeroDivisionError):
+        pool.call(lambda: 1 / 0)
+
+
+def test_thread_pool_caps_concurrency_and_reports_utilization(make_pool):
+    """Test no more than the pool's workers run at once and busy time is accounted"""
+    pool = make_pool("test-threads", 2)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def task():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    futures = [pool.submit(task) for _ in range(6)]
+    stats = pool.stats()
+    for future in futures:
+        future.result()
+    with pytest.raises(ValueError):
+        pool.call(int, "not a number")
+
+    assert stats["running"] == 2 and stats["queued"] == 4
+    assert max(peak) == 2
+    stats = pool.stats()
+    assert stats["completed"] == 6
+    assert stats["failed"] == 1
+    assert stats["running"] == stats["queued"] == 0
+    assert stats["busy_seconds"] >= 6 * 0.05
+    assert 0 < stats["utilization"] <= 1
+
+
+def test_process_pool_runs_in_workers(make_pool):
+    """Test tasks run in separate worker processes and their errors reach the caller"""
+    pool = make_pool("test-processes", 2, processes=True)
+
+    pids = {pool.call(os.getpid) for _ in range(4)}
+    with pytest.raises(ValueError):
+        pool.call(int, "not a number")
+
+    assert os.getpid() not in pids
+    assert pool.stats()["processes"] is True
+
+
+def test_process_pool_replaces_dead_workers(make_pool):
+    """Test a worker dying fails its task and the next task gets a new pool"""
+    pool = make_pool("test-broken", 1, processes=True)
+    first = pool.call(os.getpid)
+
+    with pytest.raises(BrokenProcessPool):
+        pool.call(os._exit, 1)
+
+    assert pool.call(os.getpid) != first
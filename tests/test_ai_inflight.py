@@ -0,0 +1,171 @@
+import sys
+import asyncio
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.inflight import InflightDeduplicator, InflightError
+from ai.scratch import ScratchQuotaExceeded
+from app.state import MemorySharedState, SQLiteSharedState
+
+
+@pytest.fixture
+def make_worker(tmp_path):
+    """
+    Each call returns the deduplicator of another API worker sharing the same SQLite file
+    """
+    def make(lease_seconds=5.0):
+        return InflightDeduplicator(
+            SQLiteSharedState(str(tmp_path / "state.db")),
+            lease_seconds=lease_seconds,
+            poll_seconds=0.02,
+            result_ttl_seconds=5.0,
+        )
+    return make
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_across_workers_share_one(make_worker):
+    """Test simultaneous requests in several workers run the work once and all get its result"""
+    workers = [make_worker() for _ in range(3)]
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"summary": "A cat video"}
+
+    results = await asyncio.gather(*(worker.run("video", analyze) for worker in workers for _ in range(2)))
+
+    assert len(calls) == 1
+    assert all(result == {"summary": "A cat video"} for result in results)
+
+
+@pytest.mark.asyncio
+async def test_waiters_get_the_owner_error(make_worker):
+    """Test a failed run fails the requests that waited on it without running again"""
+    first, second = make_worker(), make_worker()
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        raise Exception("Video unavailable")
+
+    results = await asyncio.gather(first.run("video", analyze), second.run("video", analyze), return_exceptions=True)
+
+    assert len(calls) == 1
+    assert all("Video unavailable" in str(result) for result in results)
+    assert any(isinstance(result, InflightError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_runs_again_once_finished(make_worker):
+    """Test only overlapping requests are merged, a later one runs the work itself"""
+    worker = make_worker()
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        return {"run": len(calls)}
+
+    assert await worker.run("video", analyze) == {"run": 1}
+    assert await worker.run("video", analyze) == {"run": 2}
+
+
+@pytest.mark.asyncio
+async def test_waiter_takes_over_from_dead_owner(make_worker):
+    """Test a lease left behind by a crashed worker expires and a waiter does the work"""
+    crashed = make_worker(lease_seconds=0.2)
+    crashed.state.acquire("inflight:video", "dead-worker", 0.2)
+    survivor = make_worker(lease_seconds=0.2)
+
+    async def analyze():
+        return {"summary": "recovered"}
+
+    result = await asyncio.wait_for(survivor.run("video", analyze), 2)
+
+    assert result == {"summary": "recovered"}
+
+
+@pytest.mark.asyncio
+async def test_callers_in_one_worker_await_the_same_run():
+    """Test concurrent callers in a worker share one task, take one lease and are counted as coalesced"""
+    state = MemorySharedState()
+    acquires = []
+    acquire = state.acquire
+    state.acquire = lambda *args: acquires.append(args) or acquire(*args)
+    worker = InflightDeduplicator(state, lease_seconds=5.0, poll_seconds=0.02, result_ttl_seconds=5.0)
+    calls = []
+
+    async def analyze():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"scenes": []}
+
+    results = await asyncio.gather(*(worker.run("video", analyze) for _ in range(5)))
+    results[0]["scenes"].append("changed")
+
+    assert len(calls) == 1
+    assert len(acquires) == 1
+    assert results[1] == {"scenes": []}
+    stats = worker.stats()
+    assert stats["run"] == 1 and stats["coalesced"] == 4
+    assert stats["hit_rate"] == 0.8
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_run():
+    """Test the run goes on for the remaining callers when the one that started it goes away"""
+    worker = InflightDeduplicator(MemorySharedState(), lease_seconds=5.0, poll_seconds=0.02, result_ttl_seconds=5.0)
+
+    async def analyze():
+        await asyncio.sleep(0.1)
+        return {"summary": "done"}
+
+    first = asyncio.create_task(worker.run("video", analyze))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(worker.run("video", analyze))
+    await asyncio.sleep(0.02)
+    first.cancel()
+
+    assert await second == {"summary": "done"}
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_unjoined_run_publishes_no_result(make_worker):
+    """Test a run no other worker waited on leaves no copy of its result in the shared state"""
+    worker = make_worker()
+
+    async def analyze():
+        return {"summary": "A cat video"}
+
+    assert await worker.run("video", analyze) == {"summary": "A cat video"}
+    assert worker.state.get("inflight-result:video") is None
+
+
+@pytest.mark.asyncio
+async def test_waiters_get_the_owner_error_type(tmp_path):
+    """Test a waiter raises the owner's error as its own type when it is a known one"""
+    def make():
+        return InflightDeduplicator(
+            SQLiteSharedState(str(tmp_path / "state.db")),
+            lease_seconds=5.0,
+            poll_seconds=0.02,
+            result_ttl_seconds=5.0,
+            errors=(ScratchQuotaExceeded,),
+        )
+
+    async def analyze():
+        await asyncio.sleep(0.1)
+        raise ScratchQuotaExceeded("Scratch space is full")
+
+    results = await asyncio.gather(make().run("video", analyze), make().run("video", analyze), return_exceptions=True)
+
+    assert all(isinstance(result, ScratchQuotaExceeded) for result in results)
+    assert all("Scratch space is full" in str(result) for result in results)
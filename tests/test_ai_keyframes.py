@@ -0,0 +1,109 @@
+import sys
+import shutil
+import subprocess
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.keyframes import KeyframeOptions, change_scores, encode_jpegs, extract_keyframes, select_keyframes, thumbnails
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def make_video(path, colors, seconds):
+    inputs = []
+    for color in colors:
+        inputs += ["-f", "lavfi", "-i", f"color=c={color}:size=320x240:rate=10:duration={seconds}"]
+    streams = "".join(f"[{i}:v]" for i in range(len(colors)))
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", *inputs,
+         "-filter_complex", f"{streams}concat=n={len(colors)}:v=1[v]", "-map", "[v]",
+         "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(path)],
+        check=True,
+    )
+    return str(path)
+
+
+def test_change_scores_detects_cut():
+    """Test identical frames score 0 and a cut scores high, across batch boundaries"""
+    frames = np.zeros((4, 64, 64, 3), dtype=np.uint8)
+    frames[2:] = 255
+    thumbs = thumbnails(frames)
+
+    scores = change_scores(thumbs, None)
+    assert scores[0] == 1.0
+    assert scores[1] == 0.0
+    assert scores[2] == pytest.approx(1.0)
+    assert scores[3] == 0.0
+
+    continued = change_scores(thumbs[2:], thumbs[1])
+    np.testing.assert_allclose(continued, scores[2:])
+
+
+@requires_ffmpeg
+def test_extract_keyframes_keeps_shot_changes(tmp_path):
+    """Test one frame is kept per shot and static intervals are skipped"""
+    video = make_video(tmp_path / "cuts.mp4", ["black", "white", "blue"], 10)
+
+    keyframes, duration = extract_keyframes(video, KeyframeOptions(frames_per_minute=12, width=160, height=90))
+
+    assert duration == pytest.approx(30.0)
+    assert [frame.timestamp for frame in keyframes] == [0.0, 10.0, 20.0]
+    assert all(frame.jpeg.startswith(b"\xff\xd8") for frame in keyframes)
+
+
+@requires_ffmpeg
+def test_extract_keyframes_respects_budget(tmp_path):
+    """Test the frame budget caps the frames sent, keeping the opening frame and the biggest changes"""
+    colors = ["black", "white", "gray", "white", "black", "red"]
+    video = make_video(tmp_path / "busy.mp4", colors, 5)
+
+    keyframes, _ = extract_keyframes(video, KeyframeOptions(frames_per_minute=12, max_frames=3, width=160, height=90))
+
+    assert [frame.timestamp for frame in keyframes][0] == 0.0
+    assert len(keyframes) == 3
+    assert keyframes == sorted(keyframes, key=lambda frame: frame.timestamp)
+
+
+def test_select_keyframes_holds_only_the_budget(tmp_path):
+    """Test a long busy video keeps the biggest changes without holding every candidate frame at once"""
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(2000, 36, 64, 3), dtype=np.uint8)
+    options = KeyframeOptions(frames_per_minute=60, max_frames=5, sample_fps=1, width=64, height=36, min_score=0.0)
+    scores = change_scores(thumbnails(frames), None)
+    expected = [0] + sorted(sorted(range(1, len(frames)), key=lambda i: -scores[i])[:4])
+
+    def batches(*args, **kwargs):
+        for start in range(0, len(frames), 32):
+            # Copies, as ffmpeg output would be, so the kept frames are the only ones left alive
+            yield frames[start:start + 32].copy()
+
+    with patch('ai.keyframes.iter_video_frames', batches):
+        tracemalloc.start()
+        kept, duration = select_keyframes("busy.mp4", options)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert duration == 2000
+    assert [frame.timestamp for frame, _ in kept] == expected
+    np.testing.assert_array_equal(kept[1][1], frames[expected[1]])
+    # Every candidate kept at once would be 2000 frames of 6912 bytes
+    assert peak < 200 * frames[0].nbytes
+
+
+@requires_ffmpeg
+def test_encode_jpegs_returns_one_image_per_frame():
+    """Test frames are encoded in one call and split back apart"""
+    frames = [np.full((90, 160, 3), value, dtype=np.uint8) for value in (0, 128, 255)]
+
+    images = encode_jpegs(frames)
+
+    assert len(images) == 3
+    assert all(image.startswith(b"\xff\xd8") and image.endswith(b"\xff\xd9") for image in images)
+
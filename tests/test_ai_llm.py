@@ -0,0 +1,271 @@
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.llm import (
+    AdaptiveConcurrency,
+    CircuitBreaker,
+    CircuitOpenError,
+    GeminiClient,
+    LLMDeadlineExceeded,
+    backoff_delay,
+)
+from ai.video_extraction_model import VideoAnalysis
+
+MODEL = "gemini-2.0-flash-001"
+ANALYSIS = {"scenes": [{"start_time": 0, "end_time": 5, "description": "A cat"}], "summary": "A cat video"}
+
+
+class FakeGemini:
+    """
+    Local stand-in for the generateContent endpoint that replays scripted responses.
+
+    Each script entry is a status code or ``("sleep", seconds)``; once the
+    script runs out every request succeeds.
+    """
+    def __init__(self):
+        self.script = []
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                with fake.lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+                    action = fake.script.pop(0) if fake.script else 200
+                try:
+                    if isinstance(action, tuple):
+                        time.sleep(action[1])
+                        action = 200
+                    if action == 200:
+                        status, body = 200, {
+                            "candidates": [{
+                                "content": {"parts": [{"text": json.dumps(ANALYSIS)}], "role": "model"},
+                                "finishReason": "STOP",
+                            }],
+                            "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15},
+                        }
+                    else:
+                        status, body = action, {"error": {"code": action, "message": "scripted", "status": "UNAVAILABLE"}}
+                    data = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on a slow response
+                    pass
+                finally:
+                    with fake.lock:
+                        fake.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_gemini():
+    fake = FakeGemini()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def make_client(fake_gemini):
+    clients = []
+
+    def make(**kwargs):
+        options = {"backoff_base": 0.01, "backoff_max": 0.05, **kwargs}
+        client = GeminiClient(api_key="test", base_url=fake_gemini.url, **options)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.stop()
+
+
+def test_client_returns_structured_output(fake_gemini, make_client):
+    """Test a call reaches the server and parses into the requested schema, reusing the model"""
+    client = make_client()
+
+    first = client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+    second = client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+
+    assert first.model_dump()["summary"] == "A cat video"
+    assert second.model_dump() == first.model_dump()
+    assert len(client._models) == 1
+    assert fake_gemini.requests == 2
+
+
+def test_client_retries_rate_limits_and_backs_off_concurrency(fake_gemini, make_client):
+    """Test 429s are retried until success and halve the concurrency limit"""
+    client = make_client(initial_concurrency=8)
+    fake_gemini.script = [429, 429]
+
+    result = client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+
+    assert result.summary == "A cat video"
+    assert fake_gemini.requests == 3
+    assert client.retries == 2
+    assert client.concurrency.limit < 8 / 2
+
+
+def test_client_does_not_retry_client_errors(fake_gemini, make_client):
+    """Test a rejected request fails at once and does not count against the circuit"""
+    client = make_client(breaker_threshold=1)
+    fake_gemini.script = [400]
+
+    with pytest.raises(Exception):
+        client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+
+    assert fake_gemini.requests == 1
+    assert client.breaker.state == "closed"
+
+
+def test_client_enforces_deadline(fake_gemini, make_client):
+    """Test a slow server is cut off at the call's deadline instead of waiting forever"""
+    client = make_client()
+    fake_gemini.script = [("sleep", 2.0)]
+
+    start = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis, deadline=0.5)
+
+    assert time.monotonic() - start < 1.5
+
+
+def test_circuit_breaker_fails_fast_then_recovers(fake_gemini, make_client):
+    """Test consecutive server errors open the circuit, and a probe after the cooldown closes it"""
+    client = make_client(max_attempts=1, breaker_threshold=2, breaker_cooldown=0.2)
+    fake_gemini.script = [503, 503]
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+    with pytest.raises(CircuitOpenError):
+        client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+    assert fake_gemini.requests == 2
+
+    time.sleep(0.25)
+    assert client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis).summary == "A cat video"
+    assert client.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_does_not_keep_the_circuit_open(fake_gemini, make_client):
+    """Test a half-open probe that is cancelled frees the probe slot, so a later call goes through"""
+    client = make_client(max_attempts=1, breaker_threshold=1, breaker_cooldown=0.1)
+    fake_gemini.script = [503, ("sleep", 2.0)]
+    with pytest.raises(Exception):
+        await client.ainvoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+
+    await asyncio.sleep(0.15)
+    probe = asyncio.create_task(client.ainvoke("Analyze", MODEL, 0.0, schema=VideoAnalysis))
+    while fake_gemini.in_flight == 0:
+        await asyncio.sleep(0.01)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    await asyncio.sleep(0.15)
+    result = await client.ainvoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+    assert result.summary == "A cat video"
+    assert client.breaker.state == "closed"
+
+
+def test_probe_past_its_deadline_reopens_the_circuit(fake_gemini, make_client):
+    """Test a half-open probe cut off by its deadline counts as a failure instead of staying claimed"""
+    client = make_client(max_attempts=1, breaker_threshold=1, breaker_cooldown=0.1)
+    fake_gemini.script = [503]
+    with pytest.raises(Exception):
+        client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis)
+
+    time.sleep(0.15)
+    # Out of time before the request is even sent
+    with pytest.raises(LLMDeadlineExceeded):
+        client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis, deadline=1e-6)
+    assert client.breaker.state == "open"
+    assert fake_gemini.requests == 1
+
+    time.sleep(0.15)
+    assert client.invoke("Analyze", MODEL, 0.0, schema=VideoAnalysis).summary == "A cat video"
+
+
+@pytest.mark.asyncio
+async def test_client_caps_concurrent_requests(fake_gemini, make_client):
+    """Test concurrent calls from another event loop never exceed the concurrency limit"""
+    client = make_client(initial_concurrency=2, max_concurrency=2)
+    fake_gemini.script = [("sleep", 0.1)] * 6
+
+    results = await asyncio.gather(*(client.ainvoke("Analyze", MODEL, 0.0, schema=VideoAnalysis) for _ in range(6)))
+
+    assert len(results) == 6
+    assert fake_gemini.peak_in_flight == 2
+
+
+def test_adaptive_concurrency_aimd():
+    """Test fast successes grow the limit slowly, slow ones shrink it and overload halves it"""
+    limiter = AdaptiveConcurrency(initial=4, minimum=1, maximum=6, target_latency=1.0)
+
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert 4.9 < limiter.limit < 5.1
+
+    before = limiter.limit
+    limiter.on_success(2.0)
+    assert limiter.limit == pytest.approx(before * 0.9)
+
+    limiter.on_overload()
+    limiter.on_overload()
+    limiter.on_overload()
+    assert limiter.limit == 1
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    """Test delays stay within the exponential envelope and the cap"""
+    delays = [backoff_delay(attempt, base=1.0, cap=5.0) for attempt in range(10) for _ in range(20)]
+
+    assert all(0 <= delay <= 5.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(backoff_delay(0, base=1.0, cap=5.0) <= 1.0 for _ in range(20))
+
+
+def test_circuit_breaker_allows_single_probe():
+    """Test only one call goes through while half open"""
+    breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+    breaker.record_failure()
+
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    breaker.record_success()
+    breaker.allow()
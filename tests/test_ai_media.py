@@ -0,0 +1,126 @@
+import sys
+import base64
+import threading
+from pathlib import Path
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.media import (
+    GeminiFileClient,
+    GeminiFileUploadError,
+    UPLOAD_CHUNK_GRANULARITY,
+    encode_file_base64,
+    iter_base64_chunks,
+)
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 4000 + b"tail")
+    return path
+
+
+def test_encode_file_base64_matches_one_shot_encoding(video_file):
+    """Test chunked encoding produces the same output as encoding the whole file"""
+    expected = base64.b64encode(video_file.read_bytes()).decode("utf-8")
+
+    assert encode_file_base64(str(video_file), chunk_size=3 * 1024) == expected
+
+
+def test_iter_base64_chunks_bounded(video_file):
+    """Test every chunk stays within the configured size"""
+    chunks = list(iter_base64_chunks(str(video_file), chunk_size=3 * 1024))
+
+    assert len(chunks) > 1
+    assert max(len(chunk) for chunk in chunks) <= 4 * 1024
+
+
+def test_iter_base64_chunks_rejects_unaligned_chunk_size(video_file):
+    """Test chunk sizes that would add padding mid-stream are rejected"""
+    with pytest.raises(ValueError):
+        list(iter_base64_chunks(str(video_file), chunk_size=1000))
+
+
+def _response(headers=None, payload=None):
+    response = MagicMock()
+    response.headers = headers or {}
+    response.json.return_value = payload
+    return response
+
+
+def test_gemini_file_client_resumable_upload(video_file):
+    """Test the file is sent in aligned chunks and polled until active"""
+    session = MagicMock()
+    size = video_file.stat().st_size
+    session.post.side_effect = [
+        _response(headers={"X-Goog-Upload-URL": "https://upload.example/session"}),
+        _response(),
+        _response(),
+        _response(),
+        _response(payload={"file": {"name": "files/abc", "uri": "uri://abc", "state": "PROCESSING"}}),
+    ]
+    session.get.return_value = _response(payload={"name": "files/abc", "uri": "uri://abc", "state": "ACTIVE"})
+
+    client = GeminiFileClient("key", chunk_size=UPLOAD_CHUNK_GRANULARITY, session=session, poll_interval=0)
+    file = client.upload(str(video_file), "video/mp4")
+
+    assert file["state"] == "ACTIVE"
+    start_call, *chunk_calls = session.post.call_args_list
+    assert start_call.kwargs["headers"]["X-Goog-Upload-Header-Content-Length"] == str(size)
+    assert sum(len(call.kwargs["data"]) for call in chunk_calls) == size
+    assert [call.kwargs["headers"]["X-Goog-Upload-Offset"] for call in chunk_calls] == [
+        str(i * UPLOAD_CHUNK_GRANULARITY) for i in range(len(chunk_calls))
+    ]
+    assert chunk_calls[-1].kwargs["headers"]["X-Goog-Upload-Command"] == "upload, finalize"
+    assert all(call.kwargs["headers"]["X-Goog-Upload-Command"] == "upload" for call in chunk_calls[:-1])
+    assert all(call.kwargs["timeout"] == client.timeout for call in session.post.call_args_list)
+    assert session.get.call_args.kwargs["timeout"] == client.timeout
+
+
+def test_gemini_file_client_failed_processing(video_file):
+    """Test a file rejected by the service raises an upload error"""
+    session = MagicMock()
+    client = GeminiFileClient("key", session=session, poll_interval=0)
+    session.get.return_value = _response(payload={"name": "files/abc", "state": "FAILED"})
+
+    with pytest.raises(GeminiFileUploadError):
+        client.wait_until_active({"name": "files/abc", "state": "PROCESSING"})
+
+
+def test_gemini_file_client_from_settings():
+    """Test the host and timeouts come from settings, falling back to the public endpoint"""
+    config = SimpleNamespace(
+        google_api_key="key",
+        gemini_base_url="https://proxy.example/",
+        gemini_files_connect_timeout=3.0,
+        gemini_files_read_timeout=30.0,
+    )
+    session = MagicMock()
+    session.delete.return_value = _response()
+
+    client = GeminiFileClient.from_settings(config)
+    client._shared_session = session
+    client.delete("files/abc")
+
+    assert session.delete.call_args.args[0] == "https://proxy.example/v1beta/files/abc"
+    assert session.delete.call_args.kwargs["timeout"] == (3.0, 30.0)
+    config.gemini_base_url = ""
+    assert GeminiFileClient.from_settings(config).base_url == "https://generativelanguage.googleapis.com"
+
+
+def test_gemini_file_client_session_per_thread():
+    """Test each thread gets its own session, reused across that thread's calls"""
+    client = GeminiFileClient("key")
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(client.session))
+    thread.start()
+    thread.join()
+
+    assert client.session is client.session
+    assert sessions[0] is not client.session
@@ -0,0 +1,146 @@
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.pipeline import RateBudget, Stage, StageGraph
+
+
+@pytest.mark.asyncio
+async def test_stage_graph_passes_dependencies():
+    """Test stages receive inputs and upstream results in declared order"""
+    graph = StageGraph([
+        Stage("double", lambda x: x * 2, ("x",)),
+        Stage("add", lambda x, doubled: x + doubled, ("x", "double")),
+    ])
+
+    results = await graph.run(x=3)
+
+    assert results == {"double": 6, "add": 9}
+    assert set(graph.timings) == {"double", "add"}
+    assert set(graph.cpu_timings) == {"double", "add"}
+
+
+@pytest.mark.asyncio
+async def test_stage_graph_runs_independent_stages_concurrently():
+    """Test independent stages overlap instead of running back to back"""
+    barrier = threading.Barrier(3, timeout=2)
+
+    def wait_for_siblings(_):
+        barrier.wait()
+        return True
+
+    graph = StageGraph([
+        Stage("a", wait_for_siblings, ("x",)),
+        Stage("b", wait_for_siblings, ("x",)),
+        Stage("c", wait_for_siblings, ("x",)),
+    ])
+
+    results = await graph.run(x=None)
+
+    assert results == {"a": True, "b": True, "c": True}
+
+
+@pytest.mark.asyncio
+async def test_stage_graph_propagates_failure_and_skips_dependents():
+    """Test a failing stage raises its error and its dependents never run"""
+    calls = []
+
+    def fail(_):
+        raise RuntimeError("boom")
+
+    def dependent(value):
+        calls.append(value)
+
+    def slow(_):
+        time.sleep(0.05)
+        return "slow"
+
+    graph = StageGraph([
+        Stage("fail", fail, ("x",)),
+        Stage("dependent", dependent, ("fail",)),
+        Stage("slow", slow, ("x",)),
+    ])
+
+    with pytest.raises(RuntimeError, match="boom"):
+        await graph.run(x=1)
+
+    assert calls == []
+    assert "fail" not in graph.results
+    assert graph.failed == ["fail"]
+
+
+def test_stage_graph_rejects_unknown_dependencies():
+    """Test a dependency on an undeclared stage is rejected before running"""
+    graph = StageGraph([Stage("a", lambda y: y, ("missing",))])
+
+    with pytest.raises(ValueError):
+        asyncio.run(graph.run(x=1))
+
+
+@pytest.mark.asyncio
+async def test_stage_graph_limits_stages_sharing_a_resource():
+    """Test stages tagged with a limited resource never exceed its semaphore"""
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def tracked(_):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return True
+
+    limits = {"download": asyncio.Semaphore(1)}
+    graphs = [
+        StageGraph([
+            Stage("a", tracked, ("x",), resource="download"),
+            Stage("b", tracked, ("x",), resource="download"),
+        ], limits=limits)
+        for _ in range(2)
+    ]
+
+    await asyncio.gather(*(graph.run(x=None) for graph in graphs))
+
+    assert peak[0] == 1
+
+
+@pytest.mark.asyncio
+async def test_stage_graph_reports_results_as_stages_finish():
+    """Test on_result sees each stage's result in completion order"""
+    seen = []
+
+    def slow(x):
+        time.sleep(0.05)
+        return "slow"
+
+    graph = StageGraph([
+        Stage("slow", slow, ("x",)),
+        Stage("fast", lambda x: "fast", ("x",)),
+    ], on_result=lambda name, result: seen.append((name, result)))
+
+    await graph.run(x=None)
+
+    assert seen == [("fast", "fast"), ("slow", "slow")]
+
+
+def test_rate_budget_spaces_calls_across_threads():
+    """Test calls beyond the first wait for their slot in the per-minute budget"""
+    budget = RateBudget(per_minute=1200)
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: budget.acquire(), range(4)))
+
+    assert time.monotonic() - start >= 3 * 0.05 - 0.01
+    assert RateBudget(0).acquire() == 0
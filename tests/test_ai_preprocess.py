@@ -0,0 +1,92 @@
+import sys
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.audio import SAMPLING_RATE, load_pcm
+from ai.preprocess import ProxyOptions, preprocess_media, split_video
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+@pytest.fixture
+def source_video(tmp_path):
+    path = tmp_path / "source.mp4"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error",
+         "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30:duration=4",
+         "-f", "lavfi", "-i", "sine=frequency=440:duration=4:sample_rate=44100",
+         "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", str(path)],
+        check=True,
+    )
+    return str(path)
+
+
+def video_stream_info(path):
+    result = subprocess.run(["ffmpeg", "-i", path], capture_output=True, text=True)
+    return re.search(r"Video: .*?, (\d+)x(\d+).*?, ([\d.]+) fps", result.stderr).groups()
+
+
+def test_preprocess_media_produces_pcm_and_proxy(source_video, tmp_path):
+    """Test one ffmpeg run writes 16 kHz PCM and a smaller, downscaled proxy"""
+    output = tmp_path / "out"
+    output.mkdir()
+
+    media = preprocess_media(source_video, str(output), proxy=ProxyOptions(height=360, fps=1))
+
+    samples = load_pcm(media.audio_path)
+    assert media.audio_path.endswith(".f32")
+    assert abs(len(samples) - 4 * SAMPLING_RATE) < SAMPLING_RATE / 10
+    assert media.audio_seconds == pytest.approx(4.0, abs=0.1)
+    assert np.abs(samples).max() > 0.1
+
+    width, height, fps = video_stream_info(media.video_path)
+    assert (int(width), int(height)) == (640, 360)
+    assert float(fps) == 1
+    assert os.path.getsize(media.video_path) < os.path.getsize(source_video)
+
+
+def test_preprocess_media_audio_only(source_video, tmp_path):
+    """Test the proxy can be skipped when only the transcript is needed"""
+    media = preprocess_media(source_video, str(tmp_path), proxy=None)
+
+    assert media.video_path is None
+    assert os.path.exists(media.audio_path)
+
+
+def test_preprocess_media_reports_ffmpeg_errors(tmp_path):
+    """Test a broken input raises with ffmpeg's message"""
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+
+    with pytest.raises(Exception, match="ffmpeg failed"):
+        preprocess_media(str(broken), str(tmp_path))
+
+
+def test_split_video_covers_source(tmp_path):
+    """Test a video is split without re-encoding into pieces that cover it back to back"""
+    source = tmp_path / "long.mp4"
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=10:duration=9",
+         "-c:v", "libx264", "-preset", "ultrafast", "-g", "10", "-pix_fmt", "yuv420p", str(source)],
+        check=True,
+    )
+    output = tmp_path / "pieces"
+    output.mkdir()
+
+    segments = split_video(str(source), str(output), segment_seconds=3)
+
+    assert len(segments) == 3
+    assert segments[0].start == 0.0
+    assert segments[-1].end == pytest.approx(9.0, abs=0.2)
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:]))
+    assert all(os.path.exists(segment.path) for segment in segments)
+    assert sorted(os.listdir(output)) == ["segment-000.mp4", "segment-001.mp4", "segment-002.mp4"]
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.scenes import merge_segment_scenes, normalize_scenes, offset_scenes
+
+
+def scene(start, end, description, visual_elements=(), mood=""):
+    return {
+        "start_time": start,
+        "end_time": end,
+        "description": description,
+        "visual_elements": list(visual_elements),
+        "audio_elements": [],
+        "mood": mood,
+        "key_actions": [],
+    }
+
+
+def test_normalize_scenes_clamps_and_sorts():
+    """Test scene times are clamped to the video, inverted bounds swapped and scenes sorted"""
+    scenes = [
+        {"start_time": 12.0, "end_time": 40.0, "description": "b"},
+        {"start_time": 5.0, "end_time": -1.0, "description": "a"},
+    ]
+
+    result = normalize_scenes(scenes, duration=30.0)
+
+    assert [(s["start_time"], s["end_time"], s["description"]) for s in result] == [(0.0, 5.0, "a"), (12.0, 30.0, "b")]
+
+
+def test_offset_scenes_moves_times():
+    """Test segment scenes are moved onto the full video's timeline"""
+    result = offset_scenes([scene(0.0, 10.0, "a")], 300.0)
+
+    assert (result[0]["start_time"], result[0]["end_time"]) == (300.0, 310.0)
+
+
+def test_merge_segment_scenes_stitches_scene_split_at_boundary():
+    """Test a scene cut by a segment boundary is joined back, keeping elements once"""
+    first = [scene(0.0, 100.0, "Intro.", ["title"]), scene(100.0, 300.0, "A cat on stairs.", ["cat", "stairs"], "funny")]
+    second = [scene(300.0, 320.0, "The cat falls.", ["Cat", "stairs", "floor"]), scene(320.0, 400.0, "Credits.", ["text"])]
+
+    result = merge_segment_scenes([first, second], [300.0])
+
+    assert [(s["start_time"], s["end_time"]) for s in result] == [(0.0, 100.0), (100.0, 320.0), (320.0, 400.0)]
+    assert result[1]["description"] == "A cat on stairs. The cat falls."
+    assert result[1]["visual_elements"] == ["cat", "stairs", "floor"]
+    assert result[1]["mood"] == "funny"
+
+
+def test_merge_segment_scenes_keeps_distinct_scenes_apart():
+    """Test scenes meeting at a boundary stay separate when they look different or do not touch it"""
+    first = [scene(0.0, 300.0, "A cat.", ["cat"])]
+    different = [scene(300.0, 350.0, "A dog.", ["dog"])]
+    far = [scene(310.0, 350.0, "Still the cat.", ["cat"])]
+
+    assert len(merge_segment_scenes([first, different], [300.0])) == 2
+    assert len(merge_segment_scenes([first, far], [300.0])) == 2
@@ -0,0 +1,143 @@
+import sys
+import os
+import threading
+import time
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.scratch import ScratchQuotaExceeded, ScratchSpace
+
+
+def write_bytes(size):
+    def write(directory, name):
+        path = os.path.join(directory, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+    return write
+
+
+def test_fetch_shares_file_until_last_release(tmp_path):
+    """Test a file fetched twice is written once and deleted after both releases"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+    job = space.job()
+
+    first = job.fetch("video.mp4", 100, write_bytes(80))
+    second = job.fetch("video.mp4", 100, write_bytes(999))
+
+    assert first == second
+    assert os.path.getsize(first) == 80
+    assert space.used_bytes == 80
+
+    job.release(first)
+    assert os.path.exists(first)
+    job.release(first)
+    assert not os.path.exists(first)
+    assert space.used_bytes == 0
+    job.close()
+
+
+def test_jobs_get_unique_directories(tmp_path):
+    """Test files with the same name in different jobs do not collide"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+
+    with space.job() as a, space.job() as b:
+        path_a = a.fetch("video.mp4", 10, write_bytes(10))
+        path_b = b.fetch("video.mp4", 10, write_bytes(20))
+        assert path_a != path_b
+        assert space.stats()["jobs"] == 2
+
+    assert not os.path.exists(path_a)
+    assert not os.path.exists(path_b)
+    assert space.used_bytes == 0
+    assert space.jobs == 0
+
+
+def test_concurrent_fetch_writes_once(tmp_path):
+    """Test callers racing for the same key wait for the first writer"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+    job = space.job()
+    calls = []
+
+    def slow_write(directory, name):
+        calls.append(name)
+        time.sleep(0.05)
+        return write_bytes(10)(directory, name)
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(job.fetch("audio.mp4", 10, slow_write))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["audio.mp4"]
+    assert len(set(paths)) == 1
+    assert job.files["audio.mp4"].refs == 3
+    job.close()
+
+
+def test_failed_write_frees_reservation(tmp_path):
+    """Test a failing download releases its quota and reports the error to every caller"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+    job = space.job()
+
+    def fail(directory, name):
+        raise IOError("connection reset")
+
+    with pytest.raises(IOError):
+        job.fetch("video.mp4", 500, fail)
+
+    assert space.used_bytes == 0
+    assert "video.mp4" not in job.files
+    job.close()
+
+
+def test_quota_admission(tmp_path):
+    """Test reservations beyond the quota wait for space or fail"""
+    space = ScratchSpace(str(tmp_path), max_bytes=100, admission_timeout=0.05)
+
+    with pytest.raises(ScratchQuotaExceeded):
+        space.reserve(101)
+
+    space.reserve(80)
+    with pytest.raises(ScratchQuotaExceeded):
+        space.reserve(30)
+
+    timer = threading.Timer(0.02, space.free, args=(80,))
+    timer.start()
+    space.reserve(30, timeout=1)
+    timer.join()
+    assert space.used_bytes == 30
+
+
+def test_close_removes_files_still_referenced(tmp_path):
+    """Test closing a job deletes its directory even if stages never released their files"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+    job = space.job()
+    path = job.fetch("video.mp4", 10, write_bytes(10))
+
+    job.close()
+
+    assert not os.path.exists(path)
+    assert not job.directory.exists()
+    assert space.used_bytes == 0
+    with pytest.raises(RuntimeError):
+        job.fetch("video.mp4", 10, write_bytes(10))
+
+
+def test_purge_stale_removes_dead_process_directories(tmp_path):
+    """Test leftovers of crashed processes are removed but live ones are kept"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+    stale = tmp_path / "999999999-abc"
+    stale.mkdir()
+    live = tmp_path / f"{os.getpid()}-def"
+    live.mkdir()
+
+    assert space.purge_stale() == 1
+    assert not stale.exists()
+    assert live.exists()
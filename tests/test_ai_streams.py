@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.streams import StreamPolicy, select_audio_stream, select_video_stream
+
+
+def video(resolution, bitrate=None, filesize=None, progressive=True, subtype="mp4"):
+    return SimpleNamespace(
+        resolution=resolution, abr=None, bitrate=bitrate, filesize=filesize, subtype=subtype,
+        is_progressive=progressive, includes_video_track=True, includes_audio_track=progressive,
+    )
+
+
+def audio(abr, subtype="mp4", filesize=None):
+    return SimpleNamespace(
+        resolution=None, abr=abr, bitrate=None, filesize=filesize, subtype=subtype,
+        is_progressive=False, includes_video_track=False, includes_audio_track=True,
+    )
+
+
+STREAMS = [
+    video("144p", bitrate=100_000, filesize=1_000_000),
+    video("360p", bitrate=500_000, filesize=5_000_000),
+    video("720p", bitrate=2_000_000, filesize=20_000_000),
+    video("1080p", bitrate=4_000_000, filesize=40_000_000, progressive=False),
+    audio("48kbps"),
+    audio("128kbps"),
+    audio("160kbps", subtype="webm"),
+]
+
+
+def test_select_video_stream_respects_target_resolution():
+    """Test the best progressive stream at or below the target is chosen"""
+    assert select_video_stream(STREAMS, StreamPolicy(target_resolution=480)).resolution == "360p"
+    assert select_video_stream(STREAMS, StreamPolicy(target_resolution=1080)).resolution == "720p"
+
+
+def test_select_video_stream_respects_size_and_bitrate_caps():
+    """Test size and bitrate caps push the choice down"""
+    assert select_video_stream(STREAMS, StreamPolicy(target_resolution=720, max_video_bytes=10_000_000)).resolution == "360p"
+    assert select_video_stream(STREAMS, StreamPolicy(target_resolution=720, max_video_bitrate=200_000)).resolution == "144p"
+
+
+def test_select_video_stream_falls_back_to_smallest():
+    """Test the smallest stream is used when nothing fits the caps"""
+    assert select_video_stream(STREAMS, StreamPolicy(max_video_bytes=10)).resolution == "144p"
+
+
+def test_select_audio_stream_prefers_mp4_within_cap():
+    """Test the highest MP4 audio bitrate within the cap is chosen"""
+    assert select_audio_stream(STREAMS, StreamPolicy(max_audio_bitrate=128_000)).abr == "128kbps"
+    assert select_audio_stream(STREAMS, StreamPolicy(max_audio_bitrate=64_000)).abr == "48kbps"
+    assert select_audio_stream(STREAMS, StreamPolicy(max_audio_bitrate=None)).abr == "128kbps"
+
+
+def test_select_audio_stream_without_audio_only_streams():
+    """Test None is returned when there is no audio-only stream"""
+    assert select_audio_stream(STREAMS[:3], StreamPolicy()) is None
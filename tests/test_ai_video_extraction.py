@@ -1,8 +1,10 @@
 import sys
 import os
+import time
+import asyncio
 from pathlib import Path
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import ANY, AsyncMock, patch, MagicMock, mock_open
 import base64
 import torch
 from pytubefix import YouTube
@@ -17,13 +19,24 @@ from ai.video_extraction import (
     generate_transcript,
     analyze_video_with_structured_output,
     download_youtube_video,
+    download_youtube_audio,
     load_video,
-    analyze_youtube_video
+    analyze_youtube_video,
+    run_youtube_analysis,
+    stream_youtube_analysis
 )
+from ai.asr import asr_registry
+from ai.cache import result_cache
+from ai.youtube import youtube_resolver
+from ai.artifacts import ArtifactStore
+from ai.scratch import ScratchSpace
+from ai.preprocess import PreprocessedMedia, VideoSegment
+from ai.llm import GeminiClient
 
 # Test data
 TEST_VIDEO_URL = "https://www.youtube.com/watch?v=JzLtDZL7Nak"
 TEST_VIDEO_PATH = "Cat Falls Down The Stairs.mp4"
+TEST_AUDIO_PATH = "audio_Cat Falls Down The Stairs.mp4"
 TEST_BASE64_VIDEO = base64.b64encode(b"test video content").decode('utf-8')
 
 # Mock response data
@@ -64,9 +77,17 @@ MOCK_VIDEO_ANALYSIS = {
     "summary": "Test summary"
 }
 
+@pytest.fixture(autouse=True)
+def clear_result_cache():
+    result_cache.clear()
+    youtube_resolver.clear()
+    yield
+    result_cache.clear()
+    youtube_resolver.clear()
+
 @pytest.fixture
 def mock_youtube():
-    with patch('ai.video_extraction.YouTube') as mock:
+    with patch('ai.youtube.YouTube') as mock:
         youtube_instance = MagicMock()
         youtube_instance.title = "Test Video"
         youtube_instance.description = "Test Description"
@@ -77,10 +98,7 @@ def mock_youtube():
         youtube_instance.video_id = "JzLtDZL7Nak"
         youtube_instance.thumbnail_url = "https://i.ytimg.com/vi/JzLtDZL7Nak/sddefault.jpg"
         
-        video_stream = MagicMock()
-        video_stream.resolution = "360p"
-        video_stream.filesize = 1239637
-        youtube_instance.streams.get_highest_resolution.return_value = video_stream
+        youtube_instance.streams = [make_stream(resolution="360p", progressive=True, filesize=1239637)]
         
         mock.return_value = youtube_instance
         yield mock
@@ -103,11 +121,13 @@ def test_collect_metadata_invalid_url():
         collect_metadata("invalid-url")
 
 @pytest.mark.asyncio
-@patch('ai.video_extraction.AutoModelForSpeechSeq2Seq.from_pretrained')
-@patch('ai.video_extraction.AutoProcessor.from_pretrained')
-@patch('ai.video_extraction.pipeline')
+@patch('ai.video_extraction.settings.asr_long_form', False)
+@patch('ai.asr.AutoModelForSpeechSeq2Seq.from_pretrained')
+@patch('ai.asr.AutoProcessor.from_pretrained')
+@patch('ai.asr.pipeline')
 def test_generate_transcript_success(mock_pipeline, mock_processor, mock_model):
     """Test successful transcript generation"""
+    asr_registry.clear()
     # Mock pipeline response
     mock_pipeline.return_value.return_value = {
         "text": "Test transcript",
@@ -124,27 +144,94 @@ def test_generate_transcript_success(mock_pipeline, mock_processor, mock_model):
     assert len(result["transcricao"]["segmentos"]) == 1
     assert result["transcricao"]["segmentos"][0]["texto"] == "Test transcript"
 
+@patch('ai.video_extraction.settings.asr_long_form', False)
+@patch('ai.asr.AutoModelForSpeechSeq2Seq.from_pretrained')
+@patch('ai.asr.AutoProcessor.from_pretrained')
+@patch('ai.asr.pipeline')
+def test_generate_transcript_passes_pcm_as_samples(mock_pipeline, mock_processor, mock_model, tmp_path):
+    """Test preprocessed PCM reaches the pipeline as samples at 16 kHz instead of a path ffmpeg would misread"""
+    import numpy as np
+
+    asr_registry.clear()
+    mock_pipeline.return_value.return_value = {"text": "Olá", "chunks": [{"timestamp": [0, 3.0], "text": "Olá"}]}
+    samples = np.linspace(-1, 1, 3 * 16000, dtype=np.float32)
+    pcm_path = tmp_path / "audio.f32"
+    samples.tofile(pcm_path)
+
+    result = generate_transcript(str(pcm_path))
+
+    inputs = mock_pipeline.return_value.call_args.args[0]
+    assert inputs["sampling_rate"] == 16000
+    assert len(inputs["raw"]) == 3 * 16000
+    np.testing.assert_array_equal(inputs["raw"], samples)
+    assert result["transcricao"]["texto_completo"] == "Olá"
+
 @pytest.mark.asyncio
-@patch('ai.video_extraction.ChatGoogleGenerativeAI')
+@patch('ai.video_extraction.gemini_client', GeminiClient(api_key="test"))
+@patch('ai.llm.ChatGoogleGenerativeAI')
 def test_analyze_video_with_structured_output_success(mock_llm):
-    """Test successful video analysis with structured output"""
+    """Test successful video analysis with structured output, reusing the model between calls"""
     mock_llm_instance = MagicMock()
-    mock_llm_instance.with_structured_output.return_value.invoke.return_value.model_dump.return_value = MOCK_VIDEO_ANALYSIS
+    structured = mock_llm_instance.with_structured_output.return_value
+    structured.ainvoke = AsyncMock(return_value=MagicMock())
+    structured.ainvoke.return_value.model_dump.return_value = MOCK_VIDEO_ANALYSIS
     mock_llm.return_value = mock_llm_instance
     
     result = analyze_video_with_structured_output(TEST_BASE64_VIDEO)
+    analyze_video_with_structured_output(TEST_BASE64_VIDEO)
     
     assert result == MOCK_VIDEO_ANALYSIS
     mock_llm.assert_called_once()
+    assert structured.ainvoke.await_count == 2
+
+def make_stream(resolution=None, abr=None, progressive=False, video=True, audio=True, subtype="mp4",
+                bitrate=None, filesize=None, itag=18):
+    stream = MagicMock()
+    stream.itag = itag
+    stream.url = f"https://rr.example/videoplayback?itag={itag}&expire=1700000000"
+    stream.mime_type = f"{'video' if video else 'audio'}/{subtype}"
+    stream.is_sabr = False
+    stream.resolution = resolution
+    stream.abr = abr
+    stream.is_progressive = progressive
+    stream.includes_video_track = video
+    stream.includes_audio_track = audio
+    stream.subtype = subtype
+    stream.bitrate = bitrate
+    stream.filesize = filesize
+    return stream
+
+@patch('ai.youtube.request.stream', return_value=[b"video"])
+def test_download_youtube_video_success(mock_stream, mock_youtube):
+    """Test the video download picks a low resolution progressive stream and fetches it by URL"""
+    low = make_stream(resolution="360p", progressive=True, filesize=1_000_000, itag=18)
+    high = make_stream(resolution="720p", progressive=True, filesize=9_000_000, itag=22)
+    mock_youtube.return_value.streams = [high, low]
 
-def test_download_youtube_video_success(mock_youtube):
-    """Test successful video download"""
-    mock_youtube.return_value.streams.get_highest_resolution.return_value.download.return_value = TEST_VIDEO_PATH
-    
     result = download_youtube_video(TEST_VIDEO_URL)
-    
-    assert result == TEST_VIDEO_PATH
-    mock_youtube.return_value.streams.get_highest_resolution.assert_called_once()
+
+    try:
+        assert Path(result).read_bytes() == b"video"
+        mock_stream.assert_called_once_with(low.url)
+        low.download.assert_not_called()
+    finally:
+        os.remove(result)
+
+@patch('ai.youtube.request.stream', return_value=[b"aud", b"io"])
+def test_download_youtube_audio_success(mock_stream, mock_youtube):
+    """Test transcription downloads an audio-only stream"""
+    audio = make_stream(abr="48kbps", video=False, filesize=200_000, itag=139)
+    video = make_stream(resolution="360p", progressive=True, filesize=1_000_000, itag=18)
+    mock_youtube.return_value.streams = [video, audio]
+
+    result = download_youtube_audio(TEST_VIDEO_URL)
+
+    try:
+        assert result.endswith("audio.mp4")
+        assert Path(result).read_bytes() == b"audio"
+        mock_stream.assert_called_once_with(audio.url)
+    finally:
+        os.remove(result)
 
 def test_load_video_success():
     """Test successful video loading and base64 encoding"""
@@ -156,6 +243,9 @@ def test_load_video_success():
         assert result == TEST_BASE64_VIDEO
 
 @pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'inline')
 @patch('ai.video_extraction.download_youtube_video')
 @patch('ai.video_extraction.load_video')
 @patch('ai.video_extraction.analyze_video_with_structured_output')
@@ -166,10 +256,12 @@ async def test_analyze_youtube_video_success(
     mock_collect_metadata,
     mock_analyze_video,
     mock_load_video,
-    mock_download_video
+    mock_download_video,
+    mock_download_audio
 ):
     """Test successful end-to-end video analysis"""
     # Setup mocks
+    mock_download_audio.return_value = TEST_AUDIO_PATH
     mock_download_video.return_value = TEST_VIDEO_PATH
     mock_load_video.return_value = TEST_BASE64_VIDEO
     mock_analyze_video.return_value = MOCK_VIDEO_ANALYSIS
@@ -184,19 +276,469 @@ async def test_analyze_youtube_video_success(
     assert result["summary"] == MOCK_VIDEO_ANALYSIS["summary"]
     
     # Verify all mocks were called
-    mock_download_video.assert_called_once_with(TEST_VIDEO_URL)
+    mock_download_video.assert_called_once_with(TEST_VIDEO_URL, job=ANY)
     mock_load_video.assert_called_once_with(TEST_VIDEO_PATH)
     mock_analyze_video.assert_called_once()
     mock_collect_metadata.assert_called_once_with(TEST_VIDEO_URL)
-    mock_generate_transcript.assert_called_once_with(TEST_VIDEO_PATH)
+    mock_download_audio.assert_called_once_with(TEST_VIDEO_URL, job=ANY)
+    mock_generate_transcript.assert_called_once_with(TEST_AUDIO_PATH)
 
 @pytest.mark.asyncio
+@patch('ai.video_extraction.download_youtube_audio')
 @patch('ai.video_extraction.download_youtube_video')
-async def test_analyze_youtube_video_download_error(mock_download_video):
+async def test_analyze_youtube_video_download_error(mock_download_video, mock_download_audio):
     """Test video analysis with download error"""
     mock_download_video.side_effect = Exception("Download failed")
+    mock_download_audio.side_effect = Exception("Download failed")
     
     with pytest.raises(Exception) as exc_info:
         await analyze_youtube_video(TEST_VIDEO_URL)
     
     assert "Download failed" in str(exc_info.value)
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'inline')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.load_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_uses_stage_cache(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_load_video,
+    mock_download_video,
+    mock_download_audio
+):
+    """Test repeated analyses are served from the cache, per stage"""
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_load_video.return_value = TEST_BASE64_VIDEO
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    first = await analyze_youtube_video(TEST_VIDEO_URL)
+    second = await analyze_youtube_video(TEST_VIDEO_URL)
+
+    assert first == second
+    mock_download_video.assert_called_once()
+    mock_collect_metadata.assert_called_once()
+    mock_generate_transcript.assert_called_once()
+    mock_analyze_video.assert_called_once()
+
+    # Only the scenes entry depends on the prompt
+    with patch('ai.video_extraction.video_extraction_prompt', "another prompt"):
+        await analyze_youtube_video(TEST_VIDEO_URL)
+
+    assert mock_analyze_video.call_count == 2
+    assert mock_download_video.call_count == 2
+    mock_download_audio.assert_called_once()
+    mock_generate_transcript.assert_called_once()
+    mock_collect_metadata.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'inline')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.load_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_shares_concurrent_runs(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_load_video,
+    mock_download_video,
+    mock_download_audio
+):
+    """Test simultaneous requests for one video, in any URL form, trigger a single pipeline run"""
+    def transcribe(path):
+        time.sleep(0.2)
+        return {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_load_video.return_value = TEST_BASE64_VIDEO
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.side_effect = transcribe
+
+    results = await asyncio.gather(
+        analyze_youtube_video(TEST_VIDEO_URL),
+        analyze_youtube_video(TEST_VIDEO_URL),
+        analyze_youtube_video("https://youtu.be/JzLtDZL7Nak"),
+    )
+
+    assert results[0] == results[1] == results[2]
+    mock_download_video.assert_called_once()
+    mock_generate_transcript.assert_called_once()
+    mock_analyze_video.assert_called_once()
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'upload')
+@patch('ai.video_extraction.gemini_files')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.load_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_uploads_video(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_load_video,
+    mock_download_video,
+    mock_gemini_files,
+    mock_download_audio
+):
+    """Test upload mode sends a file reference and never base64-encodes the video"""
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_gemini_files.upload.return_value = {
+        "name": "files/abc123",
+        "uri": "https://generativelanguage.googleapis.com/v1beta/files/abc123",
+        "mimeType": "video/mp4",
+        "state": "ACTIVE"
+    }
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    await analyze_youtube_video(TEST_VIDEO_URL)
+
+    mock_load_video.assert_not_called()
+    mock_gemini_files.upload.assert_called_once_with(TEST_VIDEO_PATH, mime_type="video/mp4")
+    video_part = mock_analyze_video.call_args[0][0]
+    assert video_part["file_uri"].endswith("files/abc123")
+    assert "data" not in video_part
+    mock_gemini_files.delete.assert_called_once_with("files/abc123")
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'inline')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.load_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_stream_youtube_analysis_sends_partial_results(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_load_video,
+    mock_download_video,
+    mock_download_audio
+):
+    """Test metadata, segments and scenes are streamed as their stages finish"""
+    segments = [{"inicio": 0.0, "fim": 1.0, "texto": " first"}, {"inicio": 1.0, "fim": 2.0, "texto": " second"}]
+    transcript = {"transcricao": {"texto_completo": " first second", "segmentos": segments}}
+    analysis = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+
+    def transcribe(path, on_segments=None):
+        on_segments(segments[:1])
+        on_segments(segments[1:])
+        return transcript
+
+    def analyze_slowly(video_part):
+        time.sleep(0.05)
+        return analysis
+
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_load_video.return_value = TEST_BASE64_VIDEO
+    mock_analyze_video.side_effect = analyze_slowly
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.side_effect = transcribe
+
+    events = [item async for item in stream_youtube_analysis(TEST_VIDEO_URL)]
+    names = [name for name, _ in events]
+
+    assert names.index("metadados") < names.index("scenes")
+    assert names.index("transcricao") < names.index("scenes")
+    assert names[-1] == "done"
+    streamed = [segment for name, data in events if name == "segmentos" for segment in data]
+    assert streamed == segments
+    assert dict(events)["scenes"] == analysis
+
+    # A cached transcript arrives as a single batch of segments
+    events = [item async for item in stream_youtube_analysis(TEST_VIDEO_URL)]
+    assert [data for name, data in events if name == "segmentos"] == [segments]
+    mock_generate_transcript.assert_called_once()
+
+@patch('ai.youtube.request.stream', return_value=[b"0123456789"])
+def test_download_audio_fallback_shares_video_file(mock_stream, mock_youtube, tmp_path):
+    """Test a job downloads the video once when transcription falls back to it"""
+    video = make_stream(resolution="360p", progressive=True, filesize=10)
+    mock_youtube.return_value.streams = [video]
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+
+    with space.job() as job:
+        video_path = download_youtube_video(TEST_VIDEO_URL, job=job)
+        audio_path = download_youtube_audio(TEST_VIDEO_URL, job=job)
+
+        assert video_path == audio_path
+        assert video_path.startswith(str(job.directory))
+        mock_stream.assert_called_once()
+        assert job.files["video.mp4"].refs == 2
+
+    assert not os.path.exists(video_path)
+    assert space.used_bytes == 0
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.settings.video_transport', 'upload')
+@patch('ai.video_extraction.settings.media_preprocess', True)
+@patch('ai.video_extraction.gemini_files')
+@patch('ai.video_extraction.preprocess_media')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_preprocesses_once(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_download_video,
+    mock_preprocess,
+    mock_gemini_files,
+    mock_download_audio
+):
+    """Test ASR and Gemini both use the single preprocessing pass and no audio is downloaded"""
+    written = []
+
+    def preprocess(file_path, output_dir, audio=True, proxy=None):
+        paths = [os.path.join(output_dir, "audio.f32"), os.path.join(output_dir, "proxy.mp4")]
+        for path in paths:
+            with open(path, "wb") as f:
+                f.write(b"0" * 100)
+        written.extend(paths)
+        return PreprocessedMedia(paths[0], paths[1], 1.0)
+
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_preprocess.side_effect = preprocess
+    mock_gemini_files.upload.return_value = {"name": "files/abc123", "uri": "https://example/files/abc123"}
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    await analyze_youtube_video(TEST_VIDEO_URL)
+
+    mock_download_audio.assert_not_called()
+    assert mock_preprocess.call_args.kwargs["audio"] is True
+    mock_generate_transcript.assert_called_once_with(written[0])
+    mock_gemini_files.upload.assert_called_once_with(written[1], mime_type="video/mp4")
+    assert not any(os.path.exists(path) for path in written)
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', True)
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.prepare_video_part')
+@patch('ai.video_extraction.preprocess_media')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_reanalysis_reuses_stored_artifacts(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_download_video,
+    mock_preprocess,
+    mock_prepare_video_part,
+    mock_download_audio,
+    tmp_path
+):
+    """Test a prompt change reruns only the Gemini stages, on the stored proxy, and a speech model change only ASR"""
+    def preprocess(file_path, output_dir, audio=True, proxy=None):
+        paths = [os.path.join(output_dir, "audio.f32"), os.path.join(output_dir, "proxy.mp4")]
+        for path in paths:
+            with open(path, "wb") as f:
+                f.write(b"0" * 100)
+        return PreprocessedMedia(paths[0], paths[1], 1.0)
+
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_preprocess.side_effect = preprocess
+    mock_prepare_video_part.return_value = {"type": "media", "data": TEST_BASE64_VIDEO}
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+    store = ArtifactStore(str(tmp_path / "artifacts"))
+    events = []
+
+    with patch('ai.video_extraction.artifact_store', store):
+        first = await analyze_youtube_video(TEST_VIDEO_URL)
+        stored_proxy = store.load("JzLtDZL7Nak", {"proxy": store.manifest("JzLtDZL7Nak")["artifacts"]["proxy"]["inputs"]})["proxy"]
+        # Nothing left in the result cache: only the artifacts can spare the stages
+        result_cache.clear()
+        with patch('ai.video_extraction.video_extraction_prompt', "another prompt"):
+            second = await analyze_youtube_video(TEST_VIDEO_URL, listener=lambda stage, result: events.append((stage, result)))
+
+    assert second == first
+    mock_download_video.assert_called_once()
+    mock_preprocess.assert_called_once()
+    mock_collect_metadata.assert_called_once()
+    mock_generate_transcript.assert_called_once()
+    assert mock_analyze_video.call_count == 2
+    assert mock_prepare_video_part.call_args.args[0] == stored_proxy
+    assert os.path.exists(stored_proxy)
+    assert dict(events)["stages"] == {
+        "run": ["video_part", "multimodal_analysis"],
+        "skipped": ["metadata", "download", "media", "transcript"],
+    }
+
+    result_cache.clear()
+    with patch('ai.video_extraction.artifact_store', store), \
+            patch('ai.video_extraction.video_extraction_prompt', "another prompt"), \
+            patch('ai.video_extraction.settings.speech_model', "openai/whisper-large-v3"):
+        await analyze_youtube_video(TEST_VIDEO_URL)
+
+    # The stored proxy has no PCM track, so ASR gets the audio-only stream
+    mock_download_video.assert_called_once()
+    mock_generate_transcript.assert_called_with(TEST_AUDIO_PATH)
+    assert mock_generate_transcript.call_count == 2
+    assert mock_analyze_video.call_count == 2
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.analysis_mode', 'keyframes')
+@patch('ai.video_extraction.settings.media_preprocess', True)
+@patch('ai.video_extraction.extract_keyframes')
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.prepare_video_part')
+@patch('ai.video_extraction.gemini_client')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_keyframes_mode(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_gemini_client,
+    mock_prepare_video_part,
+    mock_download_video,
+    mock_download_audio,
+    mock_extract_keyframes
+):
+    """Test keyframes mode sends frames and transcript text instead of the video and clamps scene times"""
+    from ai.keyframes import Keyframe
+
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_extract_keyframes.return_value = ([Keyframe(0.0, 1.0, b"\xff\xd8a"), Keyframe(12.5, 0.4, b"\xff\xd8b")], 20.0)
+    mock_gemini_client.invoke.return_value.model_dump.return_value = {
+        "scenes": [{**MOCK_VIDEO_ANALYSIS["scenes"][0], "start_time": 0.0, "end_time": 25.0}],
+        "summary": MOCK_VIDEO_ANALYSIS["summary"],
+    }
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    result = await analyze_youtube_video(TEST_VIDEO_URL)
+
+    mock_prepare_video_part.assert_not_called()
+    mock_extract_keyframes.assert_called_once_with(TEST_VIDEO_PATH, ANY)
+    mock_generate_transcript.assert_called_once_with(TEST_AUDIO_PATH)
+    content = mock_gemini_client.invoke.call_args.args[0]
+    images = [part for part in content if part.get("type") == "image_url"]
+    texts = [part["text"] for part in content if part.get("type") == "text"]
+    assert len(images) == 2
+    assert images[0]["image_url"].startswith("data:image/jpeg;base64,")
+    assert "Frame at 12.5s:" in texts
+    assert "Test transcript" in texts[-1]
+    assert result["scenes"][0]["end_time"] == 20.0
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.analysis_mode', 'segmented')
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.settings.segment_concurrency', 2)
+@patch('ai.video_extraction.split_video')
+@patch('ai.video_extraction.prepare_video_part')
+@patch('ai.video_extraction.delete_uploaded_video')
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.gemini_client')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_analyze_youtube_video_segmented_mode(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_gemini_client,
+    mock_analyze_video,
+    mock_download_video,
+    mock_download_audio,
+    mock_delete_uploaded_video,
+    mock_prepare_video_part,
+    mock_split_video
+):
+    """Test segments are analyzed separately, moved onto the video timeline, stitched and summarized"""
+    written = []
+
+    def split(file_path, output_dir, segment_seconds):
+        segments = []
+        for index, (start, end) in enumerate([(0.0, 300.0), (300.0, 420.0)]):
+            path = os.path.join(output_dir, f"segment-{index:03d}.mp4")
+            with open(path, "wb") as f:
+                f.write(b"0" * 100)
+            segments.append(VideoSegment(path, start, end))
+        written.extend(segment.path for segment in segments)
+        return segments
+
+    def analyze(video_part, prompt):
+        scenes = {
+            "part 1 of 2": [{**MOCK_VIDEO_ANALYSIS["scenes"][0], "start_time": 0.0, "end_time": 300.0}],
+            "part 2 of 2": [
+                {**MOCK_VIDEO_ANALYSIS["scenes"][0], "start_time": 0.0, "end_time": 60.0},
+                {**MOCK_VIDEO_ANALYSIS["scenes"][0], "start_time": 60.0, "end_time": 500.0, "visual_elements": ["dog"]},
+            ],
+        }
+        part = next(key for key in scenes if key in prompt)
+        return {"scenes": scenes[part], "summary": f"Summary of {part}"}
+
+    mock_download_video.return_value = TEST_VIDEO_PATH
+    mock_download_audio.return_value = TEST_AUDIO_PATH
+    mock_split_video.side_effect = split
+    mock_prepare_video_part.side_effect = lambda path: {"type": "media", "file_uri": f"https://example/files/{os.path.basename(path)}"}
+    mock_analyze_video.side_effect = analyze
+    mock_gemini_client.invoke.return_value.content = "Whole video summary"
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_generate_transcript.return_value = {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    result = await analyze_youtube_video(TEST_VIDEO_URL)
+
+    mock_split_video.assert_called_once_with(TEST_VIDEO_PATH, ANY, 300.0)
+    assert [(s["start_time"], s["end_time"]) for s in result["scenes"]] == [(0.0, 360.0), (360.0, 420.0)]
+    assert result["summary"] == "Whole video summary"
+    summary_prompt = mock_gemini_client.invoke.call_args.args[0]
+    assert "Part 1: Summary of part 1 of 2" in summary_prompt
+    assert mock_delete_uploaded_video.call_count == 2
+    assert not any(os.path.exists(path) for path in written)
+
+@patch('ai.video_extraction.cpu_pool')
+def test_load_video_stays_in_process(mock_cpu_pool, tmp_path):
+    """Test base64 encoding never goes through the process pool, which would pickle the whole string back"""
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"test video content")
+
+    assert load_video(str(path)) == TEST_BASE64_VIDEO
+    mock_cpu_pool.call.assert_not_called()
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.build_stages', side_effect=RuntimeError("bad stage plan"))
+@patch('ai.video_extraction.collect_metadata')
+async def test_analysis_setup_failure_releases_the_job(mock_collect_metadata, mock_build_stages, tmp_path):
+    """Test a failure while planning the stages still closes the scratch job"""
+    space = ScratchSpace(str(tmp_path), max_bytes=1000)
+
+    with patch('ai.video_extraction.scratch_space', space), pytest.raises(RuntimeError, match="bad stage plan"):
+        await run_youtube_analysis(TEST_VIDEO_URL)
+
+    assert space.jobs == 0
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,182 @@
+import sys
+import gc
+import time
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import pytest
+from unittest.mock import MagicMock, patch
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from ai.youtube import StreamDescriptor, YouTubeResolver, youtube_resolver
+from ai.video_extraction import collect_metadata, download_youtube_video
+
+VIDEO_ID = "JzLtDZL7Nak"
+
+
+STREAM_URL = "https://rr.example/videoplayback?itag=18&expire=1700000000"
+
+
+def make_stream(**fields):
+    stream = MagicMock(itag=18, url=STREAM_URL, mime_type="video/mp4", subtype="mp4", resolution="360p", abr=None,
+                       bitrate=None, filesize=1000, is_progressive=True, includes_video_track=True,
+                       includes_audio_track=True, is_sabr=False)
+    stream.configure_mock(**fields)
+    return stream
+
+
+def make_youtube(url):
+    yt = MagicMock()
+    yt.video_id = url.rsplit("=", 1)[-1]
+    yt.title = "Test Video"
+    yt.description = "Test Description"
+    yt.length = 19
+    yt.publish_date = datetime(2022, 10, 28, 5, 8, 30)
+    yt.author = "Test Author"
+    yt.views = 82263
+    yt.thumbnail_url = f"https://i.ytimg.com/vi/{yt.video_id}/sddefault.jpg"
+    return yt
+
+
+def test_resolver_shares_entry_between_url_forms():
+    """Test every URL form of a video is fetched once, from its canonical watch URL"""
+    factory = MagicMock(side_effect=make_youtube)
+    resolver = YouTubeResolver(ttl_seconds=60, max_entries=10, factory=factory)
+
+    first = resolver.resolve(f"https://www.youtube.com/watch?v={VIDEO_ID}&t=10")
+    second = resolver.resolve(f"https://youtu.be/{VIDEO_ID}")
+    third = resolver.resolve(f"youtube.com/watch?v={VIDEO_ID}")
+
+    factory.assert_called_once_with(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+    assert first is second is third
+    assert first.title == "Test Video"
+
+
+def test_resolver_refetches_after_ttl():
+    """Test entries expire so stream URLs are never used past their lifetime"""
+    factory = MagicMock(side_effect=make_youtube)
+    resolver = YouTubeResolver(ttl_seconds=0.05, max_entries=10, factory=factory)
+
+    resolver.resolve(f"https://youtu.be/{VIDEO_ID}")
+    time.sleep(0.1)
+    resolver.resolve(f"https://youtu.be/{VIDEO_ID}")
+
+    assert factory.call_count == 2
+
+
+def test_resolver_coalesces_concurrent_lookups():
+    """Test concurrent lookups of an uncached video wait for one fetch"""
+    started = threading.Event()
+
+    def slow_youtube(url):
+        started.set()
+        time.sleep(0.1)
+        return make_youtube(url)
+
+    factory = MagicMock(side_effect=slow_youtube)
+    resolver = YouTubeResolver(ttl_seconds=60, max_entries=10, factory=factory)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(resolver.resolve, [f"https://youtu.be/{VIDEO_ID}"] * 4))
+
+    factory.assert_called_once()
+    assert all(result is results[0] for result in results)
+
+
+def test_resolver_does_not_cache_failures():
+    """Test a failed fetch reaches every waiter and the next lookup tries again"""
+    factory = MagicMock(side_effect=[Exception("unavailable"), make_youtube(f"v={VIDEO_ID}")])
+    resolver = YouTubeResolver(ttl_seconds=60, max_entries=10, factory=factory)
+
+    with pytest.raises(Exception, match="unavailable"):
+        resolver.resolve(f"https://youtu.be/{VIDEO_ID}")
+
+    assert resolver.resolve(f"https://youtu.be/{VIDEO_ID}").video_id == VIDEO_ID
+
+
+def test_resolver_rejects_urls_without_video_id():
+    """Test URLs without a video id fail before any request"""
+    factory = MagicMock()
+    resolver = YouTubeResolver(ttl_seconds=60, max_entries=10, factory=factory)
+
+    with pytest.raises(ValueError):
+        resolver.resolve("https://example.com/")
+    factory.assert_not_called()
+
+
+@patch('ai.youtube.request.stream', return_value=[b"video"])
+@patch('ai.youtube.YouTube')
+def test_metadata_and_download_share_one_fetch(mock_youtube, mock_stream):
+    """Test the metadata and download stages of a request fetch the page once"""
+    yt = make_youtube(f"v={VIDEO_ID}")
+    yt.streams = [make_stream()]
+    mock_youtube.return_value = yt
+    youtube_resolver.clear()
+
+    try:
+        metadata = collect_metadata(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+        path = download_youtube_video(f"https://youtu.be/{VIDEO_ID}")
+    finally:
+        youtube_resolver.clear()
+
+    mock_youtube.assert_called_once()
+    assert metadata["metadados"]["data_upload"] == "2022-10-28T05:08:30"
+    assert metadata["metadados"]["resolucao"] == "360p"
+    mock_stream.assert_called_once_with(STREAM_URL)
+    assert Path(path).read_bytes() == b"video"
+    Path(path).unlink()
+
+
+class Page:
+    """
+    Stands in for a pytubefix ``YouTube``, whose streams point back at it
+    """
+    def __init__(self, url):
+        self.video_id = url.rsplit("=", 1)[-1]
+        self.title = self.description = self.author = self.thumbnail_url = ""
+        self.length = self.views = 0
+        self.publish_date = None
+        self.streams = [
+            make_stream(_monostate=self),
+            make_stream(itag=251, mime_type="audio/webm", subtype="webm", resolution=None, abr="160kbps",
+                        is_progressive=False, includes_video_track=False, _monostate=self),
+            make_stream(itag=137, resolution="1080p", is_progressive=False, includes_audio_track=False,
+                        _monostate=self),
+        ]
+
+
+def test_resolver_does_not_keep_the_page_alive():
+    """Test cached entries hold plain stream descriptors, not streams tied to the fetched page"""
+    pages = []
+
+    def factory(url):
+        pages.append(weakref.ref(page := Page(url)))
+        return page
+
+    resolver = YouTubeResolver(ttl_seconds=60, max_entries=10, factory=factory)
+    video = resolver.resolve(f"https://youtu.be/{VIDEO_ID}")
+    gc.collect()
+
+    assert pages[0]() is None
+    assert [stream.itag for stream in video.streams] == [18, 251]
+    assert all(isinstance(stream, StreamDescriptor) for stream in video.streams)
+    assert video.streams[0].expires_at == 1700000000.0
+
+
+@patch('ai.youtube.YouTube')
+def test_sabr_stream_is_rebuilt_from_a_fresh_page(mock_youtube, tmp_path):
+    """Test SABR streams, which cannot be fetched by URL, are downloaded through a fresh page"""
+    fresh = make_stream(is_sabr=True)
+    fresh.download.return_value = str(tmp_path / "video.mp4")
+    mock_youtube.return_value.streams.get_by_itag.return_value = fresh
+    descriptor = StreamDescriptor.from_stream(VIDEO_ID, make_stream(is_sabr=True))
+
+    assert descriptor.download(str(tmp_path), "video.mp4") == str(tmp_path / "video.mp4")
+    mock_youtube.assert_called_once_with(f"https://www.youtube.com/watch?v={VIDEO_ID}")
+    mock_youtube.return_value.streams.get_by_itag.assert_called_once_with(18)
+    fresh.download.assert_called_once_with(output_path=str(tmp_path), filename="video.mp4")
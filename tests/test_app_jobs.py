@@ -0,0 +1,131 @@
+import sys
+import asyncio
+import time
+from pathlib import Path
+import pytest
+from unittest.mock import patch
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from app.jobs import (
+    Job,
+    JobManager,
+    JobQueueFull,
+    JobStatus,
+    InMemoryJobStore,
+    SQLiteJobStore,
+    create_job_store,
+)
+
+TEST_VIDEO_URL = "https://www.youtube.com/watch?v=JzLtDZL7Nak"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_job_store_roundtrip(store):
+    """Test jobs can be created, read back and updated"""
+    store.create(Job(id="job1", url=TEST_VIDEO_URL, created_at=1.0, updated_at=1.0))
+
+    job = store.get("job1")
+    assert job.status == JobStatus.QUEUED
+    assert job.url == TEST_VIDEO_URL
+
+    updated = store.update("job1", status=JobStatus.COMPLETED, result={"summary": "ok"})
+    assert updated.status == JobStatus.COMPLETED
+    assert store.get("job1").result == {"summary": "ok"}
+    assert store.get("job1").updated_at > 1.0
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_job_store_keeps_at_most_max_finished(backend, tmp_path):
+    """Test the oldest finished jobs are dropped past max_finished while pending ones are kept"""
+    store = create_job_store(backend, str(tmp_path / "jobs.db"), max_finished=2)
+    for i in range(4):
+        store.create(Job(id=f"job{i}", url=TEST_VIDEO_URL, created_at=1.0, updated_at=1.0))
+    store.create(Job(id="pending", url=TEST_VIDEO_URL, created_at=1.0, updated_at=1.0))
+    for i in range(4):
+        store.update(f"job{i}", status=JobStatus.COMPLETED, result={"i": i})
+
+    assert [store.get(f"job{i}") is not None for i in range(4)] == [False, False, True, True]
+    assert store.get("pending").status == JobStatus.QUEUED
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_job_store_expires_finished_jobs(backend, tmp_path):
+    """Test finished jobs are gone once retention_seconds have passed"""
+    store = create_job_store(backend, str(tmp_path / "jobs.db"), retention_seconds=60)
+    store.create(Job(id="done", url=TEST_VIDEO_URL, created_at=1.0, updated_at=1.0))
+    store.create(Job(id="running", url=TEST_VIDEO_URL, created_at=1.0, updated_at=1.0))
+    store.update("done", status=JobStatus.FAILED, error="boom")
+    store.update("running", status=JobStatus.RUNNING)
+
+    with patch("app.jobs.time.time", return_value=time.time() + 120):
+        assert store.get("done") is None
+        assert store.get("running").status == JobStatus.RUNNING
+
+
+def test_job_store_missing_job(store):
+    """Test unknown job ids return None"""
+    assert store.get("missing") is None
+    assert store.update("missing", status=JobStatus.FAILED) is None
+
+
+@pytest.mark.asyncio
+async def test_job_manager_runs_jobs():
+    """Test submitted jobs are processed by the worker pool"""
+    async def runner(url):
+        return {"url": url}
+
+    manager = JobManager(InMemoryJobStore(), runner, workers=2, max_queue=4)
+    job = await manager.submit(TEST_VIDEO_URL)
+    await manager._queue.join()
+
+    finished = await manager.get(job.id)
+    assert finished.status == JobStatus.COMPLETED
+    assert finished.result == {"url": TEST_VIDEO_URL}
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_manager_records_failures():
+    """Test a failing job is marked as failed with its error"""
+    async def runner(url):
+        raise Exception("Download failed")
+
+    manager = JobManager(InMemoryJobStore(), runner, workers=1, max_queue=4)
+    job = await manager.submit(TEST_VIDEO_URL)
+    await manager._queue.join()
+
+    failed = await manager.get(job.id)
+    assert failed.status == JobStatus.FAILED
+    assert "Download failed" in failed.error
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_manager_backpressure():
+    """Test submissions are rejected once the queue is full"""
+    release = asyncio.Event()
+
+    async def runner(url):
+        await release.wait()
+        return {}
+
+    manager = JobManager(InMemoryJobStore(), runner, workers=1, max_queue=1)
+    await manager.submit(TEST_VIDEO_URL)
+    await asyncio.sleep(0)
+    await manager.submit(TEST_VIDEO_URL)
+
+    with pytest.raises(JobQueueFull):
+        await manager.submit(TEST_VIDEO_URL)
+
+    release.set()
+    await manager._queue.join()
+    await manager.stop()
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+import pytest
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from app.metrics import Metric, MetricsRegistry
+
+
+def test_counter_and_gauge_render():
+    """Test counters and gauges render in the Prometheus text format"""
+    registry = MetricsRegistry()
+    downloads = registry.counter("download_bytes_total", "Bytes downloaded", ["kind"])
+    depth = registry.gauge("queue_depth", "Queue depth")
+
+    downloads.inc(100, kind="video")
+    downloads.inc(20, kind="audio")
+    downloads.inc(5, kind="video")
+    depth.set(3)
+
+    output = registry.render()
+    assert "# TYPE download_bytes_total counter" in output
+    assert 'download_bytes_total{kind="video"} 105' in output
+    assert 'download_bytes_total{kind="audio"} 20' in output
+    assert "# TYPE queue_depth gauge" in output
+    assert "queue_depth 3" in output
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test histogram buckets, sum and count follow the exposition format"""
+    registry = MetricsRegistry()
+    seconds = registry.histogram("stage_seconds", "Stage wall time", ["stage"], buckets=(1, 5))
+
+    for value in (0.5, 2, 10):
+        seconds.observe(value, stage="transcript")
+
+    output = registry.render()
+    assert 'stage_seconds_bucket{stage="transcript",le="1"} 1' in output
+    assert 'stage_seconds_bucket{stage="transcript",le="5"} 2' in output
+    assert 'stage_seconds_bucket{stage="transcript",le="+Inf"} 3' in output
+    assert 'stage_seconds_sum{stage="transcript"} 12.5' in output
+    assert 'stage_seconds_count{stage="transcript"} 3' in output
+
+
+def test_metrics_validate_labels():
+    """Test observations with the wrong labels are rejected"""
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events", ["kind"])
+
+    with pytest.raises(ValueError):
+        counter.inc(stage="download")
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind="video")
+
+
+def test_registry_returns_existing_metric():
+    """Test registering the same name twice returns the first metric"""
+    registry = MetricsRegistry()
+
+    assert registry.counter("events_total", "Events") is registry.counter("events_total", "Events")
+
+
+def test_metric_requires_samples():
+    """Test the base metric is abstract, so every metric type must render its own samples"""
+    with pytest.raises(TypeError):
+        Metric("base", "Abstract metric")
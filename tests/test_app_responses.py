@@ -0,0 +1,86 @@
+import sys
+import gzip
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+import pytest
+import zstandard
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from app.responses import JSON, MSGPACK, compress, dumps, negotiate, render, summarize_analysis
+
+ANALYSIS = {
+    "metadados": {"id_video": "JzLtDZL7Nak", "duracao_segundos": 19, "titulo": "Gato cai da escada"},
+    "transcricao": {
+        "texto_completo": "Olá a todos",
+        "segmentos": [{"inicio": 0.0, "fim": 1.5, "texto": "Olá"}, {"inicio": 1.5, "fim": None, "texto": "a todos"}],
+    },
+    "scenes": [{"start_time": 0, "end_time": 19, "description": "Um gato"}],
+    "summary": "Um gato",
+}
+
+
+def test_dumps_matches_json_module():
+    """Test the fast serializer produces the same JSON as the standard library, including non-ASCII text"""
+    assert json.loads(dumps(ANALYSIS)) == ANALYSIS
+    assert "Olá".encode("utf-8") in dumps(ANALYSIS)
+    assert json.loads(dumps({"when": Path("/tmp")})) == {"when": "/tmp"}
+
+
+def test_negotiate_prefers_msgpack_only_when_asked():
+    """Test MessagePack is chosen when accepted at least as strongly as JSON and JSON otherwise"""
+    # Stands in for the optional ormsgpack package, which negotiation only checks for
+    with patch('app.responses.ormsgpack', MagicMock()):
+        assert negotiate("", "")[0] == JSON
+        assert negotiate("*/*", "")[0] == JSON
+        assert negotiate("application/msgpack", "")[0] == MSGPACK
+        assert negotiate("application/json, application/x-msgpack;q=0.5", "")[0] == JSON
+        assert negotiate("application/json;q=0.5, application/msgpack", "")[0] == MSGPACK
+
+    with patch('app.responses.ormsgpack', None):
+        assert negotiate("application/msgpack", "")[0] == JSON
+
+
+
+def test_msgpack_round_trips_when_installed():
+    """Test the msgpack extra is picked up and renders the same content as JSON"""
+    ormsgpack = pytest.importorskip("ormsgpack")
+
+    assert negotiate("application/msgpack")[0] == MSGPACK
+    assert ormsgpack.unpackb(render(ANALYSIS, MSGPACK)) == json.loads(render(ANALYSIS, JSON))
+
+def test_negotiate_encoding_by_weight_then_preference():
+    """Test the heaviest accepted encoding wins, ties go to zstd, and q=0 or unknown codings are refused"""
+    assert negotiate("", "gzip, deflate, br")[1] == "gzip"
+    assert negotiate("", "gzip, zstd")[1] == "zstd"
+    assert negotiate("", "zstd;q=0.5, gzip")[1] == "gzip"
+    assert negotiate("", "*")[1] == "zstd"
+    assert negotiate("", "*, zstd;q=0")[1] == "gzip"
+    assert negotiate("", "identity")[1] is None
+    assert negotiate("", "")[1] is None
+
+
+def test_compress_round_trips():
+    """Test both encodings decompress back to the rendered body"""
+    body = render(ANALYSIS, JSON)
+
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert zstandard.ZstdDecompressor().decompress(compress(body, "zstd")) == body
+
+
+def test_summarize_analysis_has_counts_not_text():
+    """Test the log summary reports sizes and counts and none of the transcript"""
+    summary = summarize_analysis(ANALYSIS)
+
+    assert summary == {
+        "video_id": "JzLtDZL7Nak",
+        "duration_seconds": 19,
+        "transcript_chars": 11,
+        "segments": 2,
+        "scenes": 1,
+        "summary_chars": 7,
+    }
+    assert summarize_analysis({})["segments"] == 0
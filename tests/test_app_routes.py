@@ -1,11 +1,16 @@
 import sys
 import os
+import json
+import time
+import asyncio
+import threading
 from pathlib import Path
 
 # Add the project root directory to Python path
 project_root = str(Path(__file__).parent.parent)
 sys.path.insert(0, project_root)
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
@@ -90,6 +95,60 @@ def test_info_endpoint():
     assert "model" in data
     assert "temperature" in data
 
+def test_metrics_endpoint():
+    """Test the /metrics endpoint serves Prometheus text"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE pipeline_stage_seconds histogram" in response.text
+    assert "job_queue_depth" in response.text
+
+@pytest.mark.asyncio
+@patch('ai.video_extraction.settings.media_preprocess', False)
+@patch('ai.video_extraction.settings.video_transport', 'inline')
+@patch('ai.video_extraction.load_video')
+@patch('ai.video_extraction.download_youtube_audio')
+@patch('ai.video_extraction.download_youtube_video')
+@patch('ai.video_extraction.analyze_video_with_structured_output')
+@patch('ai.video_extraction.collect_metadata')
+@patch('ai.video_extraction.generate_transcript')
+async def test_info_responds_while_analysis_runs(
+    mock_generate_transcript,
+    mock_collect_metadata,
+    mock_analyze_video,
+    mock_download_video,
+    mock_download_audio,
+    mock_load_video
+):
+    """Test the event loop keeps serving requests while an analysis stage is busy"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def transcribe(path):
+        started.set()
+        release.wait(5)
+        return {"transcricao": MOCK_VIDEO_ANALYSIS["transcricao"]}
+
+    mock_generate_transcript.side_effect = transcribe
+    mock_collect_metadata.return_value = {"metadados": MOCK_VIDEO_ANALYSIS["metadados"]}
+    mock_analyze_video.return_value = {"scenes": MOCK_VIDEO_ANALYSIS["scenes"], "summary": MOCK_VIDEO_ANALYSIS["summary"]}
+    mock_load_video.return_value = "dGVzdA=="
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        analysis = asyncio.create_task(http.post(
+            "/api/youtube/analyze/",
+            params={"youtube_url": "https://www.youtube.com/watch?v=BusyStage01"}
+        ))
+        assert await asyncio.to_thread(started.wait, 5)
+        info = await asyncio.wait_for(http.get("/info"), 2)
+        release.set()
+        response = await analysis
+
+    assert info.status_code == 200
+    assert info.json()["pools"]["io"]["running"] >= 1
+    assert response.status_code == 200
+
 @pytest.mark.asyncio
 @patch('app.routes.analyze_youtube_video')
 async def test_analyze_youtube_video_success(mock_analyze):
@@ -106,6 +165,45 @@ async def test_analyze_youtube_video_success(mock_analyze):
     assert data == MOCK_VIDEO_ANALYSIS
     mock_analyze.assert_called_once_with("https://www.youtube.com/watch?v=test123")
 
+@patch('app.routes.l')
+@patch('app.routes.analyze_youtube_video')
+def test_analyze_youtube_video_negotiates_compression(mock_analyze, mock_log):
+    """Test the analysis is compressed on request and only a summary is logged"""
+    import zstandard
+
+    mock_analyze.return_value = MOCK_VIDEO_ANALYSIS
+    params = {"youtube_url": "https://www.youtube.com/watch?v=test123"}
+
+    gzipped = client.post("/api/youtube/analyze/", params=params, headers={"Accept-Encoding": "gzip"})
+    zstd = client.post("/api/youtube/analyze/", params=params, headers={"Accept-Encoding": "zstd"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.json() == MOCK_VIDEO_ANALYSIS
+    assert zstd.headers["content-encoding"] == "zstd"
+    # Older httpx releases leave zstd bodies encoded
+    body = zstd.content if zstd.content.startswith(b"{") else zstandard.ZstdDecompressor().decompress(zstd.content)
+    assert json.loads(body) == MOCK_VIDEO_ANALYSIS
+    logged = [call.args[0] for call in mock_log.info.call_args_list if isinstance(call.args[0], dict)]
+    assert logged[0]["event"] == "analysis_response"
+    assert logged[0]["segments"] == 1
+    assert logged[0]["scenes"] == 2
+    assert MOCK_VIDEO_ANALYSIS["transcricao"]["texto_completo"] not in str(mock_log.info.call_args_list)
+
+@patch('app.routes.analyze_youtube_video')
+def test_analyze_youtube_video_sends_msgpack(mock_analyze):
+    """Test the analysis is sent as MessagePack when asked for and the optional package is installed"""
+    ormsgpack = pytest.importorskip("ormsgpack")
+    mock_analyze.return_value = MOCK_VIDEO_ANALYSIS
+
+    response = client.post(
+        "/api/youtube/analyze/",
+        params={"youtube_url": "https://www.youtube.com/watch?v=test123"},
+        headers={"Accept": "application/msgpack"},
+    )
+
+    assert response.headers["content-type"] == "application/msgpack"
+    assert ormsgpack.unpackb(response.content) == MOCK_VIDEO_ANALYSIS
+
 @pytest.mark.asyncio
 @patch('app.routes.analyze_youtube_video')
 async def test_analyze_youtube_video_error(mock_analyze):
@@ -133,3 +231,98 @@ def test_analyze_youtube_video_invalid_url():
     data = response.json()
     assert "detail" in data
     assert "Error analyzing video" in data["detail"]
+
+@patch('app.routes.analyze_youtube_video')
+def test_analyze_youtube_video_background_job(mock_analyze):
+    """Test background mode returns a job id and the job result can be polled"""
+    mock_analyze.return_value = MOCK_VIDEO_ANALYSIS
+
+    with TestClient(get_app(test_mode=True)) as job_client:
+        response = job_client.post(
+            "/api/youtube/analyze/",
+            params={"youtube_url": "https://www.youtube.com/watch?v=test123", "background": True}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(50):
+            job = job_client.get(f"/api/youtube/jobs/{job_id}").json()
+            if job["status"] == "completed":
+                break
+            time.sleep(0.01)
+
+    assert job["status"] == "completed"
+    assert job["result"] == MOCK_VIDEO_ANALYSIS
+    mock_analyze.assert_called_once_with("https://www.youtube.com/watch?v=test123")
+
+def test_get_unknown_job():
+    """Test polling an unknown job returns 404"""
+    response = client.get("/api/youtube/jobs/unknown")
+    assert response.status_code == 404
+
+@patch('ai.batch.analyze_youtube_video')
+def test_analyze_batch_streams_ndjson(mock_analyze):
+    """Test the batch endpoint deduplicates URLs and streams one line per video"""
+    mock_analyze.return_value = MOCK_VIDEO_ANALYSIS
+
+    response = client.post(
+        "/api/youtube/analyze/batch",
+        json={"urls": [
+            "https://www.youtube.com/watch?v=JzLtDZL7Nak",
+            "https://youtu.be/JzLtDZL7Nak",
+        ]}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["video_id"] == "JzLtDZL7Nak"
+    assert lines[0]["analysis"] == MOCK_VIDEO_ANALYSIS
+    assert lines[1]["type"] == "summary"
+    assert lines[1]["duplicates"] == 1
+    mock_analyze.assert_called_once()
+
+def test_analyze_batch_rejects_empty_list():
+    """Test an empty batch is rejected"""
+    response = client.post("/api/youtube/analyze/batch", json={"urls": []})
+    assert response.status_code == 400
+
+@patch('app.routes.stream_youtube_analysis')
+def test_analyze_stream_sends_server_sent_events(mock_stream):
+    """Test the streaming route sends each partial result as an SSE event"""
+    async def events(url):
+        yield "metadados", MOCK_VIDEO_ANALYSIS["metadados"]
+        yield "segmentos", MOCK_VIDEO_ANALYSIS["transcricao"]["segmentos"]
+        yield "done", {"elapsed_seconds": 0.1}
+
+    mock_stream.side_effect = events
+
+    response = client.get(
+        "/api/youtube/analyze/stream",
+        params={"youtube_url": "https://www.youtube.com/watch?v=test123"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = response.text.strip().split("\n\n")
+    assert [block.splitlines()[0] for block in blocks] == ["event: metadados", "event: segmentos", "event: done"]
+    assert json.loads(blocks[0].splitlines()[1][len("data: "):]) == MOCK_VIDEO_ANALYSIS["metadados"]
+
+@patch('app.routes.stream_youtube_analysis')
+def test_analyze_stream_ndjson_reports_errors(mock_stream):
+    """Test a failure mid-stream is sent as a final error event"""
+    async def events(url):
+        yield "metadados", MOCK_VIDEO_ANALYSIS["metadados"]
+        raise Exception("Test error")
+
+    mock_stream.side_effect = events
+
+    response = client.post(
+        "/api/youtube/analyze/stream",
+        params={"youtube_url": "https://www.youtube.com/watch?v=test123", "format": "ndjson"}
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["event"] for line in lines] == ["metadados", "error"]
+    assert "Test error" in lines[1]["data"]["detail"]
@@ -0,0 +1,138 @@
+import sys
+import threading
+import time
+from pathlib import Path
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.middleware.base import BaseHTTPMiddleware
+from throttled.exceptions import RateLimitExceeded
+from throttled.fastapi import TotalLimiter
+from throttled.limiter import Limiter
+from throttled.models import Rate
+from throttled.strategies import Strategies
+
+# Add the project root directory to Python path
+project_root = str(Path(__file__).parent.parent)
+sys.path.insert(0, project_root)
+
+from app.state import MemorySharedState, SQLiteSharedState, SharedLimiterStorage, threaded_dispatch
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_states(request, tmp_path):
+    """
+    Returns a factory of states that see each other, like two API workers
+    """
+    if request.param == "memory":
+        state = MemorySharedState()
+        return lambda: state
+    return lambda: SQLiteSharedState(str(tmp_path / "state.db"))
+
+
+def test_counter_resets_after_ttl(make_states):
+    """Test counters add up within their window and start over once it has passed"""
+    first, second = make_states(), make_states()
+
+    assert first.incr("hits", 1, 0.2)[0] == 1
+    value, remaining = second.incr("hits", 2, 0.2)
+    assert value == 3
+    assert 0 < remaining <= 0.2
+
+    time.sleep(0.25)
+    assert first.incr("hits", 1, 0.2)[0] == 1
+
+
+def test_values_expire(make_states):
+    """Test values are shared as JSON copies until their TTL"""
+    first, second = make_states(), make_states()
+    value = {"scenes": [1, 2]}
+
+    first.set("result", value, 0.2)
+    value["scenes"].append(3)
+
+    assert second.get("result") == {"scenes": [1, 2]}
+    time.sleep(0.25)
+    assert second.get("result") is None
+
+
+def test_lease_has_one_owner(make_states):
+    """Test a lease is exclusive until released or expired, and renewable by its owner"""
+    first, second = make_states(), make_states()
+
+    assert first.acquire("video", "a", 0.2)
+    assert not second.acquire("video", "b", 0.2)
+    assert first.acquire("video", "a", 0.2)
+    assert second.holder("video") == "a"
+
+    second.release("video", "b")
+    assert first.holder("video") == "a"
+    first.release("video", "a")
+    assert second.acquire("video", "b", 0.1)
+
+    time.sleep(0.15)
+    assert second.holder("video") is None
+    assert first.acquire("video", "a", 0.2)
+
+
+def test_limiter_storage_counts_across_workers(make_states):
+    """Test requests through different workers count against the same limit"""
+    first = Limiter(Rate(3, 1), SharedLimiterStorage(make_states()), Strategies.MOVING_WINDOW)
+    second = Limiter(Rate(3, 1), SharedLimiterStorage(make_states()), Strategies.MOVING_WINDOW)
+
+    first.limit("total")
+    second.limit("total")
+    first.limit("total")
+    with pytest.raises(RateLimitExceeded) as exc:
+        second.limit("total")
+
+    assert 0 < exc.value.retry_after <= 1
+    second.limit("host=other")
+
+
+def test_memory_state_drops_expired_values_on_read():
+    """Test an expired value is removed when read rather than by rebuilding the store on every write"""
+    state = MemorySharedState()
+    state.set("old", {"v": 1}, 0.05)
+    state.set("new", {"v": 2}, 60)
+    time.sleep(0.1)
+    state.set("newer", {"v": 3}, 60)
+
+    assert "old" in state._values
+    assert state.get("old") is None
+    assert set(state._values) == {"new", "newer"}
+
+
+def test_sqlite_state_syncs_at_checkpoints(tmp_path):
+    """Test the SQLite state uses WAL with synchronous=NORMAL rather than a sync per write"""
+    state = SQLiteSharedState(str(tmp_path / "state.db"))
+
+    assert state._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert state._conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_threaded_dispatch_counts_off_the_event_loop():
+    """Test the limiter middleware counts hits in a worker thread and still rejects over the limit"""
+    threads = []
+    state = MemorySharedState()
+    incr = state.incr
+
+    def recording_incr(*args):
+        threads.append(threading.current_thread())
+        return incr(*args)
+
+    state.incr = recording_incr
+    app = FastAPI()
+    app.add_middleware(BaseHTTPMiddleware, dispatch=threaded_dispatch(TotalLimiter(Rate(1, 1), SharedLimiterStorage(state))))
+    app.get("/ping")(lambda: {"ok": True})
+
+    with TestClient(app) as client:
+        loop_thread = client.portal.call(threading.current_thread)
+        assert client.get("/ping").status_code == 200
+        limited = client.get("/ping")
+        assert client.get("/docs").status_code == 200
+
+    assert limited.status_code == 429
+    assert "Retry-After" in limited.headers
+    assert len(threads) == 2
+    assert loop_thread not in threads